@@ -43,6 +43,42 @@ options:
         type: bool
         required: True
         choices: [ True, False]
+    ssl_ca_cert:
+        description:
+            - SSL CA certificate file (.pem format) to verify the SSL
+              certificate when verifycert is set to True.
+        type: str
+    session_broker:
+        description:
+            - boolean variable to specify whether to hand the REST requests
+              to the local session broker.
+            - The broker is a local process started on first use which
+              keeps warm connections per VPLEX host and user, so the
+              tasks of a playbook run do not set up a new connection each.
+              It exits after being idle for 5 minutes.
+        type: bool
+        default: False
+    bootstrap_cache_ttl:
+        description:
+            - number of seconds for which the connection probe, the VPLEX
+              version and the verified cluster names are cached on disk per
+              VPLEX host and user.
+            - The cache is dropped on any authentication error.
+            - 0 disables the bootstrap cache.
+        type: int
+        default: 0
+    snapshot_cache_ttl:
+        description:
+            - number of seconds for which the lists of clusters, storage
+              arrays, storage volumes, extents, devices, virtual volumes,
+              consistency groups, ports, initiators, storage views and
+              distributed objects are cached on disk per VPLEX host and
+              user, so that a playbook run fetches each list once.
+            - Any change made through the modules drops the cached lists
+              of the changed cluster and of the distributed objects.
+            - 0 disables the snapshot cache.
+        type: int
+        default: 0
 
 requirements:
   - A DellEMC VPLEX Storage device.
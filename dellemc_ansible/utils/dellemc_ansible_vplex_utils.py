@@ -1,8 +1,28 @@
 """vplexapi connection establishment module"""
 
+import binascii
+import errno
+import fcntl
+import hashlib
 import logging
+import os
 import re
-from json import loads
+import socket
+import tempfile
+import threading
+import time
+from json import dumps, loads
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # pylint: disable=E0401
+
+try:
+    from urllib.parse import quote, urlencode, urlparse
+except ImportError:
+    from urllib import quote, urlencode  # pylint: disable=E0611
+    from urlparse import urlparse  # pylint: disable=E0401
 
 try:
     import vplexapi  # pylint: disable=W0611
@@ -45,7 +65,9 @@ if HAS_VPLEXAPI_SDK:
     from vplexapi import Configuration
     from vplexapi import ApiClient
     from vplexapi.api import ClustersApi, VersionApi
-    from vplexapi.rest import ApiException
+    from vplexapi.rest import ApiException, RESTClientObject
+else:
+    RESTClientObject = object  # pylint: disable=C0103
 
 if HAS_URLLIB3:
     from urllib3.exceptions import MaxRetryError
@@ -89,6 +111,14 @@ parameters:
      - verifycert: To verify SSL certificate
      - ssl_ca_cert: CA certificate file to be specified when verifycert is
                     set to True
+     - session_broker: To hand the REST requests to the local session
+                       broker
+     - bootstrap_cache_ttl: Seconds for which the bootstrap calls are
+                            served from the bootstrap cache
+     - snapshot_cache_ttl: Seconds for which the object lists are served
+                           from the snapshot cache
+     - max_workers: Number of concurrent requests the module makes, if
+                    any
 returns ApiClient object
 '''
 
@@ -122,11 +152,27 @@ def config_vplexapi(module_params):
     config.assert_hostname = False
     # Enable VPlex api to collect the logs
     config.debug = True
+    # Keep a pooled connection for each of the concurrent requests
+    if module_params.get('max_workers', 0) > \
+            (getattr(config, 'connection_pool_maxsize', None) or 0):
+        config.connection_pool_maxsize = module_params['max_workers']
 
     client = ApiClient(configuration=config)
+    if module_params.get('session_broker'):
+        socket_path = get_session_broker()
+        if socket_path:
+            key = '|'.join([host, user, str(cert), str(ssl_cert)])
+            client.rest_client = BrokerRESTClient(config, socket_path, key)
+    client.bootstrap_cache = BootstrapCache(module_params)
+    if client.bootstrap_cache.enabled:
+        client.rest_client = BootstrapRESTClient(client.rest_client,
+                                                 client.bootstrap_cache)
+    if client.bootstrap_cache.get('probe'):
+        return use_snapshot_cache(client, module_params)
     try:
         cluster_client = ClustersApi(client)
         cluster_client.get_clusters_with_http_info(_request_timeout=5)
+        client.bootstrap_cache.set('probe', True)
     except (ApiException, MaxRetryError) as ex:
         if config.verify_ssl:
             msg = ('Could not establish connection with Host %s. Please'
@@ -146,7 +192,668 @@ def config_vplexapi(module_params):
                 # if user provided server where
                 # non VPLEX service is running
                 return 503, msg
-    return client
+    return use_snapshot_cache(client, module_params)
+
+
+DOCUMENTATION = r'''
+---
+
+Session broker shared across the module invocations of a playbook run.
+The broker is a local process listening on a Unix socket that keeps warm
+vplexapi REST clients, and their connection pools, per VPLEX host and
+user. It is started on first use and exits after being idle for
+BROKER_IDLE_TIMEOUT seconds. Requests are sent as one JSON document per
+line and any failure to reach the broker falls back to a direct request.
+'''
+
+BROKER_IDLE_TIMEOUT = 300
+BROKER_START_TIMEOUT = 5
+
+
+def get_cache_dir():
+    """Returns the per user directory holding the VPLEX runtime files"""
+    path = os.path.join(tempfile.gettempdir(),
+                        'dellemc_vplex_{0}'.format(os.getuid()))
+    try:
+        os.makedirs(path, 0o700)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            return None
+    # Do not use a directory which is owned or readable by another user
+    stat = os.stat(path)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        return None
+    return path
+
+
+def broker_request(socket_path, message, timeout=None):
+    """Sends a message to the session broker and returns its reply"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((dumps(message) + '\n').encode('utf-8'))
+        reply = sock.makefile('rb').readline()
+    finally:
+        sock.close()
+    return loads(reply.decode('utf-8'))
+
+
+def is_broker_alive(socket_path):
+    """Checks whether a session broker is serving on the socket"""
+    try:
+        return broker_request(socket_path, {'op': 'ping'}, 1).get('pong')
+    except (socket.error, ValueError):
+        return False
+
+
+def get_session_broker():
+    """Returns the socket path of the session broker, starting the broker
+    if it is not running. Returns None if the broker is not available"""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    socket_path = os.path.join(cache_dir, 'broker.sock')
+    if is_broker_alive(socket_path):
+        return socket_path
+
+    # Serialize the start up so that parallel forks start a single broker
+    with open(os.path.join(cache_dir, 'broker.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if is_broker_alive(socket_path):
+            return socket_path
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        start_session_broker(socket_path, lock)
+        deadline = time.time() + BROKER_START_TIMEOUT
+        while time.time() < deadline:
+            if is_broker_alive(socket_path):
+                return socket_path
+            time.sleep(0.05)
+    return None
+
+
+def close_inherited_fds():
+    """Closes the file descriptors the broker inherited from the module,
+    except the standard streams and the log files"""
+    keep = set([0, 1, 2])
+    for handler in logging.getLogger().handlers:
+        stream = getattr(handler, 'stream', None)
+        if stream is not None and hasattr(stream, 'fileno'):
+            keep.add(stream.fileno())
+    try:
+        max_fd = os.sysconf('SC_OPEN_MAX')
+    except (AttributeError, ValueError, OSError):
+        max_fd = 1024
+    start = 3
+    for fdesc in sorted(keep) + [max_fd]:
+        if fdesc >= start:
+            os.closerange(start, fdesc)
+            start = fdesc + 1
+
+
+def start_session_broker(socket_path, lock):
+    """Starts the session broker as a detached daemon process"""
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    try:
+        # The start up lock must stay with the module process only
+        lock.close()
+        os.setsid()
+        if os.fork():
+            os._exit(0)  # pylint: disable=W0212
+        # Release the module stdout so that Ansible does not wait on it
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fdesc in (0, 1, 2):
+            os.dup2(devnull, fdesc)
+        close_inherited_fds()
+        SessionBroker(socket_path).serve_forever()
+    finally:
+        os._exit(0)  # pylint: disable=W0212
+
+
+class SessionBroker():
+    """Serves vplexapi REST requests over a Unix socket with warm REST
+    clients"""
+
+    def __init__(self, socket_path, idle_timeout=BROKER_IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.rest_clients = {}
+        self.lock = threading.Lock()
+        self.active = 0
+        self.last_used = time.time()
+        self.log = get_logger('dellemc_vplex_session_broker')
+
+    def get_rest_client(self, key, settings):
+        """Returns the warm REST client of a VPLEX host and user"""
+        with self.lock:
+            if key not in self.rest_clients:
+                config = Configuration()
+                config.verify_ssl = settings['verify_ssl']
+                config.ssl_ca_cert = settings['ssl_ca_cert']
+                config.assert_hostname = False
+                self.rest_clients[key] = RESTClientObject(config)
+            return self.rest_clients[key]
+
+    def forward(self, request):
+        """Performs the REST request on behalf of the module"""
+        rest_client = self.get_rest_client(request['key'],
+                                           request['settings'])
+        timeout = request['timeout']
+        if isinstance(timeout, list):
+            timeout = tuple(timeout)
+        try:
+            resp = rest_client.request(
+                request['method'], request['url'],
+                query_params=request['query_params'],
+                headers=request['headers'], body=request['body'],
+                post_params=request['post_params'],
+                _request_timeout=timeout)
+            return {'status': resp.status, 'reason': resp.reason,
+                    'headers': dict(resp.getheaders()), 'data': resp.data}
+        except ApiException as err:
+            if not err.status:
+                return {'fallback': str(err)}
+            return {'status': err.status, 'reason': err.reason,
+                    'headers': dict(err.headers or {}), 'data': err.body}
+        except Exception as err:  # pylint: disable=W0703
+            # Let the module retry on its own and report the real error
+            return {'fallback': str(err)}
+
+    def handle(self, conn):
+        """Handles a single request received on the socket"""
+        try:
+            try:
+                request = loads(
+                    conn.makefile('rb').readline().decode('utf-8'))
+                if request.get('op') == 'ping':
+                    reply = {'pong': True}
+                else:
+                    reply = self.forward(request)
+                frame = dumps(reply)
+            except Exception as err:  # pylint: disable=W0703
+                # The module falls back to a direct request on the error
+                self.log.error("Could not handle a request of the session"
+                               " broker due to error: %s", err)
+                frame = dumps({'fallback': str(err)})
+            conn.sendall((frame + '\n').encode('utf-8'))
+        except socket.error as err:
+            self.log.error("Could not reply to a request of the session"
+                           " broker due to error: %s", err)
+        finally:
+            conn.close()
+            with self.lock:
+                self.active -= 1
+                self.last_used = time.time()
+
+    def is_idle(self):
+        """Checks whether the broker has been idle for too long"""
+        with self.lock:
+            return (not self.active and
+                    time.time() - self.last_used > self.idle_timeout)
+
+    def serve_forever(self):
+        """Serves the requests until the broker becomes idle"""
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        inode = os.stat(self.socket_path).st_ino
+        server.listen(64)
+        server.settimeout(1)
+        try:
+            while not self.is_idle():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                with self.lock:
+                    self.active += 1
+                worker = threading.Thread(target=self.handle, args=(conn,))
+                worker.daemon = True
+                worker.start()
+        finally:
+            server.close()
+            # Do not remove the socket of a broker started after this one
+            if os.path.exists(self.socket_path) and \
+                    os.stat(self.socket_path).st_ino == inode:
+                os.unlink(self.socket_path)
+
+
+class BrokerResponse():
+    """REST response rebuilt from a reply of the session broker or from
+    the snapshot cache"""
+
+    def __init__(self, reply):
+        self.status = reply['status']
+        self.reason = reply['reason']
+        self.headers = reply['headers']
+        self.data = reply['data']
+
+    def getheaders(self):
+        """Returns the response headers"""
+        return self.headers
+
+    def getheader(self, name, default=None):
+        """Returns the given response header"""
+        return self.headers.get(name, default)
+
+
+class BrokerRESTClient(RESTClientObject):
+    """vplexapi REST client which hands the requests to the session
+    broker"""
+
+    def __init__(self, configuration, socket_path, key):
+        super(BrokerRESTClient, self).__init__(configuration)
+        self.socket_path = socket_path
+        self.key = key
+        self.settings = {'verify_ssl': configuration.verify_ssl,
+                         'ssl_ca_cert': configuration.ssl_ca_cert}
+
+    def request(self, method, url,  # pylint: disable=R0913
+                query_params=None, headers=None, body=None,
+                post_params=None, _preload_content=True,
+                _request_timeout=None):
+        """Performs the request through the session broker"""
+        reply = {'fallback': 'streamed response'}
+        if _preload_content:
+            message = {'key': self.key, 'settings': self.settings,
+                       'method': method, 'url': url,
+                       'query_params': query_params, 'headers': headers,
+                       'body': body, 'post_params': post_params,
+                       'timeout': _request_timeout}
+            try:
+                reply = broker_request(self.socket_path, message)
+            except (socket.error, ValueError, TypeError) as err:
+                reply = {'fallback': str(err)}
+        if 'fallback' in reply:
+            return super(BrokerRESTClient, self).request(
+                method, url, query_params=query_params, headers=headers,
+                body=body, post_params=post_params,
+                _preload_content=_preload_content,
+                _request_timeout=_request_timeout)
+        resp = BrokerResponse(reply)
+        if not 200 <= resp.status <= 299:
+            raise ApiException(http_resp=resp)
+        return resp
+
+
+DOCUMENTATION = r'''
+---
+
+Bootstrap cache of a VPLEX host and user. It keeps the results of the
+connection probe, the VPLEX setup version and the verified cluster names
+on disk for bootstrap_cache_ttl seconds, so that the tasks of a playbook
+run do not repeat these calls. An entry is only served to the same
+password it was stored with, checked against a PBKDF2 verifier of the
+password, and the cache is dropped on any authentication error.
+'''
+
+BOOTSTRAP_PBKDF2_ROUNDS = 100000
+
+
+class BootstrapCache():
+    """On-disk cache of the connection bootstrap results"""
+
+    def __init__(self, module_params):
+        self.ttl = module_params.get('bootstrap_cache_ttl') or 0
+        self.calls_saved = 0
+        self.path = None
+        self.entries = {}
+        self.salt = None
+        self.verifier = None
+        cache_dir = get_cache_dir() if self.ttl > 0 else None
+        if cache_dir:
+            key = '|'.join([module_params['vplexhost'],
+                            module_params['vplexuser']])
+            self.path = os.path.join(cache_dir, 'bootstrap_{0}.json'.format(
+                hashlib.sha256(key.encode('utf-8')).hexdigest()))
+            self.password = module_params['vplexpassword']
+            self.entries = self.load()
+
+    @property
+    def enabled(self):
+        """Checks whether the bootstrap cache is in use"""
+        return self.path is not None
+
+    def derive(self, salt):
+        """Returns the PBKDF2 verifier of the password for the salt"""
+        return binascii.hexlify(hashlib.pbkdf2_hmac(
+            'sha256', self.password.encode('utf-8'), salt.encode('utf-8'),
+            BOOTSTRAP_PBKDF2_ROUNDS)).decode('ascii')
+
+    def load(self):
+        """Loads the unexpired entries stored with the same password"""
+        try:
+            with open(self.path) as cache_file:
+                content = loads(cache_file.read())
+        except (IOError, OSError, ValueError):
+            return {}
+        salt = content.get('salt')
+        if not salt or content.get('verifier') != self.derive(salt):
+            return {}
+        # The verifier is only derived again for a new password
+        self.salt, self.verifier = salt, content['verifier']
+        now = time.time()
+        return dict((name, entry) for name, entry in
+                    content.get('entries', {}).items()
+                    if now - entry[0] < self.ttl)
+
+    def save(self):
+        """Atomically writes the entries to the cache file"""
+        if self.verifier is None:
+            self.salt = binascii.hexlify(os.urandom(16)).decode('ascii')
+            self.verifier = self.derive(self.salt)
+        content = {'salt': self.salt, 'verifier': self.verifier,
+                   'entries': self.entries}
+        try:
+            handle, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path))
+            with os.fdopen(handle, 'w') as cache_file:
+                cache_file.write(dumps(content))
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+    def get(self, name):
+        """Returns a cached bootstrap result and counts the saved call"""
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        self.calls_saved += 1
+        return entry[1]
+
+    def set(self, name, value):
+        """Stores a bootstrap result"""
+        if self.enabled:
+            self.entries[name] = [time.time(), value]
+            self.save()
+
+    def invalidate(self):
+        """Drops all the cached bootstrap results"""
+        self.entries = {}
+        if self.enabled and os.path.exists(self.path):
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class DelegatingRESTClient():
+    """vplexapi REST client which passes the requests on to another REST
+    client"""
+
+    def __init__(self, rest_client):
+        self.rest_client = rest_client
+
+    def request(self, method, url,  # pylint: disable=R0913
+                query_params=None, headers=None, body=None,
+                post_params=None, _preload_content=True,
+                _request_timeout=None):
+        """Performs the request with the wrapped REST client"""
+        return self.rest_client.request(
+            method, url, query_params=query_params, headers=headers,
+            body=body, post_params=post_params,
+            _preload_content=_preload_content,
+            _request_timeout=_request_timeout)
+
+    # pylint: disable=C0103
+    def GET(self, url, **kwargs):
+        """Performs a GET request"""
+        return self.request('GET', url, **kwargs)
+
+    def HEAD(self, url, **kwargs):
+        """Performs a HEAD request"""
+        return self.request('HEAD', url, **kwargs)
+
+    def OPTIONS(self, url, **kwargs):
+        """Performs an OPTIONS request"""
+        return self.request('OPTIONS', url, **kwargs)
+
+    def DELETE(self, url, **kwargs):
+        """Performs a DELETE request"""
+        return self.request('DELETE', url, **kwargs)
+
+    def POST(self, url, **kwargs):
+        """Performs a POST request"""
+        return self.request('POST', url, **kwargs)
+
+    def PUT(self, url, **kwargs):
+        """Performs a PUT request"""
+        return self.request('PUT', url, **kwargs)
+
+    def PATCH(self, url, **kwargs):
+        """Performs a PATCH request"""
+        return self.request('PATCH', url, **kwargs)
+
+
+class BootstrapRESTClient(DelegatingRESTClient):
+    """REST client which drops the bootstrap cache on authentication
+    errors"""
+
+    def __init__(self, rest_client, bootstrap_cache):
+        DelegatingRESTClient.__init__(self, rest_client)
+        self.bootstrap_cache = bootstrap_cache
+
+    def request(self, method, url, **kwargs):  # pylint: disable=W0221
+        """Performs the request and watches for authentication errors"""
+        try:
+            return DelegatingRESTClient.request(self, method, url, **kwargs)
+        except ApiException as err:
+            if err.status in (401, 403):
+                self.bootstrap_cache.invalidate()
+            raise
+
+
+DOCUMENTATION = r'''
+---
+
+This method returns the number of bootstrap calls served from the
+bootstrap cache. It accepts vplexclient.
+'''
+
+
+def get_bootstrap_calls_saved(vplexclient):
+    """Returns the number of bootstrap calls saved by the cache"""
+    bootstrap_cache = getattr(vplexclient, 'bootstrap_cache', None)
+    if bootstrap_cache is None:
+        return 0
+    return bootstrap_cache.calls_saved
+
+
+DOCUMENTATION = r'''
+---
+
+This method exits a module with its result, along with the number of
+bootstrap calls served from the bootstrap cache during the whole run in
+bootstrap_calls_saved. It accepts the Ansible module, vplexclient and the
+result.
+'''
+
+
+def exit_module(module, vplexclient, **result):
+    """Exits the module with the result and the bootstrap calls saved"""
+    result['bootstrap_calls_saved'] = get_bootstrap_calls_saved(vplexclient)
+    module.exit_json(**result)
+
+
+DOCUMENTATION = r'''
+---
+
+Snapshot cache of the VPLEX object lists. The responses of the list
+endpoints in SNAPSHOT_COLLECTIONS are kept on disk per VPLEX host and
+user for snapshot_cache_ttl seconds, so that a playbook run fetches each
+collection once instead of once per task. Every request changing VPLEX
+drops the snapshots under the URI prefixes returned by
+get_invalidation_prefixes. The snapshots live in the cache directory of
+the local user, which no other user can read. Snapshot files are
+replaced atomically, and the epoch check of a snapshot and its write
+hold the lock of the cache against invalidations, so that a snapshot
+fetched while an invalidation took place is never stored. This keeps
+the cache consistent when many Ansible forks use it at once.
+'''
+
+SNAPSHOT_COLLECTIONS = re.compile(
+    r'^/vplex/v2/(clusters|clusters/[^/]+/(storage_arrays|storage_volumes|'
+    r'extents|devices|virtual_volumes|consistency_groups|'
+    r'exports/(ports|initiator_ports|storage_views))|distributed_storage/'
+    r'(distributed_devices|distributed_virtual_volumes|'
+    r'distributed_consistency_groups))$')
+
+
+def get_invalidation_prefixes(path):
+    """Returns the URI prefixes of the snapshots made stale by a change of
+    the given resource"""
+    # The objects of a cluster depend on each other (claiming a volume,
+    # creating an extent on it and so on), and the distributed objects
+    # depend on the objects of the clusters
+    match = re.match(r'^/vplex/v2/clusters/[^/]+/', path)
+    if match:
+        return [match.group(0), '/vplex/v2/distributed_storage/']
+    if path.startswith('/vplex/v2/distributed_storage/'):
+        return ['/vplex/v2/distributed_storage/', '/vplex/v2/clusters/']
+    return ['/vplex/v2/']
+
+
+class SnapshotCache():
+    """On-disk snapshots of the VPLEX object lists"""
+
+    def __init__(self, module_params):
+        self.ttl = module_params.get('snapshot_cache_ttl') or 0
+        self.path = None
+        cache_dir = get_cache_dir() if self.ttl > 0 else None
+        if cache_dir:
+            key = '|'.join([module_params['vplexhost'],
+                            module_params['vplexuser']])
+            path = os.path.join(cache_dir, 'snapshots_{0}'.format(
+                hashlib.sha256(key.encode('utf-8')).hexdigest()))
+            try:
+                os.mkdir(path, 0o700)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    return
+            self.path = path
+
+    @property
+    def enabled(self):
+        """Checks whether the snapshot cache is in use"""
+        return self.path is not None
+
+    def get_epoch(self):
+        """Returns the marker of the last invalidation"""
+        try:
+            with open(os.path.join(self.path, '.epoch')) as epoch_file:
+                return epoch_file.read()
+        except (IOError, OSError):
+            return ''
+
+    def lock(self):
+        """Returns the lock file of the cache, locked exclusively"""
+        lock = os.fdopen(os.open(os.path.join(self.path, '.lock'),
+                                 os.O_WRONLY | os.O_CREAT, 0o600), 'w')
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def write(self, name, content):
+        """Atomically replaces a file of the cache"""
+        try:
+            handle, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.')
+            with os.fdopen(handle, 'w') as cache_file:
+                cache_file.write(content)
+            os.rename(tmp_path, os.path.join(self.path, name))
+        except (IOError, OSError):
+            pass
+
+    def load(self, key):
+        """Returns the unexpired snapshot of a collection"""
+        try:
+            with open(os.path.join(self.path, quote(key, safe=''))) as snap:
+                snapshot = loads(snap.read())
+        except (IOError, OSError, ValueError):
+            return None
+        if time.time() - snapshot['fetched'] >= self.ttl:
+            return None
+        return snapshot
+
+    def store(self, key, epoch, snapshot):
+        """Stores the snapshot of a collection unless the cache has been
+        invalidated since the collection was fetched"""
+        snapshot['fetched'] = time.time()
+        content = dumps(snapshot)
+        try:
+            with self.lock():
+                if self.get_epoch() == epoch:
+                    self.write(quote(key, safe=''), content)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self, prefixes):
+        """Drops the snapshots under the given URI prefixes"""
+        prefixes = tuple(quote(prefix, safe='') for prefix in prefixes)
+        try:
+            with self.lock():
+                self.write('.epoch',
+                           hashlib.sha256(os.urandom(16)).hexdigest())
+                for name in os.listdir(self.path):
+                    if name.startswith(prefixes):
+                        try:
+                            os.unlink(os.path.join(self.path, name))
+                        except OSError:
+                            pass
+        except (IOError, OSError):
+            pass
+
+
+class SnapshotRESTClient(DelegatingRESTClient):
+    """REST client which serves the object lists from the snapshot
+    cache"""
+
+    def __init__(self, rest_client, snapshot_cache):
+        DelegatingRESTClient.__init__(self, rest_client)
+        self.snapshot_cache = snapshot_cache
+
+    def request(self, method, url, **kwargs):  # pylint: disable=W0221
+        """Performs the request, using and maintaining the snapshots"""
+        path = urlparse(url).path
+        if method in ('POST', 'PUT', 'PATCH', 'DELETE'):
+            try:
+                return DelegatingRESTClient.request(self, method, url,
+                                                    **kwargs)
+            finally:
+                self.snapshot_cache.invalidate(
+                    get_invalidation_prefixes(path))
+        if method != 'GET' or not SNAPSHOT_COLLECTIONS.match(path) or \
+                not kwargs.get('_preload_content', True):
+            return DelegatingRESTClient.request(self, method, url, **kwargs)
+
+        key = path
+        if kwargs.get('query_params'):
+            key += '?' + urlencode(sorted(kwargs['query_params']))
+        snapshot = self.snapshot_cache.load(key)
+        if snapshot:
+            return BrokerResponse(snapshot)
+        epoch = self.snapshot_cache.get_epoch()
+        resp = DelegatingRESTClient.request(self, method, url, **kwargs)
+        self.snapshot_cache.store(key, epoch, {
+            'status': resp.status, 'reason': resp.reason,
+            'headers': dict(resp.getheaders()), 'data': resp.data})
+        return resp
+
+
+def use_snapshot_cache(vplexclient, module_params):
+    """Routes the requests of the client through the snapshot cache when
+    it is enabled, and returns the client"""
+    snapshot_cache = SnapshotCache(module_params)
+    if snapshot_cache.enabled:
+        vplexclient.rest_client = SnapshotRESTClient(
+            vplexclient.rest_client, snapshot_cache)
+    return vplexclient
 
 
 DOCUMENTATION = r'''
@@ -158,12 +865,18 @@ It accepts vplexapi-client and cluster_name
 
 def verify_cluster_name(vplexclient, cluster_name):
     """Verify if given cluster is valid or not"""
+    bootstrap_cache = getattr(vplexclient, 'bootstrap_cache', None)
+    key = 'cluster:' + cluster_name
+    if bootstrap_cache and bootstrap_cache.get(key):
+        return 200, 'Cluster Found: %s' % cluster_name
     cluster_client = ClustersApi(vplexclient)
     try:
         cluster_client.get_cluster(cluster_name)
     except ApiException as ex:
         body = loads(ex.body)
         return body['error_code'], body['message']
+    if bootstrap_cache:
+        bootstrap_cache.set(key, True)
     return 200, 'Cluster Found: %s' % cluster_name
 
 
@@ -201,6 +914,17 @@ options:
   ssl_ca_cert:
     description:
     - SSL CA certificate file (.pem format) provided by the user to verify SSL
+  session_broker:
+    description:
+    - To hand the REST requests to the local session broker
+  bootstrap_cache_ttl:
+    description:
+    - Seconds for which the connection bootstrap calls are cached, 0 to
+      disable the bootstrap cache
+  snapshot_cache_ttl:
+    description:
+    - Seconds for which the object lists are cached, 0 to disable the
+      snapshot cache
 '''
 
 
@@ -211,7 +935,10 @@ def get_vplex_management_host_parameters():
         vplexuser=dict(type='str', required=True),
         vplexpassword=dict(type='str', required=True, no_log=True),
         verifycert=dict(type='bool', required=True),
-        ssl_ca_cert=dict(type='str', required=False)
+        ssl_ca_cert=dict(type='str', required=False),
+        session_broker=dict(type='bool', required=False, default=False),
+        bootstrap_cache_ttl=dict(type='int', required=False, default=0),
+        snapshot_cache_ttl=dict(type='int', required=False, default=0)
     )
 
 
@@ -250,8 +977,13 @@ returns vplex setup version
 
 def get_vplex_setup(vplexclient):
     """Gets VPLEX setup version"""
-    ver = VersionApi(vplexclient).get_versions()
-    return 'VPLEX setup in use ' + ver[0]['version']
+    bootstrap_cache = getattr(vplexclient, 'bootstrap_cache', None)
+    version = bootstrap_cache.get('version') if bootstrap_cache else None
+    if version is None:
+        version = VersionApi(vplexclient).get_versions()[0]['version']
+        if bootstrap_cache:
+            bootstrap_cache.set('version', version)
+    return 'VPLEX setup in use ' + version
 
 
 DOCUMENTATION = r'''
@@ -331,3 +1063,543 @@ def check_status_of_cluster(vplexclient):
         if cluster_info.operational_status == "degraded":
             return cluster.name
     return None
+
+
+DOCUMENTATION = r'''
+---
+
+This method calls the given function with each of the items on a pool of
+at most max_workers threads. The threads share the connection pool of the
+vplexapi client used by the function. Exceptions raised by the function
+are returned instead of being raised, so that the caller reports them
+from the main thread.
+parameters:
+  func - Function to call with each item
+  items - List of items
+  max_workers - Maximum number of concurrent calls
+
+returns list of (result, exception) tuples in the order of the items
+'''
+
+
+def run_concurrently(func, items, max_workers):
+    """This method calls the function with the items concurrently"""
+    results = [None] * len(items)
+    pending = queue.Queue()
+    for index, item in enumerate(items):
+        pending.put((index, item))
+
+    def worker():
+        """Calls the function with the pending items"""
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = (func(item), None)
+            except Exception as err:  # pylint: disable=W0703
+                results[index] = (None, err)
+
+    workers = [threading.Thread(target=worker)
+               for _ in range(min(max(max_workers, 1), len(items)))]
+    if len(workers) == 1:
+        worker()
+        return results
+    for thread in workers:
+        thread.daemon = True
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+DOCUMENTATION = r'''
+---
+
+Relationship graph of the VPLEX storage objects. The graph links each
+storage volume to the extents created on it, each extent to the devices
+using it, each device to its virtual volume and each virtual volume to
+the storage views exporting it and to its consistency group, along with
+the distributed devices, virtual volumes and consistency groups. It is
+built from the list endpoints of TOPOLOGY_COLLECTIONS, with one call per
+collection and cluster, instead of walking the objects one at a time
+with MapsApi.
+'''
+
+# Collections of the graph with their path, the API listing them and
+# whether they belong to a cluster
+TOPOLOGY_COLLECTIONS = [
+    ('storage_volumes', 'storage_volumes', 'StorageVolumeApi',
+     'get_storage_volumes', True),
+    ('extents', 'extents', 'ExtentApi', 'get_extents', True),
+    ('devices', 'devices', 'DevicesApi', 'get_devices', True),
+    ('virtual_volumes', 'virtual_volumes', 'VirtualVolumeApi',
+     'get_virtual_volumes', True),
+    ('consistency_groups', 'consistency_groups', 'ConsistencyGroupApi',
+     'get_consistency_groups', True),
+    ('storage_views', 'exports/storage_views', 'ExportsApi',
+     'get_storage_views', True),
+    ('distributed_devices', 'distributed_devices', 'DistributedStorageApi',
+     'get_distributed_devices', False),
+    ('distributed_virtual_volumes', 'distributed_virtual_volumes',
+     'DistributedStorageApi', 'get_distributed_virtual_volumes', False),
+    ('distributed_consistency_groups', 'distributed_consistency_groups',
+     'DistributedStorageApi', 'get_distributed_consistency_groups', False),
+]
+
+# Attributes of the objects of each collection referring to the objects
+# they use (True) or to the objects using them (False)
+TOPOLOGY_RELATIONS = {
+    'extents': [('storage_volume', 'storage_volumes', True),
+                ('used_by', 'devices', False)],
+    'devices': [('virtual_volume', 'virtual_volumes', False)],
+    'virtual_volumes': [('supporting_device', 'devices', True),
+                        ('consistency_group', 'consistency_groups', False)],
+    'consistency_groups': [('virtual_volumes', 'virtual_volumes', True)],
+    'storage_views': [('virtual_volumes', 'virtual_volumes', True)],
+    'distributed_devices': [('virtual_volume', 'distributed_virtual_volumes',
+                             False)],
+    'distributed_virtual_volumes': [
+        ('supporting_device', 'distributed_devices', True),
+        ('consistency_group', 'distributed_consistency_groups', False)],
+    'distributed_consistency_groups': [
+        ('virtual_volumes', 'distributed_virtual_volumes', True)],
+}
+
+TOPOLOGY_PATHS = dict((collection, path) for collection, path, _, _, _ in
+                      TOPOLOGY_COLLECTIONS)
+
+
+def get_ref_uri(ref):
+    """Returns the URI of a reference to an object, given either as the
+    URI or as a dictionary holding it"""
+    if isinstance(ref, dict):
+        return ref.get('uri')
+    return ref
+
+
+def get_object_uri(collection, name, cluster=None):
+    """Returns the URI of an object of the graph"""
+    if cluster:
+        return '/vplex/v2/clusters/{0}/{1}/{2}'.format(
+            cluster, TOPOLOGY_PATHS[collection], name)
+    return '/vplex/v2/distributed_storage/{0}/{1}'.format(
+        TOPOLOGY_PATHS[collection], name)
+
+
+class StorageGraph():
+    """Relationship graph of the VPLEX storage objects, keyed by URI,
+    with the adjacency indexes of the objects each object uses and of
+    the objects using it"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uses = {}
+        self.used_by = {}
+
+    def add_relation(self, user, used):
+        """Records that an object uses another one"""
+        self.uses.setdefault(user, set()).add(used)
+        self.used_by.setdefault(used, set()).add(user)
+
+    def add_objects(self, collection, objects, cluster=None):
+        """Adds the serialized objects of a collection and their
+        relations to the graph"""
+        relations = TOPOLOGY_RELATIONS.get(collection, [])
+        for obj in objects:
+            uri = get_object_uri(collection, obj['name'], cluster)
+            self.objects[uri] = {'type': collection, 'name': obj['name'],
+                                 'cluster': cluster}
+            for attribute, target, uses in relations:
+                refs = obj.get(attribute) or []
+                if not isinstance(refs, list):
+                    refs = [refs]
+                for ref in refs:
+                    ref = get_ref_uri(ref)
+                    if not ref:
+                        continue
+                    # References are URIs, but names are accepted too
+                    if not ref.startswith('/vplex/'):
+                        ref = get_object_uri(target, ref, cluster)
+                    if uses:
+                        self.add_relation(uri, ref)
+                    else:
+                        self.add_relation(ref, uri)
+
+    def add_children(self, uri, children):
+        """Records that an object uses the children of its map"""
+        for child in children or []:
+            self.add_relation(uri, child)
+
+    def get_composite_devices(self):
+        """Returns the URIs of the devices and distributed devices whose
+        legs are only listed in their maps. The devices used by an extent
+        are the legs themselves, so only the devices built on other
+        devices, such as the RAID-1, RAID-C and expanded ones, remain."""
+        devices = []
+        for uri, obj in self.objects.items():
+            if obj['type'] == 'devices' and any(
+                    used.split('/')[-2] == 'extents'
+                    for used in self.uses.get(uri, ())):
+                continue
+            if obj['type'] in ('devices', 'distributed_devices'):
+                devices.append(uri)
+        return sorted(devices)
+
+    def get_related(self, uri, collection, using=True):
+        """Returns the URIs of the objects of a collection using the
+        object, directly or not, or used by it if using is False"""
+        index = self.used_by if using else self.uses
+        related = set()
+        seen = set([uri])
+        pending = [uri]
+        while pending:
+            for neighbour in index.get(pending.pop(), ()):
+                if neighbour in seen:
+                    continue
+                seen.add(neighbour)
+                pending.append(neighbour)
+                if neighbour.split('/')[-2] == \
+                        TOPOLOGY_PATHS[collection].split('/')[-1]:
+                    related.add(neighbour)
+        return sorted(related)
+
+    def to_dict(self):
+        """Returns the graph as a dictionary of the objects by URI, along
+        with the objects they use, the objects using them and, for the
+        storage volumes, the storage views exporting them"""
+        graph = {}
+        for uri, obj in self.objects.items():
+            node = dict(obj)
+            node['uses'] = sorted(self.uses.get(uri, ()))
+            node['used_by'] = sorted(self.used_by.get(uri, ()))
+            if obj['type'] == 'storage_volumes':
+                node['storage_views'] = self.get_related(uri, 'storage_views')
+            graph[uri] = node
+        return graph
+
+
+DOCUMENTATION = r'''
+---
+
+Inverted index of the storage views of a cluster by the URIs of their
+initiators, ports and virtual volumes, built from one get_storage_views
+call. Lookups cost the size of the request instead of the number of
+storage views.
+'''
+
+
+class ExportsIndex():
+    """Storage views indexed by initiator, port and virtual volume"""
+
+    def __init__(self, storage_views):
+        self.views = {}
+        self.positions = {}
+        self.by_initiator = {}
+        self.by_port = {}
+        self.by_virtual_volume = {}
+        for position, view in enumerate(storage_views or []):
+            self.views[view['name']] = view
+            self.positions[view['name']] = position
+            for index, refs in [(self.by_initiator, view.get('initiators')),
+                                (self.by_port, view.get('ports')),
+                                (self.by_virtual_volume,
+                                 view.get('virtual_volumes'))]:
+                for ref in refs or []:
+                    index.setdefault(get_ref_uri(ref), set()).add(
+                        view['name'])
+
+    def get_views(self, index, uris, exclude=None):
+        """Returns the names of the storage views holding any of the URIs
+        in the given index"""
+        views = set()
+        for uri in uris:
+            views.update(index.get(uri, ()))
+        views.discard(exclude)
+        return views
+
+    def find_shared_initiator_port(self, initiators, ports, exclude=None):
+        """Returns the first storage view, other than exclude, containing
+        one of the initiators and one of the ports, along with the first
+        of each in the view, or None"""
+        views = self.get_views(self.by_initiator, initiators, exclude) & \
+            self.get_views(self.by_port, ports, exclude)
+        if not views:
+            return None
+        name = min(views, key=self.positions.get)
+        initiators = set(initiators)
+        ports = set(ports)
+        view = self.views[name]
+        initiator = next(get_ref_uri(ref) for ref in view['initiators']
+                         if get_ref_uri(ref) in initiators)
+        port = next(get_ref_uri(ref) for ref in view['ports']
+                    if get_ref_uri(ref) in ports)
+        return name, initiator, port
+
+    def is_exported(self, virtual_volume, exclude=None):
+        """Checks whether a storage view, other than exclude, exports the
+        virtual volume of the given URI"""
+        return bool(self.get_views(self.by_virtual_volume,
+                                   [virtual_volume], exclude))
+
+
+DOCUMENTATION = r'''
+---
+
+This method returns the inverted index of the storage views of a cluster
+parameters:
+  vplexclient - ApiClient object
+  cluster_name - Name of the cluster
+
+returns ExportsIndex object
+'''
+
+
+def get_exports_index(vplexclient, cluster_name):
+    """This method indexes the storage views of a cluster"""
+    exports = VplexapiModules.ExportsApi(api_client=vplexclient)
+    return ExportsIndex(serialize_content(
+        exports.get_storage_views(cluster_name)))
+
+
+DOCUMENTATION = r'''
+---
+
+This method returns the patch operations not yet reflected by the details
+of an object, such as a storage view, for resending the rest of a partly
+applied update. A replace of /name is reflected once the object bears the
+new name, an add once the value is among the members of the path and a
+remove once it is not.
+parameters:
+  details - Serialized details of the object
+  operations - List of patch operations
+
+returns list of the pending operations, in the order given
+'''
+
+
+def get_pending_operations(details, operations):
+    """This method returns the patch operations not applied yet"""
+    pending = []
+    for operation in operations:
+        if operation['path'] == '/name':
+            applied = details.get('name') == operation['value']
+        else:
+            members = [get_ref_uri(ref) for ref in
+                       details.get(operation['path'].strip('/')) or []]
+            applied = (operation['value'] in members) == \
+                (operation['op'] == 'add')
+        if not applied:
+            pending.append(operation)
+    return pending
+
+
+DOCUMENTATION = r'''
+---
+
+Index of the storage volumes of a cluster by name and by system ID, built
+from one get_storage_volumes call. With the snapshot cache enabled the
+listing is shared by the tasks of a playbook run until a change of the
+cluster drops it.
+'''
+
+
+class StorageVolumeIndex():
+    """Storage volumes indexed by name and system ID"""
+
+    def __init__(self, storage_volumes):
+        self.by_name = {}
+        self.by_system_id = {}
+        for volume in storage_volumes or []:
+            self.by_name[volume.name] = volume
+            if volume.system_id:
+                self.by_system_id[volume.system_id] = volume.name
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def get_by_name(self, name):
+        """Returns the storage volume of the given name, or None"""
+        return self.by_name.get(name)
+
+    def get_by_system_id(self, system_id):
+        """Returns the storage volume of the given system ID, or None"""
+        return self.by_name.get(self.by_system_id.get(system_id))
+
+
+DOCUMENTATION = r'''
+---
+
+This method returns the index of the storage volumes of a cluster
+parameters:
+  vplexclient - ApiClient object
+  cluster_name - Name of the cluster
+
+returns StorageVolumeIndex object
+'''
+
+
+def get_storage_volume_index(vplexclient, cluster_name):
+    """This method indexes the storage volumes of a cluster"""
+    storage = VplexapiModules.StorageVolumeApi(api_client=vplexclient)
+    return StorageVolumeIndex(storage.get_storage_volumes(
+        cluster_name=cluster_name))
+
+
+DOCUMENTATION = r'''
+---
+
+This method builds the relationship graph of the storage objects of the
+given clusters and of the distributed storage. The collections are
+fetched concurrently on a pool of max_workers threads, then the maps of
+the devices built on other devices and of the distributed devices, which
+link the legs to them.
+parameters:
+  vplexclient - ApiClient object
+  clusters - List of cluster names
+  max_workers - Maximum number of concurrent calls
+
+returns StorageGraph object, or raises the ApiException of the first
+failed call
+'''
+
+
+def build_storage_graph(vplexclient, clusters, max_workers=1):
+    """This method builds the relationship graph of the storage objects"""
+    calls = []
+    for collection, _, api, method, per_cluster in TOPOLOGY_COLLECTIONS:
+        if per_cluster:
+            calls.extend((collection, api, method, cluster)
+                         for cluster in clusters)
+        else:
+            calls.append((collection, api, method, None))
+
+    def get_objects(call):
+        """Lists the objects of a collection"""
+        _, api, method, cluster = call
+        api_obj = getattr(VplexapiModules, api)(api_client=vplexclient)
+        args = [cluster] if cluster else []
+        return serialize_content(getattr(api_obj, method)(*args))
+
+    graph = StorageGraph()
+    results = run_concurrently(get_objects, calls, max_workers)
+    for (collection, _, _, cluster), (objects, err) in zip(calls, results):
+        if err is not None:
+            raise err
+        graph.add_objects(collection, objects, cluster)
+
+    maps = VplexapiModules.MapsApi(api_client=vplexclient)
+    devices = graph.get_composite_devices()
+    results = run_concurrently(
+        lambda uri: maps.get_map(uri).children, devices, max_workers)
+    for uri, (children, err) in zip(devices, results):
+        if err is not None:
+            raise err
+        graph.add_children(uri, children)
+    return graph
+
+
+DOCUMENTATION = r'''
+---
+
+This method classifies the layout of a device from the children in its
+map. The extents are ignored. A device without other children is simple.
+VPLEX renames the original device of an expanded device by appending the
+expansion date ("<device><year><month>..."), so a device is expanded when
+one of its children carries that suffix, the other children being the
+devices added. Otherwise its children are mirrors.
+parameters:
+  device_name - Name of the device
+  children - URIs of the children of the device from its map
+
+returns the layout ('simple', 'mirrored' or 'expanded') and the URIs of the
+mirrors or of the devices added, in map order
+'''
+
+DEVICE_EXPANSION_SUFFIX = re.compile(
+    r'[2-9][0-9]{3}(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)')
+
+
+def get_device_layout(device_name, children):
+    """This method classifies the layout of a device"""
+    members = [child for child in children if '/extents/' not in child]
+    added = [child for child in members
+             if not DEVICE_EXPANSION_SUFFIX.match(
+                 child.split('/')[-1].split(device_name)[-1])]
+    if not members:
+        return 'simple', members
+    if len(added) < len(members):
+        return 'expanded', added
+    return 'mirrored', members
+
+
+DOCUMENTATION = r'''
+---
+
+Index of the names of the objects of one type across the clusters, telling
+in O(1) which clusters hold an object of a given name.
+'''
+
+
+class NameIndex():
+    """Names of the objects of a type indexed across clusters"""
+
+    def __init__(self):
+        self.clusters = {}
+
+    def add(self, cluster, names):
+        """Adds the names of the objects of a cluster"""
+        for name in names:
+            self.clusters.setdefault(name, []).append(cluster)
+
+    def find(self, name, exclude=None):
+        """Returns the first cluster, other than exclude, holding an object
+        of the given name, or None"""
+        for cluster in self.clusters.get(name, ()):
+            if cluster != exclude:
+                return cluster
+        return None
+
+    def find_containing(self, part, exclude=None):
+        """Returns the first cluster, other than exclude, holding an object
+        whose name contains the given part, or None"""
+        for name in sorted(self.clusters):
+            if part in name:
+                cluster = self.find(name, exclude)
+                if cluster is not None:
+                    return cluster
+        return None
+
+
+DOCUMENTATION = r'''
+---
+
+This method indexes the names of the objects of a per cluster collection
+of TOPOLOGY_COLLECTIONS, such as virtual_volumes or devices, across the
+given clusters. The collection is listed once per cluster, with the
+clusters listed concurrently.
+parameters:
+  vplexclient - ApiClient object
+  collection - Name of the collection
+  clusters - List of cluster names
+
+returns NameIndex object, or raises the ApiException of the first failed
+call
+'''
+
+
+def get_name_index(vplexclient, collection, clusters):
+    """This method indexes the names of a collection across clusters"""
+    api, method = [(api, method) for name, _, api, method, per_cluster
+                   in TOPOLOGY_COLLECTIONS
+                   if name == collection and per_cluster][0]
+    api_obj = getattr(VplexapiModules, api)(api_client=vplexclient)
+    results = run_concurrently(getattr(api_obj, method), clusters,
+                               len(clusters))
+    index = NameIndex()
+    for cluster, (objects, err) in zip(clusters, results):
+        if err is not None:
+            raise err
+        index.add(cluster, [obj.name for obj in objects])
+    return index
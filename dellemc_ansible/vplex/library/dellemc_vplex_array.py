@@ -118,6 +118,12 @@ array_details:
                 - storage_pools URI of the StorageArray
             type: str
 
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
+
 '''
 
 LOG = utils.get_logger('dellemc_vplex_array')
@@ -238,7 +244,7 @@ class VplexRediscoverArray():
 
         result['changed'] = changed
         result['array_details'] = array_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_vplex_rediscover_array_parameters():
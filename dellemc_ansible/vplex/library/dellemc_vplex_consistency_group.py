@@ -202,6 +202,12 @@ consistency_group_details:
             description:
                 - Cluster visibility of consistency group
             type: list
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_consistency_group')
@@ -494,7 +500,7 @@ class ConsistencyGroup():
 
         result['changed'] = changed
         result['cg_details'] = cg_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_vplex_cg_parameters():
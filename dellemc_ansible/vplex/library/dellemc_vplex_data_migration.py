@@ -236,6 +236,12 @@ job_details:
             description:
                 - Whether the target device is exported
             type: bool
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_data_migration')
@@ -634,16 +640,16 @@ class VplexDataMigration():  # pylint: disable=R0902
             msg = ("Could not get the details of the {0} migration job {1}. "
                    "Job not present".format(self.storage, migration_name))
             LOG.info(msg)
-            self.module.exit_json(**result)
+            utils.exit_module(self.module, self.client, **result)
 
         elif (job_details and state == "absent"):
             self.delete_job(job_details)
             result['changed'] = True
-            self.module.exit_json(**result)
+            utils.exit_module(self.module, self.client, **result)
 
         result['changed'] = changed
         result['job_details'] = job_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_vplex_data_migration_parameters():
@@ -280,6 +280,12 @@ device_details:
             description:
                 - The cluster visibility of the device
             type: str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_device')
@@ -670,7 +676,7 @@ class VplexDevice():
 
         result['changed'] = changed
         result['device_details'] = device_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_vplex_device_parameters():
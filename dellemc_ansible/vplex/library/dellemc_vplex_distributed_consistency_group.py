@@ -225,6 +225,12 @@ Distributed consistency group Details:
         name:
              description: The name of the distributed consistency group
              type:  str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_distributed_consistency_group')
@@ -467,7 +473,7 @@ class DistributedConsistencyGroup():
                 self.module.fail_json(msg=msg)
 
             if degraded_cluster or not d_cg_details:
-                self.module.exit_json(**result)
+                utils.exit_module(self.module, self.client, **result)
 
             self.delete_d_cgrp(dr_cg_name)
             d_cg_details = None
@@ -674,7 +680,7 @@ class DistributedConsistencyGroup():
 
         result['changed'] = changed
         result['d_cg_details'] = d_cg_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_vplex_dcg_parameters():
@@ -207,6 +207,12 @@ dist_device_details:
         name:
             description: The name of the distributed device
             type: str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_distributed_device')
@@ -612,7 +618,7 @@ class VplexDistributedDevice():
         de_clus = utils.check_status_of_cluster(self.client)
         if de_clus:
             if state == 'absent' and not dist_dev_details:
-                self.module.exit_json(**result)
+                utils.exit_module(self.module, self.client, **result)
             if state == 'absent' and dist_dev_details:
                 msg = "Could not delete the distributed device {0} because "\
                     "{1} is in degraded state".format(distributed_device_name,
@@ -629,7 +635,7 @@ class VplexDistributedDevice():
                 dist_device_details = utils.serialize_content(
                     dist_dev_details)
                 result['dist_device_details'] = dist_device_details
-                self.module.exit_json(**result)
+                utils.exit_module(self.module, self.client, **result)
             if state == 'present' and not dist_dev_details:
                 if distributed_device_name is None:
                     msg = "Could not perform the operation because {0} "\
@@ -777,7 +783,7 @@ class VplexDistributedDevice():
             dist_device_details['devices'] = children
         result['changed'] = changed
         result['dist_device_details'] = dist_device_details
-        self.module.exit_json(**result)
+        utils.exit_module(self.module, self.client, **result)
 
 
 def get_distributed_device_parameters():  # pylint:disable=C0103
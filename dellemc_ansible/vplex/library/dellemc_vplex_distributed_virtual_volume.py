@@ -277,6 +277,12 @@ Distributed Virtual Volume Details:
         vpd_id:
             description: vpd_id
             type: str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_distributed_virtual_volume')
@@ -339,11 +345,12 @@ class VplexDistributedVirtualVolume():    # pylint:disable=R0902
         api_obj = utils.VplexapiModules()
         self.distvv = api_obj.DistributedStorageApi(api_client=self.client)
         self.cluster = api_obj.ClustersApi(api_client=self.client)
-        self.vvol = api_obj.VirtualVolumeApi(api_client=self.client)
+        self.vol_names = None
 
         # result is a dictionary that contains changed status and
         # distributed virtual volume details
-        self.result = {"changed": False, "dist_vv_details": {}}
+        self.result = {
+            "changed": False, "dist_vv_details": {}}
 
     def get_distributed_vv(self, dist_vv_name):
         """
@@ -493,13 +500,19 @@ class VplexDistributedVirtualVolume():    # pylint:disable=R0902
         """
         LOG.info("Check for the distributed virtual volume name existence"
                  " across clusters")
-        cluster_details = self.cluster.get_clusters()
-        cl_name = [clus.name for clus in cluster_details
-                   for vol in self.vvol.get_virtual_volumes(clus.name)
-                   if vol.name == name]
-        if len(cl_name) > 0:
-            return cl_name[0]
-        return None
+        if self.vol_names is None:
+            # List the virtual volumes of all the clusters once, with the
+            # clusters listed concurrently
+            try:
+                clusters = [clus.name for clus in self.cluster.get_clusters()]
+                self.vol_names = utils.get_name_index(
+                    self.client, 'virtual_volumes', clusters)
+            except utils.ApiException as err:
+                err_msg = ("Could not get the virtual volumes of the clusters"
+                           " due to error: {0}".format(utils.error_msg(err)))
+                LOG.error("%s\n%s\n", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+        return self.vol_names.find(name)
 
     def validate_name(self, name, field):    # pylint: disable=R0201
         """This method validates the name length and non-presence of
@@ -535,7 +548,7 @@ class VplexDistributedVirtualVolume():    # pylint:disable=R0902
             if dist_vv_details:
                 dist_vv_details = utils.serialize_content(dist_vv_details)
             self.result["dist_vv_details"] = dist_vv_details
-            self.module.exit_json(**self.result)
+            utils.exit_module(self.module, self.client, **self.result)
 
         # Check status of the cluster, whether cluster link is disabled
         degraded_cluster = utils.check_status_of_cluster(self.client)
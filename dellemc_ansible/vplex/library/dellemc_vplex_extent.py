@@ -58,6 +58,31 @@ options:
     - New name of the extent for rename operation
     type: str
 
+  storage_volumes:
+    description:
+    - List of storage volumes on which extents are created in a single
+      run, each given by name or as a dictionary with the keys
+      storage_volume_name or storage_volume_id, and optionally extent_name
+    - The storage volumes are validated against a single listing and the
+      extents created concurrently. A storage volume with an extent
+      already is left unchanged. A failed extent does not stop the others,
+      and the task fails after all of them have been processed. An extent
+      created but not renamed to its extent_name is reported as changed
+      and failed, under the name given by VPLEX.
+    type: list
+
+  storage_array_name:
+    description:
+    - Name of a storage array, all the claimed storage volumes of which
+      without an extent get one, along with the storage_volumes given
+    type: str
+
+  max_workers:
+    description:
+    - Maximum number of extents created concurrently
+    type: int
+    default: 4
+
   state:
     description:
     - Defines whether the extent should exist or not
@@ -70,6 +95,9 @@ notes:
 - storage_volume_name or storage_volume_id and extent_name is
   required to create extent
 - storage_volume_name and storage_volume_id are mutually exclusive
+- storage_volumes and storage_array_name only create extents, and are
+  mutually exclusive with storage_volume_name, storage_volume_id,
+  extent_name and new_extent_name
 '''
 
 EXAMPLES = r'''
@@ -136,6 +164,30 @@ EXAMPLES = r'''
         new_extent_name: "ansible_extent_new_name"
         storage_volume_id: "VPD83T3:60000970000197200581533030353438"
         state: "present"
+
+    - name: Create Extents on several storage volumes
+      dellemc_vplex_extent:
+        vplexhost: "{{ vplexhost }}"
+        vplexuser: "{{ vplexuser }}"
+        vplexpassword: "{{ vplexpassword }}"
+        verifycert: "{{ verifycert }}"
+        cluster_name: "cluster-1"
+        storage_volumes:
+          - storage_volume_name: "ansible_st_vol_1"
+            extent_name: "ansible_extent_1"
+          - storage_volume_name: "ansible_st_vol_2"
+            extent_name: "ansible_extent_2"
+        state: "present"
+
+    - name: Create Extents on all claimed storage volumes of an array
+      dellemc_vplex_extent:
+        vplexhost: "{{ vplexhost }}"
+        vplexuser: "{{ vplexuser }}"
+        vplexpassword: "{{ vplexpassword }}"
+        verifycert: "{{ verifycert }}"
+        cluster_name: "cluster-1"
+        storage_array_name: "EMC-SYMMETRIX-197200581"
+        state: "present"
 '''
 
 RETURN = r'''
@@ -209,6 +261,38 @@ Extent Details:
             description: Vendor specific name
             type: str
 
+extents_details:
+    description: Outcome for each of the storage volumes of
+                 storage_volumes and storage_array_name
+    returned: When storage_volumes or storage_array_name is given
+    type: complex
+    contains:
+        storage_volume:
+            description: Storage volume name or ID as given
+            type: str
+        extent_name:
+            description: Name of the extent on the storage volume
+            type: str
+        changed:
+            description: Whether or not the extent has been created
+            type: bool
+        failed:
+            description: Whether or not the storage volume failed
+            type: bool
+        msg:
+            description: Error message of a failed storage volume
+            type: str
+        extent_details:
+            description: Details of the extent created, with the same keys
+                         as the Extent Details
+            type: dict
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
+
 '''
 
 LOG = utils.get_logger('dellemc_vplex_extent')
@@ -227,8 +311,14 @@ class VplexExtent():  # pylint:disable=R0902
         mutually_exclusive = [
             ['storage_volume_name', 'storage_volume_id']
         ]
+        for bulk in ['storage_volumes', 'storage_array_name']:
+            mutually_exclusive.extend(
+                [bulk, single] for single in
+                ['storage_volume_name', 'storage_volume_id', 'extent_name',
+                 'new_extent_name'])
         required_one_of = [
-            ['storage_volume_name', 'storage_volume_id', 'extent_name']
+            ['storage_volume_name', 'storage_volume_id', 'extent_name',
+             'storage_volumes', 'storage_array_name']
         ]
         # initialize the ansible module
         self.module = AnsibleModule(
@@ -278,10 +368,14 @@ class VplexExtent():  # pylint:disable=R0902
         api_obj = utils.VplexapiModules()
         self.extent = api_obj.ExtentApi(api_client=self.client)
         self.stor_obj = api_obj.StorageVolumeApi(api_client=self.client)
+        # Storage volumes of the cluster, indexed for storage_volume_id,
+        # storage_volumes and storage_array_name only
+        self.storvol_index = None
 
         # result is a dictionary that contains changed status and
         # extent details
-        self.result = {"changed": False, "extent_details": {}}
+        self.result = {
+            "changed": False, "extent_details": {}}
 
     def get_extent(self, extent_name):
         """
@@ -376,6 +470,25 @@ class VplexExtent():  # pylint:disable=R0902
             LOG.error("%s\n%s\n", err_msg, err)
             self.module.fail_json(msg=err_msg)
 
+    def get_storvol_index(self):
+        """
+        Get the storage volumes of the cluster indexed by name and system
+        ID, listed once until extents are created
+        """
+        if self.storvol_index is None:
+            try:
+                self.storvol_index = utils.get_storage_volume_index(
+                    self.client, self.cl_name)
+                LOG.info("Indexed %d storage volumes of %s",
+                         len(self.storvol_index.by_name), self.cl_name)
+            except utils.ApiException as err:
+                err_msg = ("Could not get the storage volumes of {0} due to"
+                           " error: {1}".format(
+                               self.cl_name, utils.error_msg(err)))
+                LOG.error("%s\n%s\n", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+        return self.storvol_index
+
     def is_storvol_inuse(self, stor_vol, ext_name):
         """
         Get the status of the storage volume
@@ -384,9 +497,14 @@ class VplexExtent():  # pylint:disable=R0902
             extent_details = None
             use = None
             details = None
-            details = self.stor_obj.get_storage_volume(self.cl_name, stor_vol)
-            LOG.info("Got the details of storage volume %s in %s", stor_vol,
-                     self.cl_name)
+            if self.storvol_index is not None:
+                # Already listed to resolve the storage volume ID
+                details = self.storvol_index.get_by_name(stor_vol)
+            else:
+                details = self.stor_obj.get_storage_volume(self.cl_name,
+                                                           stor_vol)
+                LOG.info("Got the details of storage volume %s in %s",
+                         stor_vol, self.cl_name)
             if details:
                 if details.use == "used":
                     extent_name = details.used_by[0].split('/')[-1]
@@ -414,22 +532,205 @@ class VplexExtent():  # pylint:disable=R0902
         """
         Get the name of the storage volume with the storage volume ID
         """
-        stor_vol_name = None
-        try:
-            stor_vol_list = self.stor_obj.get_storage_volumes(self.cl_name)
-            for stor_vol in stor_vol_list:
-                if stor_vol.system_id == stor_id:
-                    stor_vol_name = stor_vol.name
-            LOG.info("Got storage volume name %s from storage volume ID %s",
-                     stor_vol_name, stor_id)
-            return stor_vol_name
-        except utils.ApiException as err:
-            err_msg = ("Could not get storage volume ID {0} from {1} due to"
-                       " error: {2}".format(
-                           stor_id, self.cl_name, utils.error_msg(err)))
-            LOG.error("%s\n%s\n", err_msg, err)
+        stor_vol = self.get_storvol_index().get_by_system_id(stor_id)
+        stor_vol_name = stor_vol.name if stor_vol else None
+        LOG.info("Got storage volume name %s from storage volume ID %s",
+                 stor_vol_name, stor_id)
+        return stor_vol_name
+
+    def get_bulk_specs(self):
+        """
+        Get the (storage volume as given, storage volume, extent name)
+        of each extent of a bulk creation
+        """
+        index = self.get_storvol_index()
+        keys = ['storage_volume_name', 'storage_volume_id', 'extent_name']
+        specs = []
+        for entry in self.module.params['storage_volumes'] or []:
+            if not isinstance(entry, dict):
+                entry = {'storage_volume_name': entry}
+            if set(entry) - set(keys) or \
+                    bool(entry.get('storage_volume_name')) == \
+                    bool(entry.get('storage_volume_id')):
+                err_msg = ("Each of the storage_volumes requires one of"
+                           " storage_volume_name and storage_volume_id, and"
+                           " optionally extent_name")
+                LOG.error(err_msg)
+                self.module.fail_json(msg=err_msg)
+            if entry.get('storage_volume_id'):
+                stor_vol = entry['storage_volume_id']
+                details = index.get_by_system_id(stor_vol)
+            else:
+                stor_vol = entry['storage_volume_name']
+                details = index.get_by_name(stor_vol)
+            specs.append((stor_vol, details, entry.get('extent_name')))
+
+        array_name = self.module.params['storage_array_name']
+        if array_name:
+            listed = set(details.name for _, details, _ in specs if details)
+            for name in sorted(index.by_name):
+                details = index.by_name[name]
+                if details.storage_array_name == array_name and \
+                        details.use == 'claimed' and name not in listed:
+                    specs.append((name, details, None))
+            LOG.info("Selected %d storage volumes of %s in %s", len(specs),
+                     array_name, self.cl_name)
+        return specs
+
+    def check_bulk_spec(self, stor_vol, details, ext_name):
+        """
+        Get the error message of an extent of a bulk creation which can not
+        be created, or None
+        """
+        if not details:
+            return "Could not get storage volume {0} from {1}".format(
+                stor_vol, self.cl_name)
+        if details.use == 'used' and details.used_by:
+            current = details.used_by[0].split('/')[-1]
+            if ext_name and ext_name != current:
+                return ("Could not create {0} in {1} because the extent {2}"
+                        " already exists on storage volume {3}".format(
+                            ext_name, self.cl_name, current, stor_vol))
+            return None
+        if details.use != 'claimed':
+            return ("Could not create extent as the storage volume {0}"
+                    " is {1}".format(stor_vol, details.use))
+        if ext_name:
+            status, msg = utils.validate_name(ext_name, '63', 'extent_name')
+            if not status:
+                return msg
+        return None
+
+    def create_bulk_extent(self, spec):
+        """
+        Create an extent of a bulk creation and give it its extent name,
+        returning the extent with the error of the rename, if any, and
+        raising the errors of the creation to the caller
+        """
+        stor_vol, ext_name = spec
+        path = "/vplex/v2/clusters/" + self.cl_name + "/storage_volumes/"
+        ext_details = self.extent.create_extent(
+            self.cl_name, {'storage_volume': path + stor_vol})
+        LOG.info("Created extent %s on %s", ext_details.name, self.cl_name)
+        if ext_name and ext_details.name != ext_name:
+            try:
+                ext_details = self.extent.patch_extent(
+                    self.cl_name, ext_details.name,
+                    [{'op': 'replace', 'path': '/name', 'value': ext_name}])
+            except (utils.ApiException, utils.MaxRetryError) as err:
+                # The extent exists, so the error is reported along with it
+                return ext_details, err
+            LOG.info("Renamed the extent on %s to %s in %s", stor_vol,
+                     ext_name, self.cl_name)
+        return ext_details, None
+
+    def perform_bulk_operation(self):  # pylint:disable=R0914
+        """
+        Create the extents on the storage_volumes and on the claimed storage
+        volumes of storage_array_name concurrently, reporting each of them
+        """
+        if self.state != 'present':
+            err_msg = ("storage_volumes and storage_array_name only create"
+                       " extents with state present")
+            LOG.error(err_msg)
             self.module.fail_json(msg=err_msg)
 
+        specs = self.get_bulk_specs()
+        errors = {}
+        for position, spec in enumerate(specs):
+            err_msg = self.check_bulk_spec(*spec)
+            if err_msg:
+                errors[position] = err_msg
+
+        # Check the new extent names against the extents of the cluster
+        # and against each other
+        names = [(position, ext_name) for position, (_, details, ext_name)
+                 in enumerate(specs) if ext_name and
+                 position not in errors and details.use == 'claimed']
+        if names:
+            try:
+                existing = set(ext.name for ext in
+                               self.extent.get_extents(self.cl_name))
+            except utils.ApiException as err:
+                err_msg = ("Could not get the extents of {0} due to"
+                           " error: {1}".format(
+                               self.cl_name, utils.error_msg(err)))
+                LOG.error("%s\n%s\n", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+            for position, ext_name in names:
+                if ext_name in existing:
+                    errors[position] = (
+                        "Could not create {0} in {1} because given extent"
+                        " name already exists".format(ext_name, self.cl_name))
+                existing.add(ext_name)
+
+        work = [(position, (details.name, ext_name)) for position,
+                (_, details, ext_name) in enumerate(specs)
+                if position not in errors and details.use == 'claimed']
+        results = utils.run_concurrently(
+            self.create_bulk_extent, [spec for _, spec in work],
+            self.module.params['max_workers'])
+        created = dict((position, result) for (position, _), result
+                       in zip(work, results))
+        if created:
+            self.storvol_index = None
+
+        details_list = []
+        failed = 0
+        for position, (stor_vol, details, ext_name) in enumerate(specs):
+            outcome = {'storage_volume': stor_vol, 'changed': False,
+                       'failed': False, 'msg': None,
+                       'extent_name': ext_name, 'extent_details': None}
+            err_msg = errors.get(position)
+            if position in created:
+                result, err = created[position]
+                ext_details, rename_err = result or (None, None)
+                if isinstance(err, (utils.ApiException,
+                                    utils.MaxRetryError)):
+                    err_msg = ("Could not create extent on {0} in {1} due"
+                               " to error: {2}".format(
+                                   stor_vol, self.cl_name,
+                                   utils.error_msg(err)
+                                   if isinstance(err, utils.ApiException)
+                                   else err))
+                elif err is not None:
+                    raise err
+                else:
+                    outcome['changed'] = True
+                    outcome['extent_name'] = ext_details.name
+                    outcome['extent_details'] = utils.serialize_content(
+                        ext_details)
+                if rename_err is not None:
+                    err_msg = ("Created extent {0} on {1} in {2} but could"
+                               " not rename it to {3} due to error: {4}"
+                               .format(ext_details.name, stor_vol,
+                                       self.cl_name, ext_name,
+                                       utils.error_msg(rename_err)
+                                       if isinstance(rename_err,
+                                                     utils.ApiException)
+                                       else rename_err))
+            elif err_msg is None:
+                outcome['extent_name'] = details.used_by[0].split('/')[-1]
+                LOG.info("The storage volume %s contains an extent %s in"
+                         " %s", stor_vol, outcome['extent_name'],
+                         self.cl_name)
+            if err_msg:
+                LOG.error(err_msg)
+                outcome['failed'] = True
+                outcome['msg'] = err_msg
+                failed += 1
+            details_list.append(outcome)
+
+        self.result['changed'] = any(
+            outcome['changed'] for outcome in details_list)
+        self.result['extents_details'] = details_list
+        del self.result['extent_details']
+        if failed:
+            msg = "Could not create or name {0} of {1} extents in {2}".format(
+                failed, len(specs), self.cl_name)
+            self.module.fail_json(msg=msg, **self.result)
+        utils.exit_module(self.module, self.client, **self.result)
+
     def name_check(self, extent_name, field):
         """Check the validity of extent name """
         char_len = '63'
@@ -446,6 +747,10 @@ class VplexExtent():  # pylint:disable=R0902
         specified in the playbook
         """
         state = self.module.params['state']
+        if self.module.params['storage_volumes'] or \
+                self.module.params['storage_array_name']:
+            self.perform_bulk_operation()
+
         extent_name = self.module.params['extent_name']
         storage_volume_name = self.module.params['storage_volume_name']
         storage_volume_id = self.module.params['storage_volume_id']
@@ -474,7 +779,11 @@ class VplexExtent():  # pylint:disable=R0902
             (used, extent_info, storvol) = \
                 self.is_storvol_inuse(stor, ext_name)  # pylint:disable=W0612
             if extent_name:
-                ext_info = self.get_extent(extent_name)
+                if extent_info is not None and \
+                        extent_info.name == extent_name:
+                    ext_info = extent_info
+                else:
+                    ext_info = self.get_extent(extent_name)
                 if extent_info is not None and ext_info is not None:
                     if ext_info.name == extent_info.name:
                         extent_info = ext_info
@@ -582,7 +891,7 @@ class VplexExtent():  # pylint:disable=R0902
             ext = utils.serialize_content(extent_details)
             extent_details = ext
         self.result["extent_details"] = extent_details
-        self.module.exit_json(**self.result)
+        utils.exit_module(self.module, self.client, **self.result)
 
 
 def get_vplex_extent_parameters():
@@ -594,6 +903,9 @@ def get_vplex_extent_parameters():
         new_extent_name=dict(required=False, type='str'),
         storage_volume_name=dict(required=False, type='str'),
         storage_volume_id=dict(required=False, type='str'),
+        storage_volumes=dict(required=False, type='list'),
+        storage_array_name=dict(required=False, type='str'),
+        max_workers=dict(required=False, type='int', default=4),
         state=dict(required=True, type='str')
     )
 
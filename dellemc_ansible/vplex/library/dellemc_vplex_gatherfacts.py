@@ -3,7 +3,17 @@
 # !/usr/bin/python
 # Copyright: (c) 2020, DellEMC
 
+import gzip
+import hashlib
+import inspect
+import operator
+import os
+import re
+import tempfile
+from json import dumps, loads
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils._text import to_bytes
+from ansible.module_utils.six import string_types
 from ansible.module_utils.storage.dell import \
     dellemc_ansible_vplex_utils as utils
 
@@ -29,6 +39,13 @@ extends_documentation_fragment:
 author:
 - Mohana Priya Sivalingam (@mohanapriya-dell) <vplex.ansible@dell.com>
 options:
+  cluster_name:
+    description:
+    - Name of the cluster to gather the per cluster subsets from.
+    - When not given, the per cluster subsets are gathered from all the
+      clusters concurrently and returned by cluster name.
+    type: str
+    default: ''
   gather_subset:
     description:
     - List of string variables to specify the VPLEX entities for which
@@ -48,11 +65,78 @@ options:
     - amp - array management providers
     - be_port - back end ports
     - device_mig_job - device migration jobs
+    - topology - relationship graph of the storage volumes, extents,
+      devices, virtual volumes, storage views and consistency groups,
+      local and distributed
     required: True
     type: list
     choices: [stor_array, stor_vol, stor_view, port, initiator, virt_vol, cg,
               device, extent, dist_device, dist_cg, dist_virt_vol, amp,
-              be_port, device_mig_job]
+              be_port, device_mig_job, topology]
+  fields:
+    description:
+    - List of attributes to return for each object of the gathered subsets,
+      for example capacity and use of the storage volumes.
+    - The attributes are read from the lists the module fetches, so no
+      additional call is made to VPLEX.
+    - When given, each object is returned as a dictionary holding its name
+      and the attributes it has among the given ones.
+    - Not applied to topology, nor are filters and since_snapshot.
+    - When not given, only the object names are returned.
+    type: list
+  filters:
+    description:
+    - List of conditions the objects of the gathered subsets must all meet
+      to be returned.
+    - Each condition is a dictionary with the attribute in field, the
+      comparison in operator and the value to compare with in value.
+    - operator is one of eq (default), ne, lt, le, gt, ge and regex. regex
+      searches the attribute for the regular expression in value, for
+      example on name.
+    - Sizes such as 80G or 1T can be given as value for the attributes in
+      bytes, like capacity.
+    - Equality conditions on text values are sent to VPLEX as query
+      parameters for the attributes the VPLEX API filters in the subset,
+      when the installed vplexapi SDK accepts them.
+      The module evaluates all the conditions in a single pass over each
+      subset, so the others are applied as well.
+    - Objects lacking the attribute of a condition are not returned.
+    type: list
+  output_path:
+    description:
+    - Path of a file to which the objects of the gathered subsets are
+      written instead of being returned, for very large inventories.
+    - The file holds one JSON object per line, with the subset in subset,
+      the object in data and, for the per cluster subsets, the cluster in
+      cluster. The subsets are fetched one at a time, and the large ones
+      page by page when the installed vplexapi SDK supports it, each page
+      being written as soon as it is fetched.
+    - Pages overlap and each object is written once, so objects deleted
+      while a subset is paged do not cause others to be skipped.
+    - The objects of topology are written last, one per line, with their
+      URI in the uri attribute of data.
+    - The file is compressed with gzip when the path ends with .gz.
+    - Only the path and the number of objects of each subset are
+      returned.
+    type: path
+  since_snapshot:
+    description:
+    - Path of a state file holding a fingerprint of each object gathered
+      by the previous run using the same file.
+    - When given, only the objects added or changed since that run are
+      returned for each subset, along with the names of the removed
+      objects, and the state file is updated.
+    - All the objects are returned as added when the state file does not
+      exist yet.
+    - Use one state file per combination of subsets, filters and fields.
+    type: path
+  max_workers:
+    description:
+    - Maximum number of subsets gathered concurrently.
+    - The subsets share the connection pool of the module.
+    - The subsets written to output_path are gathered one at a time.
+    type: int
+    default: 4
 '''
 
 EXAMPLES = r'''
@@ -83,6 +167,80 @@ EXAMPLES = r'''
     gather_subset:
       - stor_vol
 
+- name: Get name, capacity and use of storage volumes
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    gather_subset:
+      - stor_vol
+    fields:
+      - capacity
+      - use
+
+- name: Write storage volumes and virtual volumes to a file
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    gather_subset:
+      - stor_vol
+      - virt_vol
+    output_path: "/tmp/cluster-1_facts.jsonl.gz"
+
+- name: Get storage volumes changed since the previous run
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    gather_subset:
+      - stor_vol
+    fields:
+      - capacity
+      - use
+    since_snapshot: "/var/lib/cmdb/cluster-1_stor_vol.state"
+
+- name: Get unclaimed storage volumes of 80G or more
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    gather_subset:
+      - stor_vol
+    filters:
+      - field: use
+        value: unclaimed
+      - field: capacity
+        operator: ge
+        value: 80G
+
+- name: Get list of storage volumes of all clusters
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    gather_subset:
+      - stor_vol
+
+- name: Get the storage views exporting each storage volume
+  dellemc_vplex_gatherfacts:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    gather_subset:
+      - topology
+
 - name: Get list of back end ports
   dellemc_vplex_gatherfacts:
     vplexhost: "{{ vplexhost }}"
@@ -212,7 +370,9 @@ EXAMPLES = r'''
 
 RETURN = r'''
 Clusters:
-    description: List of clusters present in VPLEX
+    description: List of clusters present in VPLEX. The per cluster
+                 subsets are then dictionaries of the lists of each
+                 cluster, keyed by cluster name
     returned: when cluster name is not present
     type: complex
     contains:
@@ -237,6 +397,13 @@ Storage Volumes:
         name:
             description: Storage Volume names
             type: str
+        capacity:
+            description: Storage Volume capacity in bytes, when requested
+                         through fields
+            type: int
+        use:
+            description: Storage Volume use, when requested through fields
+            type: str
 
 Ports:
     description: List of Ports in a cluster
@@ -368,6 +535,74 @@ Device Migration Jobs:
         name:
             description: Device migration jobs names
             type: str
+
+Topology:
+    description: Storage objects of the clusters and distributed storage,
+                 keyed by URI
+    returned: When topology is in gather_subset and output_path is not
+              given
+    type: complex
+    contains:
+        type:
+            description: Collection of the object, like storage_volumes
+            type: str
+        name:
+            description: Name of the object
+            type: str
+        cluster:
+            description: Cluster of the object, null for distributed
+                         objects
+            type: str
+        uses:
+            description: URIs of the objects the object is built on,
+                         including the legs of the devices and of the
+                         distributed devices
+            type: list
+        used_by:
+            description: URIs of the objects built on the object
+            type: list
+        storage_views:
+            description: URIs of the storage views exporting the storage
+                         volume through its extents, devices and virtual
+                         volumes
+            type: list
+
+Delta:
+    description: When since_snapshot is given, each subset is a
+                 dictionary of the objects added, changed and removed
+                 since the previous run instead of a list
+    returned: When since_snapshot is given
+    type: complex
+    contains:
+        added:
+            description: Objects added since the previous run
+            type: list
+        changed:
+            description: Objects whose details changed since the previous
+                         run
+            type: list
+        removed:
+            description: Names of the objects removed since the previous
+                         run
+            type: list
+
+output_path:
+    description: Path of the file holding the objects of the subsets
+    returned: When output_path is given
+    type: str
+
+counts:
+    description: Number of objects of each subset written to output_path,
+                 by cluster name for the per cluster subsets when
+                 cluster name is not present
+    returned: When output_path is given
+    type: dict
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_gatherfacts')
@@ -375,6 +610,177 @@ LOG = utils.get_logger('dellemc_vplex_gatherfacts')
 HAS_VPLEXAPI_SDK = utils.has_vplexapi_sdk()
 
 
+# Subsets in the order in which they are gathered, along with the method
+# returning their details and whether they are gathered per cluster
+SUBSETS = [
+    ('stor_array', 'get_storage_array_list', True),
+    ('stor_vol', 'get_storage_volume_list', True),
+    ('port', 'get_port_list', True),
+    ('be_port', 'get_be_port_list', False),
+    ('initiator', 'get_initiator_list', True),
+    ('stor_view', 'get_storage_view_list', True),
+    ('virt_vol', 'get_virtual_volume_list', True),
+    ('cg', 'get_consistency_group_list', True),
+    ('device', 'get_device_list', True),
+    ('dist_device', 'get_distributed_device_list', False),
+    ('dist_cg', 'get_distributed_consistency_group_list', False),
+    ('dist_virt_vol', 'get_distributed_virtual_volume_list', False),
+    ('device_mig_job', 'get_device_migration_list', False),
+    ('amp', 'get_array_management_provider_list', True),
+    ('extent', 'get_extent_list', True),
+]
+
+
+# Number of objects fetched per request when the subsets are written to
+# output_path, for the listings of the VPLEX API taking limit and offset.
+# Consecutive pages overlap so that objects deleted between two requests
+# do not shift others past the next page, the objects listed twice being
+# written once
+PAGE_SIZE = 1000
+PAGE_OVERLAP = 50
+PAGED_METHODS = frozenset([
+    'get_storage_volumes',
+    'get_extents',
+    'get_devices',
+    'get_virtual_volumes',
+    'get_distributed_devices',
+    'get_distributed_virtual_volumes',
+])
+
+
+# Attributes which the listings of the VPLEX API accept as equality
+# query parameters. The filters on other attributes are only evaluated
+# by the module
+QUERY_FILTERS = {
+    'get_storage_arrays': ('name', 'connectivity_status'),
+    'get_storage_volumes': ('name', 'use', 'health_state',
+                            'operational_status', 'storage_array_name',
+                            'vendor_specific_name'),
+    'get_extents': ('name', 'use', 'health_state', 'storage_volume'),
+    'get_devices': ('name', 'geometry', 'health_state', 'virtual_volume'),
+    'get_virtual_volumes': ('name', 'locality', 'health_state',
+                            'service_status', 'consistency_group',
+                            'supporting_device'),
+    'get_consistency_groups': ('name', 'cache_mode'),
+    'get_storage_views': ('name', 'operational_status'),
+    'get_initiator_ports': ('name', 'type', 'port_wwn'),
+    'get_ports': ('name', 'director', 'role'),
+    'get_distributed_devices': ('name', 'geometry', 'health_state'),
+    'get_distributed_virtual_volumes': ('name', 'locality',
+                                        'health_state'),
+    'get_distributed_consistency_groups': ('name', 'cache_mode'),
+}
+
+
+# Argument specification of the listings of the SDK
+if hasattr(inspect, 'getfullargspec'):
+    get_argspec = inspect.getfullargspec  # pylint: disable=C0103
+else:
+    get_argspec = inspect.getargspec  # pylint: disable=C0103,W1505
+
+
+class GatherFactsError(Exception):
+    """Raised when the details of a subset could not be gathered"""
+
+
+FILTER_OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+}
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4,
+              'P': 1024 ** 5}
+
+
+def get_size(value):
+    """Returns the number of bytes of a size like 80G, or None if the
+    value is not a size"""
+
+    if isinstance(value, (int, float)):
+        return value
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)B?\s*$',
+                     str(value), re.IGNORECASE)
+    if not match:
+        return None
+    return int(float(match.group(1)) *
+               SIZE_UNITS.get(match.group(2).upper(), 1))
+
+
+def compile_condition(field, oper, value):
+    """Returns a function testing an object against one condition"""
+
+    if oper == 'regex':
+        pattern = re.compile(str(value))
+        return lambda item: item.get(field) is not None and \
+            pattern.search(str(item[field])) is not None
+
+    compare = FILTER_OPERATORS[oper]
+    size = get_size(value)
+
+    def condition(item):
+        """Compares the attribute of the object with the value"""
+        if field not in item:
+            return False
+        actual = item[field]
+        expected = value
+        if isinstance(actual, (int, float)) and size is not None:
+            expected = size
+        try:
+            return compare(actual, expected)
+        except TypeError:
+            return False
+    return condition
+
+
+def compile_filters(filters):
+    """Compiles the filters into the query parameters sent to VPLEX and
+    a function testing an object against all the filters"""
+
+    query_params = {}
+    conditions = []
+    for flt in filters or []:
+        if not isinstance(flt, dict) or not flt.get('field') or \
+                'value' not in flt:
+            raise ValueError("Each filter requires a field and a value")
+        oper = flt.get('operator') or 'eq'
+        if oper != 'regex' and oper not in FILTER_OPERATORS:
+            raise ValueError("Invalid operator {0} in the filter on {1}, "
+                             "valid operators are {2}".format(
+                                 oper, flt['field'], ', '.join(
+                                     sorted(FILTER_OPERATORS) +
+                                     ['regex'])))
+        try:
+            conditions.append(compile_condition(flt['field'], oper,
+                                                flt['value']))
+        except re.error as err:
+            raise ValueError("Invalid regular expression in the filter on "
+                             "{0}: {1}".format(flt['field'], str(err)))
+        if oper == 'eq' and isinstance(flt['value'], string_types):
+            query_params[flt['field']] = flt['value']
+    if not conditions:
+        return query_params, None
+    return query_params, lambda item: all(
+        condition(item) for condition in conditions)
+
+
+def get_accepted_params(method):
+    """Returns the names of the parameters a listing of the SDK accepts.
+    The generated methods take their query parameters as keyword
+    arguments, each documented by a :param line of their docstring, and
+    raise a TypeError for any other one"""
+
+    spec = get_argspec(method)
+    accepted = set(spec.args)
+    if getattr(spec, 'varkw', getattr(spec, 'keywords', None)):
+        accepted.update(re.findall(r':param\s+(?:\S+\s+)?(\w+):',
+                                   method.__doc__ or ''))
+    return accepted
+
+
 class VplexGatherFacts():
     """Class with Gather Facts operations"""
 
@@ -385,6 +791,7 @@ class VplexGatherFacts():
         self.module_params.update(get_vplex_gatherfacts_parameters())
         self.module = AnsibleModule(
             argument_spec=self.module_params,
+            mutually_exclusive=[['output_path', 'since_snapshot']],
             supports_check_mode=False
         )
 
@@ -424,6 +831,18 @@ class VplexGatherFacts():
                 LOG.error(msg)
                 self.module.fail_json(msg=msg)
 
+        try:
+            self.query_params, self.matches = compile_filters(
+                self.module.params['filters'])
+        except ValueError as err:
+            LOG.error(str(err))
+            self.module.fail_json(msg=str(err))
+        # Offset of the page to list, when the subsets are paged
+        self.page_offset = None
+        self.page_full = False
+        # Names of the clusters the subsets are gathered from
+        self.clusters = []
+
         LOG.info("Got VPLEX instance to access common lib methods "
                  "on VPLEX")
 
@@ -437,6 +856,30 @@ class VplexGatherFacts():
         LOG.info(msg)
         LOG.debug("Obtained %s details:\n%s\n", task, details)
 
+    def list_objects(self, method, *args):
+        """Calls the list method with the equality filters on the
+        attributes the VPLEX API filters for the method as query
+        parameters, and for a page of the objects only when paging. The
+        parameters the method of the SDK does not accept are not sent, the
+        filters being evaluated locally and all the objects listed
+        at once"""
+
+        accepted = get_accepted_params(method)
+        supported = set(QUERY_FILTERS.get(method.__name__, ())) & accepted
+        params = dict((field, value) for field, value in
+                      self.query_params.items() if field in supported)
+        if len(params) < len(self.query_params):
+            LOG.info("Filters evaluated locally for %s", method.__name__)
+        self.page_full = False
+        if self.page_offset is not None and \
+                method.__name__ in PAGED_METHODS and \
+                set(['limit', 'offset']) <= accepted:
+            obj = method(*args, limit=PAGE_SIZE, offset=self.page_offset,
+                         **params)
+            self.page_full = len(obj) == PAGE_SIZE
+            return obj
+        return method(*args, **params)
+
     def get_clusters(self):
         """Get the list of clusters in VPLEX"""
 
@@ -458,7 +901,8 @@ class VplexGatherFacts():
         try:
             storage_array = self.api_obj.StorageArrayApi(
                 api_client=self.client)
-            obj = storage_array.get_storage_arrays(cluster_name)
+            obj = self.list_objects(
+                storage_array.get_storage_arrays, cluster_name)
             self.logmsg('Storage Array', obj, cluster_name)
             array_details = utils.serialize_content(obj)
             return self.parse_data(array_details)
@@ -467,7 +911,7 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_storage_volume_list(self, cluster_name=None):
         """Get the list of storage volumes on a specific cluster
@@ -476,7 +920,8 @@ class VplexGatherFacts():
         try:
             storage_volume = self.api_obj.StorageVolumeApi(
                 api_client=self.client)
-            obj = storage_volume.get_storage_volumes(cluster_name)
+            obj = self.list_objects(
+                storage_volume.get_storage_volumes, cluster_name)
             self.logmsg('Storage Volume', obj, cluster_name)
             volume_details = utils.serialize_content(obj)
             return self.parse_data(volume_details)
@@ -485,14 +930,14 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_port_list(self, cluster_name=None):
         """Get the list of ports on a specific cluster in VPLEX"""
 
         try:
             port = self.api_obj.ExportsApi(api_client=self.client)
-            obj = port.get_ports(cluster_name)
+            obj = self.list_objects(port.get_ports, cluster_name)
             self.logmsg('Port', obj, cluster_name)
             port_details = utils.serialize_content(obj)
             return self.parse_data(port_details)
@@ -501,7 +946,7 @@ class VplexGatherFacts():
                        " error: {1}".format(cluster_name,
                                             utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_be_port_list(self):
         """Get the list of back end ports on a specific cluster in VPLEX"""
@@ -511,19 +956,20 @@ class VplexGatherFacts():
             obj = be_port.get_hardware_ports(role="back-end")
             self.logmsg('Back end Port', obj)
             port_details = utils.serialize_content(obj)
-            return port_details
+            return self.parse_data(port_details, names_only=False)
         except utils.ApiException as err:
             err_msg = ("Could not get Back end Ports due to"
                        " error: {0}".format(utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_initiator_list(self, cluster_name=None):
         """Get the list of initiators on a specific cluster in VPLEX"""
 
         try:
             initiator = self.api_obj.ExportsApi(api_client=self.client)
-            obj = initiator.get_initiator_ports(cluster_name)
+            obj = self.list_objects(
+                initiator.get_initiator_ports, cluster_name)
             self.logmsg('Initiator', obj, cluster_name)
             initiator_details = utils.serialize_content(obj)
             return self.parse_data(initiator_details, initiator=True)
@@ -532,7 +978,7 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_storage_view_list(self, cluster_name=None):
         """Get the list of storage views on a specific cluster
@@ -540,7 +986,8 @@ class VplexGatherFacts():
 
         try:
             storage_view = self.api_obj.ExportsApi(api_client=self.client)
-            obj = storage_view.get_storage_views(cluster_name)
+            obj = self.list_objects(
+                storage_view.get_storage_views, cluster_name)
             self.logmsg('Storage View', obj, cluster_name)
             view_details = utils.serialize_content(obj)
             return self.parse_data(view_details)
@@ -549,7 +996,7 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_virtual_volume_list(self, cluster_name=None):
         """Get the list of virtual volumes on a specific cluster
@@ -558,7 +1005,8 @@ class VplexGatherFacts():
         try:
             virtual_volume = self.api_obj.VirtualVolumeApi(
                 api_client=self.client)
-            obj = virtual_volume.get_virtual_volumes(cluster_name)
+            obj = self.list_objects(
+                virtual_volume.get_virtual_volumes, cluster_name)
             self.logmsg('Virtual Volume', obj, cluster_name)
             virt_vol_details = utils.serialize_content(obj)
             return self.parse_data(virt_vol_details)
@@ -567,7 +1015,7 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_consistency_group_list(self, cluster_name=None):
         """Get the list of consistency groups on a specific cluster
@@ -576,7 +1024,8 @@ class VplexGatherFacts():
         try:
             consistency_grp = self.api_obj.ConsistencyGroupApi(
                 api_client=self.client)
-            obj = consistency_grp.get_consistency_groups(cluster_name)
+            obj = self.list_objects(
+                consistency_grp.get_consistency_groups, cluster_name)
             self.logmsg('Consistency Group', obj, cluster_name)
             consistency_grp_details = utils.serialize_content(obj)
             return self.parse_data(consistency_grp_details)
@@ -585,14 +1034,14 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_device_list(self, cluster_name=None):
         """Get the list of local devices on a specific cluster in VPLEX"""
 
         try:
             device = self.api_obj.DevicesApi(api_client=self.client)
-            obj = device.get_devices(cluster_name)
+            obj = self.list_objects(device.get_devices, cluster_name)
             self.logmsg('Device', obj, cluster_name)
             device_details = utils.serialize_content(obj)
             return self.parse_data(device_details)
@@ -601,7 +1050,7 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_distributed_device_list(self):
         """Get the list of (metro) distributed devices in VPLEX"""
@@ -609,7 +1058,7 @@ class VplexGatherFacts():
         try:
             dist_dev = self.api_obj.DistributedStorageApi(
                 api_client=self.client)
-            obj = dist_dev.get_distributed_devices()
+            obj = self.list_objects(dist_dev.get_distributed_devices)
             self.logmsg('Distributed Device', obj)
             dist_device_details = utils.serialize_content(obj)
             return self.parse_data(dist_device_details)
@@ -617,7 +1066,7 @@ class VplexGatherFacts():
             err_msg = ("Could not get Distributed Devices due to"
                        " error: {0}".format(utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_distributed_consistency_group_list(self):
         """Get the list of distributed consistency groups in VPLEX"""
@@ -625,7 +1074,8 @@ class VplexGatherFacts():
         try:
             dist_cgp = self.api_obj.DistributedStorageApi(
                 api_client=self.client)
-            obj = dist_cgp.get_distributed_consistency_groups()
+            obj = self.list_objects(
+                dist_cgp.get_distributed_consistency_groups)
             self.logmsg('Distributed Consistency Group', obj)
             dist_cg_details = utils.serialize_content(obj)
             return self.parse_data(dist_cg_details)
@@ -633,7 +1083,7 @@ class VplexGatherFacts():
             err_msg = ("Could not get Distributed Consistency Groups due to"
                        " error: {0}".format(utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_distributed_virtual_volume_list(self):
         """Get the list of distributed virtual volumes in VPLEX"""
@@ -641,7 +1091,8 @@ class VplexGatherFacts():
         try:
             dist_virt_volume = self.api_obj.DistributedStorageApi(
                 api_client=self.client)
-            obj = dist_virt_volume.get_distributed_virtual_volumes()
+            obj = self.list_objects(
+                dist_virt_volume.get_distributed_virtual_volumes)
             self.logmsg('Distributed Virtual Volume', obj)
             dist_virvol_details = utils.serialize_content(obj)
             return self.parse_data(dist_virvol_details)
@@ -649,7 +1100,7 @@ class VplexGatherFacts():
             err_msg = ("Could not get Distributed Virtual Volumes due to"
                        " error: {0}".format(utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_array_management_provider_list(self, cluster_name=None):
         """Get the list of registered array manamgement providers on a
@@ -657,7 +1108,8 @@ class VplexGatherFacts():
 
         try:
             amps = self.api_obj.AmpApi(api_client=self.client)
-            obj = amps.get_array_management_providers(cluster_name)
+            obj = self.list_objects(
+                amps.get_array_management_providers, cluster_name)
             self.logmsg('Array Management Provider', obj, cluster_name)
             amp_details = utils.serialize_content(obj)
             return self.parse_data(amp_details)
@@ -666,14 +1118,14 @@ class VplexGatherFacts():
                        " due to error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_extent_list(self, cluster_name=None):
         """Get the list of extents on a specific cluster in VPLEX"""
 
         try:
             extent = self.api_obj.ExtentApi(api_client=self.client)
-            obj = extent.get_extents(cluster_name)
+            obj = self.list_objects(extent.get_extents, cluster_name)
             self.logmsg('Extent', obj, cluster_name)
             device_details = utils.serialize_content(obj)
             return self.parse_data(device_details)
@@ -682,14 +1134,14 @@ class VplexGatherFacts():
                        " error: {1}".format(
                            cluster_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
 
     def get_device_migration_list(self):
         """Get the list of device migration jobs in VPLEX"""
 
         try:
             device_mig = self.api_obj.DataMigrationApi(api_client=self.client)
-            obj = device_mig.get_device_migrations()
+            obj = self.list_objects(device_mig.get_device_migrations)
             self.logmsg('Device migration job', obj)
             device_mig_details = utils.serialize_content(obj)
             return self.parse_data(device_mig_details)
@@ -697,114 +1149,299 @@ class VplexGatherFacts():
             err_msg = ("Could not get Device migration jobs due to"
                        " error: {0}".format(utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+            raise GatherFactsError(err_msg)
+
+    def get_subset_details(self, call):
+        """Get the details of a subset as listed in SUBSETS, from the
+        cluster of the call if the subset is gathered per cluster"""
+
+        _, method, cluster = call
+        if cluster:
+            return getattr(self, method)(cluster)
+        return getattr(self, method)()
+
+    def get_topology(self):
+        """Get the relationship graph of the storage objects of the
+        gathered clusters and of the distributed storage"""
+
+        try:
+            graph = utils.build_storage_graph(
+                self.client, self.clusters, self.module.params['max_workers'])
+            LOG.info("Got topology of %d objects", len(graph.objects))
+            return graph.to_dict()
+        except utils.ApiException as err:
+            err_msg = ("Could not get the topology due to"
+                       " error: {0}".format(utils.error_msg(err)))
+            LOG.error("%s\n%s\n", err_msg, err)
+            raise GatherFactsError(err_msg)
+
+    def get_topology_list(self):
+        """Get the objects of the topology as a list, each along with
+        its URI"""
+
+        topology = self.get_topology()
+        return [dict(topology[uri], uri=uri) for uri in sorted(topology)]
+
+    def collect_results(self, calls, results, by_cluster=False):
+        """Returns the results of the calls by subset, and by cluster for
+        the per cluster subsets if by_cluster is set, or reports the first
+        failure in the order of the calls"""
+
+        facts = {}
+        for (item, _, cluster), (details, err) in zip(calls, results):
+            if isinstance(err, GatherFactsError):
+                self.module.fail_json(msg=str(err))
+            elif err is not None:
+                err_msg = ("Could not get the {0} details due to"
+                           " error: {1}".format(item, str(err)))
+                LOG.error("%s\n%s\n", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+            if by_cluster and cluster:
+                facts.setdefault(item, {})[cluster] = details
+            else:
+                facts[item] = details
+        return facts
+
+    def write_subsets(self, calls, output_path, by_cluster=False):
+        """Writes the objects of the subsets to output_path in JSON Lines
+        one subset at a time, each page as it is fetched, and returns the
+        number of objects of each subset"""
 
-    def parse_data(self, obj_data, initiator=False):   # pylint: disable=R0201
+        try:
+            handle, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(output_path)),
+                prefix='.gatherfacts')
+        except (IOError, OSError) as err:
+            err_msg = "Could not write facts to {0} due to error: {1}".format(
+                output_path, str(err))
+            LOG.error(err_msg)
+            self.module.fail_json(msg=err_msg)
+        output = raw_output = os.fdopen(handle, 'wb')
+        if output_path.endswith('.gz'):
+            output = gzip.GzipFile(fileobj=raw_output, mode='wb')
+
+        def write_subset(call):
+            """Fetches a subset page by page and writes its objects"""
+            line = {'subset': call[0]}
+            if call[2]:
+                line['cluster'] = call[2]
+            count = 0
+            self.page_offset = 0
+            # Names of the objects of the previous pages
+            previous = set()
+            try:
+                while True:
+                    details = self.get_subset_details(call)
+                    names = set()
+                    for item in details:
+                        name = item['name'] if isinstance(item, dict) \
+                            else item
+                        names.add(name)
+                        if name in previous:
+                            continue
+                        line['data'] = item
+                        output.write(to_bytes(dumps(line)) + b'\n')
+                        count += 1
+                    if not self.page_full:
+                        return count
+                    previous.update(names)
+                    self.page_offset += PAGE_SIZE - PAGE_OVERLAP
+            except (IOError, OSError) as err:
+                err_msg = ("Could not write facts to {0} due to"
+                           " error: {1}".format(output_path, str(err)))
+                LOG.error(err_msg)
+                raise GatherFactsError(err_msg)
+            finally:
+                self.page_offset = None
+
+        # A single subset is held in memory at a time, so they are not
+        # fetched concurrently
+        results = utils.run_concurrently(write_subset, calls, 1)
+        try:
+            output.close()
+            raw_output.close()
+            if not any(err for _, err in results):
+                os.rename(tmp_path, output_path)
+        except (IOError, OSError) as err:
+            results = [(None, GatherFactsError(
+                "Could not write facts to {0} due to error: {1}".format(
+                    output_path, str(err))))] * len(results)
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return self.collect_results(calls, results, by_cluster)
+
+    def parse_data(self, obj_data, initiator=False, gathered=True,
+                   names_only=True):
         """This method parses the fields in the object data and
-        returns as a list"""
+        returns as a list. The objects of the gathered subsets are
+        filtered, and returned along with their key and fingerprint
+        when since_snapshot is given"""
 
         parsed_list = []
+        fields = self.module.params['fields']
+        matches = self.matches if gathered else None
+        delta = gathered and self.module.params['since_snapshot']
         LOG.info('Parse the entire details to fetch a list of required data')
         for item in obj_data:
-            if initiator is True:
+            if matches and not matches(item):
+                continue
+            if fields:
+                parsed = dict((field, item[field]) for field in
+                              ['name'] + fields if field in item)
+            elif initiator is True:
                 if 'type' in item.keys():
-                    parsed_list.append(dict({'name': item['name'],
-                                             'type': item['type']}))
+                    parsed = dict({'name': item['name'],
+                                   'type': item['type']})
                 else:
-                    parsed_list.append(dict({'name': item['name']}))
+                    parsed = dict({'name': item['name']})
+            elif names_only:
+                parsed = item['name']
+            else:
+                parsed = item
+            if delta:
+                # Hardware ports are only named uniquely per director
+                key = item['name'] if 'director' not in item else \
+                    '{0}/{1}'.format(item['director'], item['name'])
+                fingerprint = hashlib.sha1(to_bytes(dumps(
+                    item, sort_keys=True))).hexdigest()[:16]
+                parsed_list.append((key, fingerprint, parsed))
             else:
-                parsed_list.append(item['name'])
+                parsed_list.append(parsed)
         return parsed_list
 
+    def load_snapshot(self, path):
+        """Returns the fingerprints of the objects stored in the state
+        file by the previous run"""
+
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as state_file:
+                return loads(state_file.read())
+        except (IOError, OSError, ValueError) as err:
+            err_msg = ("Could not read the state file {0} due to"
+                       " error: {1}".format(path, str(err)))
+            LOG.error(err_msg)
+            self.module.fail_json(msg=err_msg)
+
+    def save_snapshot(self, path, snapshot):
+        """Atomically replaces the state file with the fingerprints of the
+        objects gathered by this run"""
+
+        try:
+            handle, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(path)),
+                prefix='.gatherfacts')
+            with os.fdopen(handle, 'w') as state_file:
+                state_file.write(dumps(snapshot, separators=(',', ':')))
+            os.rename(tmp_path, path)
+        except (IOError, OSError) as err:
+            err_msg = ("Could not write the state file {0} due to"
+                       " error: {1}".format(path, str(err)))
+            LOG.error(err_msg)
+            self.module.fail_json(msg=err_msg)
+
+    def get_deltas(self, calls, results, path):
+        """Replaces the results of the calls by the objects added,
+        changed and removed since the snapshot of the state file, and
+        stores the new snapshot"""
+
+        snapshot = self.load_snapshot(path)
+        deltas = []
+        for (item, _, cluster), (details, err) in zip(calls, results):
+            if err is not None:
+                deltas.append((None, err))
+                continue
+            key = '{0}@{1}'.format(item, cluster) if cluster else item
+            previous = snapshot.get(key, {})
+            current = {}
+            delta = {'added': [], 'changed': [], 'removed': []}
+            for name, fingerprint, parsed in details:
+                current[name] = fingerprint
+                if name not in previous:
+                    delta['added'].append(parsed)
+                elif previous[name] != fingerprint:
+                    delta['changed'].append(parsed)
+            delta['removed'] = sorted(
+                name for name in previous if name not in current)
+            snapshot[key] = current
+            deltas.append((delta, None))
+        if not any(err for _, err in deltas):
+            self.save_snapshot(path, snapshot)
+        return deltas
+
     def perform_module_operation(self):    # pylint: disable=R0914,R0912,R0915
         """This method invokes the user VPLEX operation"""
 
         cluster_name = self.module.params['cluster_name']
         subset = self.module.params['gather_subset']
-        nondistributed_check = False
         cluster_obj = self.get_clusters()
         cluster_details = utils.serialize_content(cluster_obj)
-        cluster_list = self.parse_data(cluster_details)
+        cluster_list = self.parse_data(cluster_details, gathered=False)
 
         if subset is not None:
-            cluster_list = []
-            storage_array = []
-            storage_volume = []
-            port = []
-            be_port = []
-            initiator = []
-            storage_view = []
-            virtual_volume = []
-            conscy_gp = []
-            device = []
-            dist_device = []
-            dist_cg = []
-            dist_virt_vol = []
-            amp = []
-            extent = []
-            device_mig_job = []
-
-            # Local list to avoid cluster name dependency for distributed cases
-            temp_list = ['stor_array', 'stor_vol', 'port', 'initiator',
-                         'stor_view', 'virt_vol', 'device', 'cg', 'amp',
-                         'extent', 'be_port', 'device_mig_job']
-            for item in temp_list:
-                if item in subset:
-                    nondistributed_check = True
-                    break
-
-            if ((cluster_name == '') and (nondistributed_check is True)):
-                self.module.exit_json(Clusters=cluster_details)
-            else:
-                if 'stor_array' in subset:
-                    storage_array = self.get_storage_array_list(cluster_name)
-                if 'stor_vol' in subset:
-                    storage_volume = self.get_storage_volume_list(cluster_name)
-                if 'port' in subset:
-                    port = self.get_port_list(cluster_name)
-                if 'be_port' in subset:
-                    be_port = self.get_be_port_list()
-                if 'initiator' in subset:
-                    initiator = self.get_initiator_list(cluster_name)
-                if 'stor_view' in subset:
-                    storage_view = self.get_storage_view_list(cluster_name)
-                if 'virt_vol' in subset:
-                    virtual_volume = self.get_virtual_volume_list(cluster_name)
-                if 'cg' in subset:
-                    conscy_gp = self.get_consistency_group_list(cluster_name)
-                if 'device' in subset:
-                    device = self.get_device_list(cluster_name)
-                if 'dist_device' in subset:
-                    dist_device = self.get_distributed_device_list()
-                if 'dist_cg' in subset:
-                    dist_cg = self.get_distributed_consistency_group_list()
-                if 'dist_virt_vol' in subset:
-                    dist_virt_vol = self.get_distributed_virtual_volume_list()
-                if 'device_mig_job' in subset:
-                    device_mig_job = self.get_device_migration_list()
-                if 'amp' in subset:
-                    amp = self.get_array_management_provider_list(cluster_name)
-                if 'extent' in subset:
-                    extent = self.get_extent_list(cluster_name)
-                self.module.exit_json(
-                    StorageArrays=storage_array,
-                    StorageVolumes=storage_volume,
-                    Ports=port,
-                    BackEndPorts=be_port,
-                    Initiators=initiator,
-                    StorageViews=storage_view,
-                    VirtualVolumes=virtual_volume,
-                    ConsistencyGroups=conscy_gp,
-                    Devices=device,
-                    Extents=extent,
-                    DistributedDevices=dist_device,
-                    DistributedConsistencyGroups=dist_cg,
-                    DistributedVirtualVolumes=dist_virt_vol,
-                    DeviceMigrationJob=device_mig_job,
-                    ArrayManagementProviders=amp)
+            # Without cluster name, the per cluster subsets are gathered
+            # from all the clusters
+            self.clusters = [cluster_name] if cluster_name else \
+                [cluster['name'] for cluster in cluster_details]
+            calls = []
+            for item, method, per_cluster in SUBSETS:
+                if item not in subset:
+                    continue
+                if per_cluster:
+                    calls.extend((item, method, cluster)
+                                 for cluster in self.clusters)
+                else:
+                    calls.append((item, method, None))
+            by_cluster = not cluster_name and any(
+                call[2] for call in calls)
+            # Clusters are returned along with the facts keyed by cluster
+            extra_facts = {'Clusters': cluster_details} if by_cluster \
+                else {}
+            output_path = self.module.params['output_path']
+            if output_path:
+                if 'topology' in subset:
+                    calls.append(('topology', 'get_topology_list', None))
+                counts = self.write_subsets(calls, output_path, by_cluster)
+                utils.exit_module(
+                    self.module, self.client,
+                    output_path=output_path,
+                    counts=counts,
+                    **extra_facts)
+            if 'topology' in subset:
+                try:
+                    extra_facts['Topology'] = self.get_topology()
+                except GatherFactsError as err:
+                    self.module.fail_json(msg=str(err))
+            results = utils.run_concurrently(
+                self.get_subset_details, calls,
+                self.module.params['max_workers'])
+            if self.module.params['since_snapshot']:
+                results = self.get_deltas(
+                    calls, results, self.module.params['since_snapshot'])
+            facts = self.collect_results(calls, results, by_cluster)
+            utils.exit_module(
+                self.module, self.client,
+                StorageArrays=facts.get('stor_array', []),
+                StorageVolumes=facts.get('stor_vol', []),
+                Ports=facts.get('port', []),
+                BackEndPorts=facts.get('be_port', []),
+                Initiators=facts.get('initiator', []),
+                StorageViews=facts.get('stor_view', []),
+                VirtualVolumes=facts.get('virt_vol', []),
+                ConsistencyGroups=facts.get('cg', []),
+                Devices=facts.get('device', []),
+                Extents=facts.get('extent', []),
+                DistributedDevices=facts.get('dist_device', []),
+                DistributedConsistencyGroups=facts.get('dist_cg', []),
+                DistributedVirtualVolumes=facts.get('dist_virt_vol', []),
+                DeviceMigrationJob=facts.get('device_mig_job', []),
+                ArrayManagementProviders=facts.get('amp', []),
+                **extra_facts)
 
         else:
-            self.module.exit_json(Clusters=cluster_list)
+            utils.exit_module(self.module, self.client,
+                              Clusters=cluster_list)
 
 
 def get_vplex_gatherfacts_parameters():
@@ -828,7 +1465,13 @@ def get_vplex_gatherfacts_parameters():
                                     'dist_virt_vol',
                                     'device_mig_job',
                                     'amp',
+                                    'topology',
                                     ]),
+        fields=dict(type='list', required=False),
+        filters=dict(type='list', required=False),
+        output_path=dict(type='path', required=False),
+        since_snapshot=dict(type='path', required=False),
+        max_workers=dict(type='int', required=False, default=4),
 
     )
 
@@ -207,6 +207,12 @@ Initiator Details:
         type:
             description: Host operating system
             type: str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_initiator')
@@ -286,7 +292,8 @@ class VplexInitiator():    # pylint:disable=R0902
 
         # result is a dictionary that contains changed status and
         # initiator details
-        self.result = {"changed": False, "initiator_details": {}}
+        self.result = {
+            "changed": False, "initiator_details": {}}
 
     def get_initiator(self, initiator_name):
         """
@@ -482,7 +489,7 @@ class VplexInitiator():    # pylint:disable=R0902
             if initiator_details:
                 initiator_details = utils.serialize_content(initiator_details)
             self.result["initiator_details"] = initiator_details
-            self.module.exit_json(**self.result)
+            utils.exit_module(self.module, self.client, **self.result)
 
         # Perform rediscover initiators and keep it for idempotency
         details = self.rediscover_initiator()
@@ -127,6 +127,12 @@ Port Details:
         port_wwn:
             description: WWN of the port to register
             type: str
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_port')
@@ -192,7 +198,8 @@ class VplexPort():  # pylint:disable=R0902
 
         # result is a dictionary that contains changed status and
         # port details
-        self.result = {"changed": False, "port_details": {}}
+        self.result = {
+            "changed": False, "port_details": {}}
 
     def get_port(self):
         """
@@ -263,7 +270,7 @@ class VplexPort():  # pylint:disable=R0902
         if port_details:
             port_details = utils.serialize_content(port_details)
         self.result["port_details"] = port_details
-        self.module.exit_json(**self.result)
+        utils.exit_module(self.module, self.client, **self.result)
 
 
 def get_vplex_port_parameters():
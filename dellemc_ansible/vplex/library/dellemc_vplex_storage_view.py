@@ -3,6 +3,8 @@
 # !/usr/bin/python
 # Copyright: (c) 2020, DellEMC
 
+import heapq
+import time
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.storage.dell import \
         dellemc_ansible_vplex_utils as utils
@@ -28,7 +30,8 @@ description:
   Add initiator to the storage view,
   Remove initiator from the storage view,
   Add virtual volume to the storage view,
-  Remove virtual volume from the storage view.
+  Remove virtual volume from the storage view,
+  Synchronize the ports, initiators and virtual volumes of the storage view.
 extends_documentation_fragment:
   - dellemc_vplex.dellemc_vplex
 author:
@@ -44,7 +47,29 @@ options:
   storage_view_name:
     description:
     - Name of the storage view
-    required: true
+    - Either storage_view_name or storage_views is required
+    type: str
+
+  storage_views:
+    description:
+    - Names of the storage views among which the virtual volumes given are
+      balanced, each virtual volume being added to one of them
+    - The storage views are updated concurrently, with a single update per
+      storage view
+    - Virtual volumes present in any of the storage views already are left
+      where they are
+    type: list
+
+  balance:
+    description:
+    - Policy used to assign the virtual volumes to the storage_views
+    - round-robin assigns them in turn, in the order given
+    - capacity assigns the largest virtual volumes first, each to the
+      storage view with the least capacity exported
+    - load assigns each virtual volume to the storage view with the fewest
+      virtual volumes
+    choices: ['round-robin', 'capacity', 'load']
+    default: 'round-robin'
     type: str
 
   ports:
@@ -85,6 +110,34 @@ options:
     - New name of the storage view
     type: str
 
+  membership:
+    description:
+    - incremental adds or removes the ports, initiators and virtual volumes
+      given, according to port_state, initiator_state and
+      virtual_volume_state.
+    - exact makes each of the lists given the complete list of members of
+      the storage view, adding the missing ones and removing the others in
+      a single update. The lists not given are left unchanged, and an empty
+      list removes all the members.
+    - The states can not be given with exact.
+    choices: ['incremental', 'exact']
+    default: 'incremental'
+    type: str
+
+  batch_size:
+    description:
+    - Maximum number of ports, initiators and virtual volumes added or
+      removed by each update call sent to VPLEX. Larger changes are split
+      into chunks, each retried when VPLEX is busy or times out.
+    default: 50
+    type: int
+
+  max_workers:
+    description:
+    - Maximum number of concurrent calls made to VPLEX
+    default: 4
+    type: int
+
   state:
     description:
     - Define whether the storage view should exist or not
@@ -210,6 +263,32 @@ EXAMPLES = r'''
         virtual_volumes: ["ansible_virvol_1", "ansible_virvol_2"]
         virtual_volume_state: "absent-in-view"
         state: "present"
+
+    - name: Synchronize the initiators and virtual volumes of storage view
+      dellemc_vplex_storage_view:
+        vplexhost: "{{ vplexhost }}"
+        vplexuser: "{{ vplexuser }}"
+        vplexpassword: "{{ vplexpassword }}"
+        verifycert: "{{ verifycert }}"
+        cluster_name: "cluster-1"
+        storage_view_name: "ansible_stor_view"
+        initiators: ["ansible_init_1", "ansible_init_2"]
+        virtual_volumes: ["ansible_virvol_1", "ansible_virvol_3"]
+        membership: "exact"
+        state: "present"
+
+    - name: Balance virtual volumes over storage views by capacity
+      dellemc_vplex_storage_view:
+        vplexhost: "{{ vplexhost }}"
+        vplexuser: "{{ vplexuser }}"
+        vplexpassword: "{{ vplexpassword }}"
+        verifycert: "{{ verifycert }}"
+        cluster_name: "cluster-1"
+        storage_views: ["ansible_stor_view_1", "ansible_stor_view_2"]
+        virtual_volumes: ["ansible_virvol_1", "ansible_virvol_2",
+                          "ansible_virvol_3"]
+        balance: "capacity"
+        state: "present"
 '''
 
 RETURN = r'''
@@ -242,11 +321,52 @@ Storage View Details:
         ports:
             description: List of ports attached to the storage view
             type: list
+
+assignment:
+    description: Names of the virtual volumes added to each storage view
+    returned: When storage_views is given
+    type: dict
+
+storageviews_details:
+    description: Details of each of the storage views, with the same keys
+                 as the Storage View Details
+    returned: When storage_views is given
+    type: list
+
+pending_operations:
+    description: Patch operations of each storage view left unapplied when
+                 an update fails partway. The failure reports changed
+                 along with the details of the storage views read back
+                 after the failure.
+    returned: When the update of a storage view fails
+    type: dict
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_storage_view')
 HAS_VPLEXAPI_SDK = utils.has_vplexapi_sdk()
 
+# Attempts made for each chunk of a storage view update, and the HTTP
+# status codes for which a chunk is retried
+PATCH_ATTEMPTS = 3
+PATCH_RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class StorageViewUpdateError(Exception):
+    """Raised when the update of a storage view fails partway, with the
+    details of the view read back and the operations not applied"""
+
+    def __init__(self, err, details, pending):
+        super(StorageViewUpdateError, self).__init__(str(err))
+        self.err = err
+        self.details = details
+        self.pending = pending
+
 
 class VplexStorageview():  # pylint:disable=R0902
     ''' class with storage view operations '''
@@ -260,6 +380,8 @@ class VplexStorageview():  # pylint:disable=R0902
 
         self.module = AnsibleModule(
             argument_spec=self.module_params,
+            mutually_exclusive=[['storage_view_name', 'storage_views']],
+            required_one_of=[['storage_view_name', 'storage_views']],
             supports_check_mode=False
         )
 
@@ -314,11 +436,32 @@ class VplexStorageview():  # pylint:disable=R0902
         self.ini_state = self.module.params['initiator_state']
         self.virvols = self.module.params['virtual_volumes']
         self.virvol_state = self.module.params['virtual_volume_state']
+        self.membership = self.module.params['membership']
         self.vir_vol = {}
+        self.vv_index = {}
+        self.distvv_index = {}
+        self.exports_index = {}
+        self.exports = None
+
+        # In exact mode the lists given are added and the members absent
+        # from them removed
+        if self.membership == 'exact':
+            if self.pt_state or self.ini_state or self.virvol_state:
+                msg = ("port_state, initiator_state and virtual_volume_state"
+                       " can not be given with exact membership")
+                LOG.error(msg)
+                self.module.fail_json(msg=msg)
+            if self.ports is not None:
+                self.pt_state = 'present-in-view'
+            if self.initiators is not None:
+                self.ini_state = 'present-in-view'
+            if self.virvols is not None:
+                self.virvol_state = 'present-in-view'
 
         # result is a dictionary that contains changed status and
         # storage view details
-        self.result = {"changed": False, "storageview_details": {}}
+        self.result = {
+            "changed": False, "storageview_details": {}}
 
     def create_storageview(self):
         """
@@ -469,20 +612,11 @@ class VplexStorageview():  # pylint:disable=R0902
 
         # Construct the payload for virtual volumes
         virtual_volumes = []
-        volume = []
         final_virtual_volumes = []
         for obj in storageview_details['virtual_volumes']:
             virtual_volumes.append(obj['uri'])
 
-        urid = "/vplex/v2/distributed_storage/distributed_virtual_volumes"
-        uri = "/vplex/v2/clusters/{}/virtual_volumes/{}"
-        for key, val in self.vir_vol.items():
-            if key == "distvv" and len(self.vir_vol[key]) != 0:
-                for data in val:
-                    volume.append(urid + "/{}".format(data))
-            else:
-                for data in val:
-                    volume.append(uri.format(key, data))
+        volume = self.get_virtual_volume_uris()
         # Get the list of virtual volumes from the storageview list
         if self.virvols and self.virvol_state == 'present-in-view':
             for vols in volume:
@@ -496,10 +630,10 @@ class VplexStorageview():  # pylint:disable=R0902
                              " in %s in %s", vols.split('/')[-1],
                              vols.split('/')[-3], self.st_name, self.cl_name)
 
+            # Check if the virtual volumes are used by any storage view
+            in_use = self.get_virtual_vols_in_use(final_virtual_volumes)
             for vols in final_virtual_volumes:
-                # Check if the virtual volume is used by any storage view
-                status = self.is_virtual_vol_in_use(vols)
-                if status:
+                if vols in in_use:
                     msg = "In {0} you are adding a Virtual Volume {1} "
                     msg = msg + "which is already exported to another "
                     msg = msg + "Storage View. This may expose data "
@@ -526,22 +660,356 @@ class VplexStorageview():  # pylint:disable=R0902
                 patch_payload.append(self.payload(
                     'remove', '/virtual_volumes', volume))
 
+        if self.membership == 'exact':
+            patch_payload.extend(self.get_exact_removals(
+                storageview_details, volume))
+
         if not patch_payload:
             return storageview_details, changed
 
+        storageview_details = self.apply_patches(
+            [(self.st_name, patch_payload)])[0]
+        return storageview_details, True
+
+    def assign_virtual_volumes(self):
+        """
+        Balances the virtual volumes over the storage views and adds them,
+        the storage views being updated concurrently
+        """
+        views = self.module.params['storage_views']
+        if self.module.params['state'] != 'present' or not self.virvols or \
+                self.virvol_state == 'absent-in-view' or \
+                self.membership == 'exact' or self.new_st_name or \
+                self.ports or self.initiators:
+            msg = ("storage_views only adds the virtual_volumes given to"
+                   " storage views with state present")
+            LOG.error(msg)
+            self.module.fail_json(msg=msg)
+        self.virvol_state = 'present-in-view'
+
+        # List the storage views once
         try:
-            storageview_details = self.storageview.patch_storage_view(
-                self.cl_name, self.st_name, patch_payload)
-            LOG.info("Successfully updated the storageview %s in %s",
-                     self.st_name, self.cl_name)
-            LOG.debug("Storageview details: %s", storageview_details)
-            return storageview_details, True
+            storageviews = utils.serialize_content(
+                self.storageview.get_storage_views(self.cl_name)) or []
         except utils.ApiException as err:
-            err_msg = ("Could not update the storageview {0} in {1}"
-                       " due to error: {2}".format(
-                           self.st_name, self.cl_name, utils.error_msg(err)))
+            err_msg = ("Could not get the storageviews in {0} due to error:"
+                       " {1}".format(self.cl_name, utils.error_msg(err)))
             LOG.error("%s\n%s\n", err_msg, err)
             self.module.fail_json(msg=err_msg)
+        storageviews = dict((view['name'], view) for view in storageviews)
+        for view in views:
+            if view not in storageviews:
+                msg = "Storage view {0} not present in {1}".format(
+                    view, self.cl_name)
+                LOG.error(msg)
+                self.module.fail_json(msg=msg)
+
+        members = dict((view, set(
+            utils.get_ref_uri(ref)
+            for ref in storageviews[view]['virtual_volumes'] or []))
+                       for view in views)
+        exported = set()
+        for uris in members.values():
+            exported.update(uris)
+
+        # Resolve each virtual volume once, in the order given
+        self.resolve_virtual_volumes(', '.join(views))
+        uris = {}
+        for uri in self.get_virtual_volume_uris():
+            uris.setdefault(uri.split('/')[-1], uri)
+        volumes = []
+        for vol in self.virvols:
+            uri = uris.get(vol)
+            if uri is None or uri in volumes:
+                continue
+            if uri in exported:
+                LOG.info("The virtual volume %s is already present in one of"
+                         " the storage views in %s", vol, self.cl_name)
+                continue
+            volumes.append(uri)
+
+        assignment = self.balance_virtual_volumes(views, members, volumes)
+        in_use = self.get_virtual_vols_in_use(volumes)
+        patches = []
+        for view in views:
+            patch_payload = []
+            for vols in assignment[view]:
+                LOG.info("Adding virtual volume %s of %s to storageview %s"
+                         " in %s", vols.split('/')[-1], vols.split('/')[-3],
+                         view, self.cl_name)
+                if vols in in_use:
+                    msg = "In {0} you are adding a Virtual Volume {1} "
+                    msg = msg + "which is already exported to another "
+                    msg = msg + "Storage View. This may expose data "
+                    msg = msg + "already in use to this Storage View {2}"
+                    LOG.warning(msg.format(
+                        self.cl_name, vols.split('/')[-1], view))
+                patch_payload.append(self.payload(
+                    'add', '/virtual_volumes', vols))
+            if patch_payload:
+                patches.append((view, patch_payload))
+
+        details = self.apply_patches(patches)
+        for (view, _), storageview_details in zip(patches, details):
+            if storageview_details:
+                storageviews[view] = utils.serialize_content(
+                    storageview_details)
+
+        self.result['changed'] = bool(patches)
+        self.result['assignment'] = dict(
+            (view, [vols.split('/')[-1] for vols in assignment[view]])
+            for view in views)
+        self.result['storageviews_details'] = [
+            storageviews[view] for view in views]
+        del self.result['storageview_details']
+        utils.exit_module(self.module, self.client, **self.result)
+
+    def balance_virtual_volumes(self, views, members, volumes):
+        """
+        Assigns the virtual volumes to the storage views according to the
+        balance policy, given the virtual volumes of each view already
+        """
+        policy = self.module.params['balance']
+        assignment = dict((view, []) for view in views)
+        if policy == 'round-robin':
+            for position, vols in enumerate(volumes):
+                assignment[views[position % len(views)]].append(vols)
+            return assignment
+
+        if policy == 'capacity':
+            weight = self.get_virtual_volume_capacity
+            # Placing the largest virtual volumes first evens the views out
+            volumes = sorted(volumes, key=weight, reverse=True)
+        else:
+            weight = lambda vols: 1  # pylint:disable=C3001
+        heap = [(sum(weight(vols) for vols in members[view]), position, view)
+                for position, view in enumerate(views)]
+        heapq.heapify(heap)
+        for vols in volumes:
+            load, position, view = heapq.heappop(heap)
+            assignment[view].append(vols)
+            heapq.heappush(heap, (load + weight(vols), position, view))
+        return assignment
+
+    def get_virtual_volume_capacity(self, uri):
+        """
+        Returns the capacity of a virtual volume given its URI, 0 when it is
+        unknown
+        """
+        name = uri.split('/')[-1]
+        if '/distributed_storage/' in uri:
+            vol = self.distvv_index.get(name)
+        else:
+            vol = self.vv_index.get(name, {}).get(uri.split('/')[-3])
+        return getattr(vol, 'capacity', None) or 0
+
+    def get_exact_removals(self, storageview_details, volumes):
+        """
+        Returns the operations removing the members of the storage view
+        absent from the lists given in exact membership mode
+        """
+        desired = {}
+        if self.ports is not None:
+            desired['ports'] = set(self.get_obj_uri(ports=self.ports)[0])
+        if self.initiators is not None:
+            desired['initiators'] = set(
+                self.get_obj_uri(initiators=self.initiators)[1])
+        if self.virvols is not None:
+            desired['virtual_volumes'] = set(volumes)
+
+        removals = []
+        for key in ['ports', 'initiators', 'virtual_volumes']:
+            if key not in desired:
+                continue
+            for ref in storageview_details[key]:
+                uri = utils.get_ref_uri(ref)
+                if uri not in desired[key]:
+                    LOG.info("Removing %s from storageview %s in %s",
+                             uri, self.st_name, self.cl_name)
+                    removals.append(self.payload('remove', '/' + key, uri))
+        return removals
+
+    def apply_patches(self, patches):
+        """
+        Updates storage views with their (name, patch_payload) pairs, the
+        views being updated concurrently, and returns their details
+        """
+        results = utils.run_concurrently(
+            lambda patch: self.patch_storage_view(*patch), patches,
+            self.module.params['max_workers'])
+        details = []
+        pending = {}
+        changed = False
+        err_msg = None
+        for (name, patch_payload), (storageview_details, err) in \
+                zip(patches, results):
+            if isinstance(err, StorageViewUpdateError):
+                if err_msg is None:
+                    err_msg = ("Could not update the storageview {0} in {1}"
+                               " due to error: {2}".format(
+                                   name, self.cl_name,
+                                   self.get_error_msg(err.err)))
+                LOG.error("Could not update the storageview %s in %s, %d of"
+                          " %d operations not applied\n%s\n", name,
+                          self.cl_name, len(err.pending),
+                          len(patch_payload), err.err)
+                pending[name] = err.pending
+                changed = changed or len(err.pending) < len(patch_payload)
+                details.append(err.details)
+                continue
+            if err is not None:
+                raise err
+            LOG.info("Successfully updated the storageview %s in %s",
+                     name, self.cl_name)
+            LOG.debug("Storageview details: %s", storageview_details)
+            changed = True
+            details.append(storageview_details)
+        if err_msg is not None:
+            # Report what the views reflect of the update
+            details = [utils.serialize_content(view) if view else None
+                       for view in details]
+            if self.module.params['storage_views']:
+                partial = {'storageviews_details': details}
+            else:
+                partial = {'storageview_details': details[0]}
+            self.module.fail_json(msg=err_msg, changed=changed,
+                                  pending_operations=pending, **partial)
+        return details
+
+    def get_error_msg(self, err):  # pylint:disable=R0201
+        """
+        Returns the message of a failed update call
+        """
+        if isinstance(err, utils.ApiException):
+            return utils.error_msg(err)
+        return str(err)
+
+    def patch_storage_view(self, name, patch_payload):
+        """
+        Sends the update of a storage view in chunks of batch_size
+        operations, renaming the view last, and returns its final details.
+        When a chunk fails, the view is read back and the operations it
+        does not reflect are raised in a StorageViewUpdateError
+        """
+        size = max(self.module.params['batch_size'], 1)
+        members = [op for op in patch_payload if op['path'] != '/name']
+        renames = [op for op in patch_payload if op['path'] == '/name']
+        chunks = [members[start:start + size]
+                  for start in range(0, len(members), size)]
+        if renames:
+            chunks.append(renames)
+        storageview_details = None
+        for number, chunk in enumerate(chunks):
+            LOG.info("Updating the storageview %s in %s with chunk %d of %d",
+                     name, self.cl_name, number + 1, len(chunks))
+            try:
+                storageview_details = self.patch_chunk(name, chunk)
+            except (utils.ApiException, utils.MaxRetryError) as err:
+                remaining = [op for rest in chunks[number:] for op in rest]
+                details = self.get_patched_view(
+                    name, renames[-1]['value'] if renames else None)
+                if details is None:
+                    raise StorageViewUpdateError(err, None, remaining)
+                raise StorageViewUpdateError(
+                    err, details, utils.get_pending_operations(
+                        utils.serialize_content(details), remaining))
+        return storageview_details
+
+    def patch_chunk(self, name, chunk):
+        """
+        Sends a chunk of the update of a storage view, retrying it when
+        VPLEX is busy or times out with the operations the view does not
+        reflect yet
+        """
+        new_name = None
+        for operation in chunk:
+            if operation['path'] == '/name':
+                new_name = operation['value']
+        for attempt in range(PATCH_ATTEMPTS):
+            try:
+                return self.storageview.patch_storage_view(
+                    self.cl_name, name, chunk)
+            except (utils.ApiException, utils.MaxRetryError) as err:
+                if attempt == PATCH_ATTEMPTS - 1 or \
+                        getattr(err, 'status', None) not in \
+                        PATCH_RETRY_STATUS and \
+                        not isinstance(err, utils.MaxRetryError):
+                    raise
+                LOG.info("Retrying the update of the storageview %s in %s"
+                         " after error: %s", name, self.cl_name, err)
+            time.sleep(2 ** attempt)
+            # The chunk may have been applied in full or in part before
+            # the call failed
+            storageview_details = self.get_patched_view(name, new_name)
+            if storageview_details is None:
+                continue
+            details = utils.serialize_content(storageview_details)
+            chunk = utils.get_pending_operations(details, chunk)
+            if not chunk:
+                return storageview_details
+            # A rename already applied is addressed by the new name
+            name = details.get('name', name)
+            LOG.info("Resending %d operations to the storageview %s in %s",
+                     len(chunk), name, self.cl_name)
+        return None
+
+    def get_patched_view(self, name, new_name=None):
+        """
+        Gets the details of a storage view being updated, by its new name
+        once it is gone under its name, or None
+        """
+        for view_name in [name, new_name]:
+            if view_name is None:
+                continue
+            try:
+                return self.storageview.get_storage_view(
+                    self.cl_name, view_name)
+            except (utils.ApiException, utils.MaxRetryError) as err:
+                if getattr(err, 'status', None) != 404:
+                    return None
+        return None
+
+    def get_exports_index(self, kind):
+        """
+        Returns the ports or initiators of the cluster by name, listed once
+        per run, or None if they could not be listed
+        """
+        if kind not in self.exports_index:
+            list_method = self.storageview.get_ports if kind == 'port' \
+                else self.storageview.get_initiator_ports
+            try:
+                objs = utils.serialize_content(list_method(self.cl_name))
+                self.exports_index[kind] = dict(
+                    (obj['name'], obj) for obj in objs)
+            except utils.ApiException as err:
+                LOG.info("Could not list the %ss of %s, validating them"
+                         " one by one: %s", kind, self.cl_name, err)
+                self.exports_index[kind] = None
+        return self.exports_index[kind]
+
+    def get_export_obj(self, kind, name):
+        """
+        Returns the details of a port or initiator of the cluster, or None
+        if it is not present
+        """
+        index = self.get_exports_index(kind)
+        if index is not None:
+            return index.get(name)
+
+        get_method = self.storageview.get_port if kind == 'port' \
+            else self.storageview.get_initiator_port
+        obj = None
+        try:
+            obj = get_method(self.cl_name, name)
+        except utils.ApiException as err:
+            msg = ("Could not get {0} {1} details in {2} due to"
+                   " error {3}".format(
+                       kind, name, self.cl_name, utils.error_msg(err)))
+            LOG.error("%s\n%s\n", msg, err)
+            self.module.fail_json(msg=msg)
+        if obj:
+            return utils.serialize_content(obj)
+        return None
 
     def check_port_validity(self):
         """
@@ -551,15 +1019,7 @@ class VplexStorageview():  # pylint:disable=R0902
         if self.ports:
             LOG.info("Validating the ports")
             for port in self.ports:
-                obj = None
-                try:
-                    obj = self.storageview.get_port(self.cl_name, port)
-                except utils.ApiException as err:
-                    msg = ("Could not get port {0} details in {1} due to"
-                           " error {2}".format(
-                               port, self.cl_name, utils.error_msg(err)))
-                    LOG.error("%s\n%s\n", msg, err)
-                    self.module.fail_json(msg=msg)
+                obj = self.get_export_obj('port', port)
                 if obj is None:
                     msg = ("Could not get port {0} details in {1}"
                            .format(port, self.cl_name))
@@ -581,18 +1041,8 @@ class VplexStorageview():  # pylint:disable=R0902
         if self.initiators:
             LOG.info("Validating the initiators")
             for ini in self.initiators:
-                obj = None
-                try:
-                    obj = self.storageview.get_initiator_port(
-                        self.cl_name, ini)
-                except utils.ApiException as err:
-                    msg = ("Could not get initiator {0} details in {1} due to"
-                           " error {2}".format(
-                               ini, self.cl_name, utils.error_msg(err)))
-                    LOG.error("%s\n%s\n", msg, err)
-                    self.module.fail_json(msg=msg)
+                obj = self.get_export_obj('initiator', ini)
                 if obj:
-                    obj = utils.serialize_content(obj)
                     # Add the initiator only if it is registered
                     if "type" not in obj.keys():
                         msg = ("The initiator {0} is unregistered in "
@@ -607,136 +1057,169 @@ class VplexStorageview():  # pylint:disable=R0902
                 initiators.append(ini)
 
         # Check if virtual volumes provided are already present in VPLEX
-        if self.virvols:  # pylint:disable=R1702
-            # Get the list of clusters and virtual volumes in respective
-            # clusters
-            cl_list = []
-            distvv_list = []
-            vv_dict = {}
-
-            clus_details = self.cls.get_clusters()
-            cl_list = [clus.name for clus in clus_details]
-            if len(cl_list) > 1:
-                distvv_details = self.distvv.get_distributed_virtual_volumes()
-                distvv_list = [dist.name for dist in distvv_details]
-            for cls in cl_list:
-                vvols = self.virtualvolume.get_virtual_volumes(cls)
-                vv_dict[cls] = [vol.name for vol in vvols]
-
-            if len(distvv_list) != 0:
-                self.vir_vol['distvv'] = [vol for vol in self.virvols
-                                          if vol in distvv_list]
-            # Create a dictionary with cluster/distributed and virtual volumes
-            # key.value pairs
-            if self.cl_name in vv_dict.keys():
-                self.vir_vol[self.cl_name] = [vol for vol in self.virvols
-                                              if vol in vv_dict[self.cl_name]]
-            cln = self.cl_name
-            for key in vv_dict:
-                self.vir_vol[key] = []
-            for key in vv_dict:
-                for vol in self.virvols:
-                    if vol in vv_dict[cln] and \
-                            vol not in self.vir_vol[cln]:
-                        self.vir_vol[cln].append(vol)
-                    elif vol not in self.vir_vol[cln] and \
-                            vol in vv_dict[key]:
-                        self.vir_vol[key].append(vol)
-
-            for vol in self.virvols:
-                vol_flag = False
-                for key in self.vir_vol:
-                    if vol in self.vir_vol[key]:
-                        if key not in (self.cl_name, 'distvv'):
-                            vv_det = self.virtualvolume.get_virtual_volume(
-                                key, vol)
-                            if vv_det.visibility == 'local' and \
-                                    self.virvol_state == 'present-in-view':
-                                msg = ("Could not add the virtual volume {0}"
-                                       " present in {1} to storage view {2}"
-                                       " present in {3} since visibility"
-                                       " is local".format(
-                                           vol, key, self.st_name,
-                                           self.cl_name))
-                                LOG.error(msg)
-                                self.module.fail_json(msg=msg)
-                        vol_flag = True
-                if not vol_flag and self.virvol_state == 'present-in-view':
-                    msg = ("Could not find virtual volume {0} in VPLEX"
-                           .format(vol))
-                    LOG.error(msg)
-                    self.module.fail_json(msg=msg)
-                elif not vol_flag and self.virvol_state == 'absent-in-view':
-                    LOG.info("Virtual volume %s is already absent in storage"
-                             " view %s", vol, self.st_name)
+        if self.virvols:
+            self.resolve_virtual_volumes(self.st_name)
 
         # Get the complete URI of the storage objects in storageview_details
         (ports,
          initiators) = self.get_obj_uri(ports=ports, initiators=initiators)
 
-        # Add the existing ports in the storageview to the list
-        if stor_details:
+        # Add the existing ports in the storageview to the list, or the
+        # ports replacing them in exact membership mode
+        exact = self.membership == 'exact'
+        if exact and self.ports is not None:
+            ports.extend(self.get_obj_uri(ports=self.ports)[0])
+        elif stor_details:
             ports.extend(stor_details["ports"])
 
         # Add the existing initiators in the storageview to the list
-        if stor_details:
+        if stor_details and not (exact and self.initiators is not None):
             initiators.extend(stor_details["initiators"])
 
-        # Check if the initiator-port combination is used in any of the
-        # storage views already present in VPLEX
-        storageview_list = self.storageview.get_storage_views(self.cl_name)
-        if storageview_list is None:
-            return
-        storageview_list = utils.serialize_content(storageview_list)
-
         # Check if the initiator-port combination provided by the user is used
         # by other storage views in the cluster and fail if they are present
-        ini = ""
-        port = ""
-        for obj in storageview_list:
-            if obj['name'] == self.st_name:
+        if self.ini_state == "absent-in-view" or \
+                self.pt_state == "absent-in-view":
+            return
+        conflict = self.get_exports().find_shared_initiator_port(
+            initiators, ports, exclude=self.st_name)
+        if conflict:
+            view, ini, port = conflict
+            msg = ("The view contains a target-port that is also in "
+                   "another view, which contains the specified "
+                   "initiator-port")
+            LOG.error(msg)
+            msg = ("Could not update storage view {0}. The "
+                   "initiator {1} and port {2} combination "
+                   "is already present in the storage view "
+                   "{3}".format(self.st_name, ini.split("/")[-1],
+                                port.split("/")[-1], view))
+            LOG.error(msg)
+            self.module.fail_json(msg=msg)
+
+    def resolve_virtual_volumes(self, view_name):
+        """
+        Checks if the virtual volumes provided are present in the VPLEX and
+        maps them to their clusters or to the distributed storage in
+        vir_vol
+        """
+        # Index the virtual volumes of all the clusters by name, with
+        # the lists of the clusters fetched concurrently
+        distvv_details = []
+        clus_details = self.cls.get_clusters()
+        cl_list = [clus.name for clus in clus_details]
+        if len(cl_list) > 1:
+            distvv_details = self.distvv.get_distributed_virtual_volumes()
+        self.distvv_index = dict((dist.name, dist) for dist in distvv_details)
+        results = utils.run_concurrently(
+            self.virtualvolume.get_virtual_volumes, cl_list,
+            len(cl_list))
+        vv_index = self.vv_index
+        for cls, (vvols, err) in zip(cl_list, results):
+            if err is not None:
+                raise err
+            for vol in vvols:
+                vv_index.setdefault(vol.name, {})[cls] = vol
+
+        # Create a dictionary with cluster/distributed and virtual volumes
+        # key.value pairs, a volume of another cluster being only looked
+        # for when it is absent in the cluster of the storage view
+        if self.distvv_index:
+            self.vir_vol['distvv'] = [vol for vol in self.virvols
+                                      if vol in self.distvv_index]
+        for cls in cl_list:
+            self.vir_vol[cls] = []
+        for vol in self.virvols:
+            vol_clusters = vv_index.get(vol, {})
+            if self.cl_name in vol_clusters:
+                if vol not in self.vir_vol[self.cl_name]:
+                    self.vir_vol[self.cl_name].append(vol)
                 continue
-            ini_flag = 0
-            port_flag = 0
-            for ini in obj['initiators']:
-                if ini in initiators and self.ini_state != "absent-in-view":
-                    ini_flag = 1
-                    break
-            for port in obj['ports']:
-                if port in ports and self.pt_state != "absent-in-view":
-                    port_flag = 1
-                    break
-            if port_flag == 1 and ini_flag == 1:
-                msg = ("The view contains a target-port that is also in "
-                       "another view, which contains the specified "
-                       "initiator-port")
-                LOG.error(msg)
-                ini = ini.split("/")[-1]
-                port = port.split("/")[-1]
-                msg = ("Could not update storage view {0}. The "
-                       "initiator {1} and port {2} combination "
-                       "is already present in the storage view "
-                       "{3}".format(self.st_name, ini, port, obj['name']))
+            for cls in cl_list:
+                if cls in vol_clusters:
+                    self.vir_vol[cls].append(vol)
+
+        for vol in self.virvols:
+            vol_clusters = vv_index.get(vol, {})
+            vol_flag = vol in self.distvv_index
+            for cls in cl_list:
+                if cls not in vol_clusters:
+                    continue
+                vol_flag = True
+                if cls != self.cl_name and \
+                        self.cl_name not in vol_clusters and \
+                        vol_clusters[cls].visibility == 'local' and \
+                        self.virvol_state == 'present-in-view':
+                    msg = ("Could not add the virtual volume {0}"
+                           " present in {1} to storage view {2}"
+                           " present in {3} since visibility"
+                           " is local".format(
+                               vol, cls, view_name,
+                               self.cl_name))
+                    LOG.error(msg)
+                    self.module.fail_json(msg=msg)
+            if not vol_flag and self.virvol_state == 'present-in-view':
+                msg = ("Could not find virtual volume {0} in VPLEX"
+                       .format(vol))
                 LOG.error(msg)
                 self.module.fail_json(msg=msg)
+            elif not vol_flag and self.virvol_state == 'absent-in-view':
+                LOG.info("Virtual volume %s is already absent in storage"
+                         " view %s", vol, view_name)
+
+    def get_virtual_volume_uris(self):
+        """
+        Returns the URIs of the virtual volumes mapped in vir_vol
+        """
+        volume = []
+        urid = "/vplex/v2/distributed_storage/distributed_virtual_volumes"
+        uri = "/vplex/v2/clusters/{}/virtual_volumes/{}"
+        for key, val in self.vir_vol.items():
+            if key == "distvv" and len(self.vir_vol[key]) != 0:
+                for data in val:
+                    volume.append(urid + "/{}".format(data))
+            else:
+                for data in val:
+                    volume.append(uri.format(key, data))
+        return volume
+
+    def get_exports(self):
+        """
+        Returns the storage views of the cluster indexed by initiator, port
+        and virtual volume, listed once per run
+        """
+        if self.exports is None:
+            self.exports = utils.get_exports_index(self.client, self.cl_name)
+        return self.exports
 
     def is_virtual_vol_in_use(self, virtualvol):
         """
         Checks if virtual volume is used by any other storage view
         """
-        try:
-            get_map = self.maps.get_map(virtualvol)
-        except utils.ApiException as err:
-            msg = ("Could not get the map view of {0} due to "
-                   "error {1}".format(virtualvol, utils.error_msg(err)))
-            LOG.error("%s\n%s\n", msg, err)
-            self.module.fail_json(msg=msg)
+        return virtualvol in self.get_virtual_vols_in_use([virtualvol])
+
+    def get_virtual_vols_in_use(self, virtualvols):
+        """
+        Returns the virtual volumes used by any other storage view, with
+        their map views looked up concurrently
+        """
+        results = utils.run_concurrently(
+            self.maps.get_map, virtualvols, self.module.params['max_workers'])
+        in_use = set()
+        for virtualvol, (get_map, err) in zip(virtualvols, results):
+            if isinstance(err, utils.ApiException):
+                msg = ("Could not get the map view of {0} due to "
+                       "error {1}".format(virtualvol, utils.error_msg(err)))
+                LOG.error("%s\n%s\n", msg, err)
+                self.module.fail_json(msg=msg)
+            elif err is not None:
+                raise err
 
-        vview_list = utils.serialize_content(get_map)
-        # Collect the storage view if it has virtual volume
-        if len(vview_list['parents']) > 0:
-            return True
-        return False
+            vview_list = utils.serialize_content(get_map)
+            # Collect the storage view if it has virtual volume
+            if len(vview_list['parents']) > 0:
+                in_use.add(virtualvol)
+        return in_use
 
     def payload(self, operation, path, value):  # pylint:disable=R0201
         """
@@ -770,7 +1253,11 @@ class VplexStorageview():  # pylint:disable=R0902
         Checks whether an update operation is required
         """
         flag = 0
-        if self.new_st_name:
+        if self.membership == 'exact' and \
+                (self.ports, self.initiators, self.virvols) != \
+                (None, None, None):
+            flag = 1
+        elif self.new_st_name:
             flag = 1
         elif self.ports and self.pt_state is not None:
             flag = 1
@@ -800,6 +1287,10 @@ class VplexStorageview():  # pylint:disable=R0902
         storageview_details = None
         changed = False
 
+        # Balance the virtual volumes over several storage views
+        if self.module.params['storage_views']:
+            self.assign_virtual_volumes()
+
         # Check the validity and the presence of the storage_view_name
         if self.st_name:
             storageview_details = self.get_storageview_details(self.st_name)
@@ -814,7 +1305,7 @@ class VplexStorageview():  # pylint:disable=R0902
                          self.st_name, self.cl_name)
 
             self.result["changed"] = changed
-            self.module.exit_json(**self.result)
+            utils.exit_module(self.module, self.client, **self.result)
 
         # Checks if the ports provided are valid
         self.check_port_validity()
@@ -883,7 +1374,7 @@ class VplexStorageview():  # pylint:disable=R0902
         if storageview_details:
             storageview_details = utils.serialize_content(storageview_details)
         self.result["storageview_details"] = storageview_details
-        self.module.exit_json(**self.result)
+        utils.exit_module(self.module, self.client, **self.result)
 
 
 def get_vplex_storageview_parameters():
@@ -893,7 +1384,10 @@ def get_vplex_storageview_parameters():
     """
     return dict(
         cluster_name=dict(type='str', required=True),
-        storage_view_name=dict(type='str', required=True),
+        storage_view_name=dict(type='str', required=False),
+        storage_views=dict(type='list', required=False),
+        balance=dict(type='str', required=False, default='round-robin',
+                     choices=['round-robin', 'capacity', 'load']),
         new_storage_view_name=dict(type='str', required=False),
         ports=dict(type='list', required=False),
         port_state=dict(
@@ -910,6 +1404,10 @@ def get_vplex_storageview_parameters():
             type='str',
             required=False,
             choices=['present-in-view', 'absent-in-view']),
+        membership=dict(type='str', required=False, default='incremental',
+                        choices=['incremental', 'exact']),
+        batch_size=dict(type='int', required=False, default=50),
+        max_workers=dict(type='int', required=False, default=4),
         state=dict(type='str', required=True, choices=['present', 'absent'])
     )
 
@@ -43,6 +43,18 @@ options:
     description:
     - Defines to rename storage volume name
 
+  rename_template:
+    description:
+    - Format string giving the new name of the storage volume from its
+      attributes, such as "sv_{storage_array_name}_{capacity}" or
+      "sv_{vendor_specific_name}". The attributes are the keys of
+      volume_details, and index is the position of the storage volume in
+      storage_volumes.
+    - It applies to the storage volumes without new_storage_volume_name.
+      The new names are all computed before any storage volume is renamed,
+      and a new name already in use fails its storage volume.
+    - rename_template is mutually exclusive with new_storage_volume_name
+
   thin_rebuild:
     description:
     - Defines to update thin_rebuild
@@ -59,6 +71,26 @@ options:
     - Defines to claim unclaimed storage volume
     choices: ['claimed', 'unclaimed']
 
+  storage_volumes:
+    description:
+    - List of storage volumes to claim, unclaim and update in a single
+      run, each given by name or as a dictionary with the keys
+      storage_volume_name or storage_volume_id, and optionally
+      new_storage_volume_name, claimed_state and thin_rebuild
+    - claimed_state and thin_rebuild given at the top level apply to the
+      storage volumes not setting them
+    - The storage volumes are resolved from a single listing and updated
+      concurrently. A failed storage volume does not stop the others, and
+      the task fails after all of them have been processed.
+    - storage_volumes is mutually exclusive with storage_volume_name and
+      storage_volume_id, and requires state present
+
+  max_workers:
+    description:
+    - Maximum number of storage volumes of storage_volumes updated
+      concurrently
+    default: 4
+
   state:
     description:
     - Defines whether the volume should exist or not.
@@ -114,6 +146,32 @@ EXAMPLES = r'''
     claimed_state: "claimed"
     state: "present"
 
+- name: Claim and rename Storage Volumes in one task
+  dellemc_vplex_storage_volume:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    storage_volumes:
+      - storage_volume_id: "VPD83T3:60000970000197600573533030334131"
+        new_storage_volume_name: "ansible_st_vol_1"
+      - storage_volume_id: "VPD83T3:60000970000197600573533030334132"
+        new_storage_volume_name: "ansible_st_vol_2"
+    claimed_state: "claimed"
+    state: "present"
+
+- name: Rename claimed Storage Volumes after their array
+  dellemc_vplex_storage_volume:
+    vplexhost: "{{ vplexhost }}"
+    vplexuser: "{{ vplexuser }}"
+    vplexpassword: "{{ vplexpassword }}"
+    verifycert: "{{ verifycert }}"
+    cluster_name: "cluster-1"
+    storage_volumes: ["ansible_st_vol_1", "ansible_st_vol_2"]
+    rename_template: "sv_{storage_array_name}_{index}"
+    state: "present"
+
 '''
 
 RETURN = r'''
@@ -193,6 +251,35 @@ volume_details:
         vendor_specific_name:
             description: Vendor specific name
             type: str
+
+storage_volumes_details:
+    description: Outcome for each of the storage_volumes, in the order
+                 given
+    returned: When storage_volumes is given
+    type: complex
+    contains:
+        storage_volume:
+            description: Storage volume name or ID as given
+            type: str
+        changed:
+            description: Whether or not the storage volume has changed
+            type: bool
+        failed:
+            description: Whether or not the storage volume failed
+            type: bool
+        msg:
+            description: Error message of a failed storage volume
+            type: str
+        storage_details:
+            description: Details of the storage volume, with the same keys
+                         as the volume_details
+            type: dict
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 LOG = utils.get_logger('dellemc_vplex_storage_volume')
@@ -207,10 +294,13 @@ class StorageVolumeModule:
         self.module_params = utils.get_vplex_management_host_parameters()
         self.module_params.update(get_user_parameters())
         mutually_exclusive = [
-            ['storage_volume_name', 'storage_volume_id']
+            ['storage_volume_name', 'storage_volume_id'],
+            ['storage_volume_name', 'storage_volumes'],
+            ['storage_volume_id', 'storage_volumes'],
+            ['new_storage_volume_name', 'rename_template']
         ]
         required_one_of = [
-            ['storage_volume_name', 'storage_volume_id']
+            ['storage_volume_name', 'storage_volume_id', 'storage_volumes']
         ]
         self.module = AnsibleModule(
             argument_spec=self.module_params,
@@ -255,31 +345,45 @@ class StorageVolumeModule:
         api_obj = utils.VplexapiModules()
         self.strg_client = api_obj.StorageVolumeApi(api_client=self.client)
         self.cluster_name = self.module.params['cluster_name']
-        self.all_vols = None
+        self.vol_index = None
 
         LOG.info("Got VPLEX instance to access common lib methods "
                  "on VPLEX")
 
+    def get_volume_index(self):
+        """Returns the storage volumes of the cluster indexed by name and
+        system ID, listed once until the module changes one of them"""
+        if self.vol_index is None:
+            try:
+                self.vol_index = utils.get_storage_volume_index(
+                    self.client, self.cluster_name)
+            except utils.ApiException as err:
+                err_msg = ("Could not get the storage volumes of {0} due to"
+                           " error: {1}".format(self.cluster_name,
+                                                utils.error_msg(err)))
+                LOG.error("%s\n%s", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+            LOG.info("Indexed %d storage volumes of %s",
+                     len(self.vol_index.by_name), self.cluster_name)
+        return self.vol_index
+
+    def invalidate_volume_index(self):
+        """Drops the storage volume index after a claim, unclaim or
+        rename"""
+        self.vol_index = None
+
     def get_volume_by_id(self, vol_id):
         """Retrieve storage volume object by volume id"""
         LOG.info('Get volume by ID')
+        data = self.get_volume_index().get_by_system_id(vol_id)
+        if data:
+            LOG.info("Got storage volume details %s by volume ID from %s",
+                     data.name, self.cluster_name)
+            LOG.debug("Volume details: %s", data)
+            return data, None
         err_msg = ("Could not get storage volume {0} from "
                    "{1}".format(vol_id, self.cluster_name))
-        try:
-            self.all_vols = self.strg_client.get_storage_volumes(
-                cluster_name=self.cluster_name)
-            LOG.debug("Obtained Volume details: %s", self.all_vols)
-            data = [e for e in self.all_vols if e.system_id == vol_id]
-            if len(data) > 0:
-                LOG.info("Got storage volume details %s by volume ID from %s",
-                         data[0].name, self.cluster_name)
-                LOG.debug("Volume details: %s", data)
-                return data[0], None
-            return None, err_msg
-        except utils.ApiException as err:
-            err_msg += " due to error: {0}".format(utils.error_msg(err))
-            LOG.error("%s\n%s", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+        return None, err_msg
 
     def get_volume_by_name(self, vol_name):
         """Retrieve storage volume object by volume name"""
@@ -306,6 +410,7 @@ class StorageVolumeModule:
             res = self.strg_client.claim_storage_volume(
                 cluster_name=self.cluster_name,
                 name=vol_name, claim_payload={})
+            self.invalidate_volume_index()
             LOG.info("Claimed storage volume %s of %s",
                      vol_name, self.cluster_name)
             LOG.debug("Claimed storage volume details: %s", res)
@@ -324,6 +429,7 @@ class StorageVolumeModule:
             res = self.strg_client.unclaim_storage_volume(
                 cluster_name=self.cluster_name,
                 name=vol_name, unclaim_payload={})
+            self.invalidate_volume_index()
             LOG.info("Unclaimed storage volume %s of %s",
                      vol_name, self.cluster_name)
             LOG.debug("Unclaimed storage volume details: %s", res)
@@ -344,6 +450,8 @@ class StorageVolumeModule:
                 cluster_name=self.cluster_name,
                 name=vol_name,
                 storage_volume_patch_payload=volume_payload)
+            if any(op['path'] == '/name' for op in volume_payload):
+                self.invalidate_volume_index()
             LOG.info("Updated storage volume %s of %s",
                      vol_name, self.cluster_name)
             LOG.debug("Updated storage volume details: %s", res)
@@ -356,6 +464,193 @@ class StorageVolumeModule:
             LOG.error("%s\n%s", err_msg, err)
             return err_msg, False
 
+    def get_volume_specs(self):
+        """Returns the storage_volumes as dictionaries, with the top level
+        claimed_state and thin_rebuild as defaults"""
+        keys = ['storage_volume_name', 'storage_volume_id',
+                'new_storage_volume_name', 'claimed_state', 'thin_rebuild']
+        specs = []
+        for entry in self.module.params['storage_volumes']:
+            if not isinstance(entry, dict):
+                entry = {'storage_volume_name': entry}
+            unknown = set(entry) - set(keys)
+            err_msg = None
+            if unknown:
+                err_msg = "Unsupported keys {0} in storage_volumes".format(
+                    ', '.join(sorted(unknown)))
+            elif bool(entry.get('storage_volume_name')) == \
+                    bool(entry.get('storage_volume_id')):
+                err_msg = ("Each of the storage_volumes requires one of"
+                           " storage_volume_name and storage_volume_id")
+            elif entry.get('claimed_state') not in \
+                    (None, 'claimed', 'unclaimed'):
+                err_msg = ("claimed_state of storage_volumes must be one of"
+                           " claimed, unclaimed")
+            if err_msg:
+                LOG.error(err_msg)
+                self.module.fail_json(msg=err_msg)
+            spec = dict((key, entry.get(key)) for key in keys)
+            for key in ['claimed_state', 'thin_rebuild']:
+                if spec[key] is None:
+                    spec[key] = self.module.params[key]
+            specs.append(spec)
+        return specs
+
+    def check_batch_renames(self, specs, volumes):
+        """Returns the error messages of the renames of a batch which
+        would clash with each other or with an existing storage volume"""
+        renames = {}
+        for position, (spec, vol_obj) in enumerate(zip(specs, volumes)):
+            new_name = spec['new_storage_volume_name']
+            if vol_obj and new_name and new_name != vol_obj.name:
+                renames[position] = new_name
+
+        # One set intersection finds the new names already in use
+        in_use = set(renames.values()) & \
+            set(self.get_volume_index().by_name)
+        targets = set()
+        errors = {}
+        for position in sorted(renames):
+            new_name = renames[position]
+            status, msg = utils.validate_name(
+                new_name, 63, 'new_storage_volume_name')
+            if not status:
+                errors[position] = msg
+            elif new_name in in_use or new_name in targets:
+                errors[position] = (
+                    "Could not rename storage volume {0} in {1} as name {2}"
+                    " is already in use".format(
+                        volumes[position].name, self.cluster_name,
+                        new_name))
+            targets.add(new_name)
+        return errors
+
+    def render_new_name(self, vol_obj, position):
+        """Returns the new name given by rename_template for a storage
+        volume"""
+        fields = utils.serialize_content(vol_obj)
+        fields['index'] = position
+        try:
+            return self.module.params['rename_template'].format(**fields)
+        except (KeyError, IndexError, ValueError) as err:
+            err_msg = ("Could not apply rename_template to storage volume"
+                       " {0} in {1} due to error: {2}".format(
+                           vol_obj.name, self.cluster_name, err))
+            LOG.error(err_msg)
+            self.module.fail_json(msg=err_msg)
+
+    def process_volume(self, vol_obj, spec):
+        """Claims, unclaims and updates a storage volume of a batch, and
+        returns the volume, the changed status and the error message"""
+        changed = False
+        claimed_state = spec['claimed_state']
+        if claimed_state == 'unclaimed':
+            if vol_obj.use == 'claimed':
+                res, status = self.unclaim_storage_volume(vol_obj.name)
+                if not status:
+                    return vol_obj, changed, res
+                return res, True, None
+            if vol_obj.use != 'unclaimed':
+                return vol_obj, changed, (
+                    "Could not unclaim storage volume {0} from {1} as it is"
+                    " not claimed.".format(vol_obj.name, self.cluster_name))
+        elif claimed_state == 'claimed' and vol_obj.use == 'unclaimed':
+            res, status = self.claim_storage_volume(vol_obj.name)
+            if not status:
+                return vol_obj, changed, res
+            vol_obj, changed = res, True
+
+        payload = []
+        new_name = spec['new_storage_volume_name']
+        thin_rebuild = spec['thin_rebuild']
+        if (new_name and new_name != vol_obj.name) or \
+                (thin_rebuild is not None and
+                 thin_rebuild != vol_obj.thin_rebuild):
+            if vol_obj.use == 'unclaimed':
+                return vol_obj, changed, (
+                    "Could not update storage volume {0} in {1} as it is"
+                    " unclaimed".format(vol_obj.name, self.cluster_name))
+        if new_name and new_name != vol_obj.name:
+            payload.append({'op': 'replace', 'path': '/name',
+                            'value': new_name})
+        if thin_rebuild is not None and thin_rebuild != vol_obj.thin_rebuild:
+            payload.append({'op': 'replace', 'path': '/thin_rebuild',
+                            'value': thin_rebuild})
+        if payload:
+            res, status = self.update_storage_volume(vol_obj.name, payload)
+            if not status:
+                return vol_obj, changed, res
+            vol_obj, changed = res, True
+        return vol_obj, changed, None
+
+    def perform_batch_operation(self):
+        """Claims, unclaims and updates the storage_volumes concurrently,
+        and exits with the outcome of each of them"""
+        if self.module.params['state'] != 'present':
+            err_msg = ("storage_volumes only claims, unclaims and updates"
+                       " storage volumes with state present")
+            LOG.error(err_msg)
+            self.module.fail_json(msg=err_msg)
+        specs = self.get_volume_specs()
+        index = self.get_volume_index()
+        volumes = []
+        errors = {}
+        for position, spec in enumerate(specs):
+            if spec['storage_volume_name']:
+                vol_obj = index.get_by_name(spec['storage_volume_name'])
+            else:
+                vol_obj = index.get_by_system_id(spec['storage_volume_id'])
+            if not vol_obj:
+                errors[position] = (
+                    "Could not get storage volume {0} from {1}".format(
+                        spec['storage_volume_name'] or
+                        spec['storage_volume_id'], self.cluster_name))
+            elif self.module.params['rename_template'] and \
+                    not spec['new_storage_volume_name']:
+                spec['new_storage_volume_name'] = self.render_new_name(
+                    vol_obj, position)
+            volumes.append(vol_obj)
+        errors.update(self.check_batch_renames(specs, volumes))
+
+        work = [(vol_obj, spec) for position, (vol_obj, spec)
+                in enumerate(zip(volumes, specs)) if position not in errors]
+        results = iter(utils.run_concurrently(
+            lambda item: self.process_volume(*item), work,
+            self.module.params['max_workers']))
+
+        details = []
+        failed = 0
+        changed = False
+        for position, (vol_obj, spec) in enumerate(zip(volumes, specs)):
+            vol_changed = False
+            err_msg = errors.get(position)
+            if err_msg is None:
+                (result, err) = next(results)
+                if err is not None:
+                    raise err
+                vol_obj, vol_changed, err_msg = result
+            if err_msg:
+                LOG.error(err_msg)
+                failed += 1
+            changed = changed or vol_changed
+            details.append({
+                'storage_volume': spec['storage_volume_name'] or
+                                  spec['storage_volume_id'],
+                'changed': vol_changed,
+                'failed': bool(err_msg),
+                'msg': err_msg,
+                'storage_details': utils.serialize_content(vol_obj) or {}})
+
+        result = {
+            "changed": changed,
+            "storage_volumes_details": details
+        }
+        if failed:
+            msg = "Could not process {0} of {1} storage volumes in {2}"
+            self.module.fail_json(msg=msg.format(
+                failed, len(specs), self.cluster_name), **result)
+        utils.exit_module(self.module, self.client, **result)
+
     def perform_module_operation(self):  # pylint: disable=R0912, R0914, R0915
         """perform module operations"""
         def filter_itls(volume):
@@ -376,7 +671,7 @@ class StorageVolumeModule:
                 "storage_details": volume
             }
             LOG.debug("Result %s\n", result)
-            self.module.exit_json(**result)
+            utils.exit_module(self.module, self.client, **result)
 
         def get_rename_payload(payload):
             if vol_obj.use == 'unclaimed':
@@ -388,11 +683,15 @@ class StorageVolumeModule:
                            "name {2} is already in use".format(
                                vol_obj.name, self.cluster_name,
                                new_storage_vol_name))
-                if self.all_vols:
-                    for each in self.all_vols:
-                        if each.name == new_storage_vol_name:
-                            LOG.error("%s", err_msg)
-                            self.module.fail_json(msg=err_msg)
+                # A single lookup, unless the volumes are already listed
+                if self.vol_index is not None:
+                    in_use = new_storage_vol_name in self.vol_index
+                else:
+                    in_use = self.get_volume_by_name(
+                        new_storage_vol_name)[0] is not None
+                if in_use:
+                    LOG.error("%s", err_msg)
+                    self.module.fail_json(msg=err_msg)
                 # Validate the new storage volume name
                 status, msg = utils.validate_name(
                     new_storage_vol_name, 63, 'new_storage_volume_name')
@@ -413,6 +712,9 @@ class StorageVolumeModule:
             return payload
 
         state = self.module.params['state']
+        if self.module.params['storage_volumes']:
+            self.perform_batch_operation()
+
         vol_name = self.module.params['storage_volume_name']
         vol_id = self.module.params['storage_volume_id']
         new_storage_vol_name = self.module.params['new_storage_volume_name']
@@ -467,6 +769,8 @@ class StorageVolumeModule:
 
         # Create update payload
         payload = []
+        if self.module.params['rename_template']:
+            new_storage_vol_name = self.render_new_name(vol_obj, 0)
         if new_storage_vol_name:
             payload = get_rename_payload(payload)
         if thin_rebuild is not None and thin_rebuild != vol_obj.thin_rebuild:
@@ -506,7 +810,10 @@ def get_user_parameters():
                            choices=['claimed', 'unclaimed']),
         new_storage_volume_name=dict(type='str', required=False),
         thin_rebuild=dict(type='bool', required=False),
-        get_itls=dict(type='bool', required=False))
+        get_itls=dict(type='bool', required=False),
+        storage_volumes=dict(type='list', required=False),
+        rename_template=dict(type='str', required=False),
+        max_workers=dict(type='int', required=False, default=4))
 
 
 def main():
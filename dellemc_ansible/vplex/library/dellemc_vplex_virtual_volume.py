@@ -3,8 +3,7 @@
 # !/usr/bin/python
 # Copyright: (c) 2020, DellEMC
 
-from collections import OrderedDict
-from datetime import datetime, timedelta
+import time
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.storage.dell import \
     dellemc_ansible_vplex_utils as utils
@@ -68,8 +67,17 @@ options:
   additional_devices:
     description:
     - Defines to add/remove virtual volume to expand
+    - The devices not added yet are validated concurrently before the
+      first expansion, and then added in turn, each expansion being sent
+      on the volume returned by the previous one
     type: list
 
+  max_workers:
+    description:
+    - Maximum number of additional_devices validated concurrently
+    default: 4
+    type: int
+
   remote_access:
     description:
     - Defines remote access to virtual volume
@@ -287,6 +295,32 @@ volume_details:
         mirrors:
             descrition: added device list for mirroring
             type: list
+
+expansion:
+    description: Capacity report of the expansion. When an expansion step
+                 fails, the failure reports the steps already applied.
+    returned: When additional_devices expands the virtual volume
+    type: complex
+    contains:
+        initial_capacity:
+            description: Capacity of the volume before the expansion
+            type: int
+        final_capacity:
+            description: Capacity of the volume after the expansion
+            type: int
+        added_capacity:
+            description: Capacity added to the volume
+            type: int
+        devices:
+            description: Devices added, in order, each with its capacity
+                         and the capacity of the volume once added
+            type: list
+
+bootstrap_calls_saved:
+    description: Number of the connection checks, setup version and
+                 cluster name lookups answered from the bootstrap cache
+    returned: always
+    type: int
 '''
 
 
@@ -294,6 +328,11 @@ LOG = utils.get_logger('dellemc_vplex_virtual_volume')
 
 HAS_VPLEXAPI_SDK = utils.has_vplexapi_sdk()
 
+# Attempts made for each expansion step, and the HTTP status codes with
+# which VPLEX asks for a step to be retried
+EXPAND_ATTEMPTS = 3
+EXPAND_RETRY_STATUS = (429, 503)
+
 
 class VirtualVolumeModule:  # pylint: disable=R0902
     """Class with virtual Volume operations"""
@@ -357,6 +396,7 @@ class VirtualVolumeModule:  # pylint: disable=R0902
         self.cluster_cl = api_obj.ClustersApi(api_client=self.client)
         self.cluster_name = self.module.params['cluster_name']
         self.vol_obj = None
+        self.name_indexes = {}
         LOG.info("Got VPLEX instance to access common lib methods "
                  "on VPLEX")
 
@@ -449,25 +489,71 @@ class VirtualVolumeModule:  # pylint: disable=R0902
             LOG.error("%s\n%s\n", err_msg, err)
             self.module.fail_json(msg=err_msg)
 
-    def expand_volume(self, payload):
-        """Expand virtual volume"""
-        LOG.info('Expanding virtual volume %s', self.vol_obj.name)
-        LOG.debug('Details: \n%s', payload)
-        try:
-            res = self.virt_cl.expand_virtual_volume(
-                cluster_name=self.cluster_name,
-                name=self.vol_obj.name,
-                virtual_volume_expand_payload=payload)
-            LOG.info('Expanded %s', self.vol_obj.name)
-            LOG.debug('Expanded virtual volume details: %s', res)
-            return res
-        except utils.ApiException as err:
-            err_msg = ("Could not expand virtual volume {0} in {1} due to"
-                       " error: {2}".format(
-                           self.vol_obj.name, self.cluster_name,
-                           utils.error_msg(err)))
-            LOG.error("%s\n%s\n", err_msg, err)
-            self.module.fail_json(msg=err_msg)
+    def get_expansion(self, capacity, steps):
+        """Get the capacity report of the expansion steps applied to the
+        volume of the given initial capacity"""
+        final_capacity = steps[-1]['volume_capacity'] if steps else capacity
+        return {
+            'initial_capacity': capacity,
+            'final_capacity': final_capacity,
+            'added_capacity': final_capacity - capacity,
+            'devices': steps}
+
+    def fail_expansion(self, err_msg, capacity, steps):
+        """Fail the module, reporting the expansion steps applied before
+        the failure"""
+        if steps:
+            err_msg += ' Expanded with {0} before the failure.'.format(
+                ', '.join(step['device'] for step in steps))
+        self.module.fail_json(msg=err_msg, changed=bool(steps),
+                              expansion=self.get_expansion(capacity, steps))
+
+    def expand_volume_with_devices(self, devices):
+        """Expand virtual volume with the devices in turn, each step being
+        sent on the volume returned by the previous one. The volume is only
+        read again when VPLEX asks for a step to be retried"""
+        steps = []
+        initial_capacity = self.vol_obj.capacity
+        for dev in devices:
+            dev_uri = '/vplex/v2/clusters/{0}/devices/{1}'.format(
+                self.cluster_name, dev.name)
+            payload = {
+                "skip_init": "False",
+                "spare_storage": dev_uri
+            }
+            LOG.debug('Payload: %s', payload)
+            capacity = self.vol_obj.capacity
+            for attempt in range(EXPAND_ATTEMPTS):
+                try:
+                    self.vol_obj = self.virt_cl.expand_virtual_volume(
+                        cluster_name=self.cluster_name,
+                        name=self.vol_obj.name,
+                        virtual_volume_expand_payload=payload)
+                    LOG.info('Expanded %s with %s', self.vol_obj.name,
+                             dev.name)
+                    break
+                except utils.ApiException as err:
+                    if err.status not in EXPAND_RETRY_STATUS or \
+                            attempt == EXPAND_ATTEMPTS - 1:
+                        err_msg = ("Could not expand virtual volume {0} in"
+                                   " {1} with {2} due to error: {3}".format(
+                                       self.vol_obj.name, self.cluster_name,
+                                       dev.name, utils.error_msg(err)))
+                        LOG.error("%s\n%s\n", err_msg, err)
+                        self.fail_expansion(err_msg, initial_capacity, steps)
+                    LOG.info('Retrying the expansion of %s with %s after'
+                             ' error: %s', self.vol_obj.name, dev.name, err)
+                time.sleep(2 ** attempt)
+                vol_obj, err_msg = self.get_volume_by_name(self.vol_obj.name)
+                if not vol_obj:
+                    self.fail_expansion(err_msg, initial_capacity, steps)
+                self.vol_obj = vol_obj
+                # The step may have gone through before VPLEX answered
+                if self.vol_obj.capacity > capacity:
+                    break
+            steps.append({'device': dev.name, 'capacity': dev.capacity,
+                          'volume_capacity': self.vol_obj.capacity})
+        return steps
 
     def delete_volume(self, vol_name=None):
         """Delete virtual volume"""
@@ -489,21 +575,6 @@ class VirtualVolumeModule:  # pylint: disable=R0902
             LOG.error("%s\n%s\n", err_msg, err)
             self.module.fail_json(msg=err_msg)
 
-    def get_all_devices(self, cluster_name):
-        """Get all devices from VPLEX"""
-        LOG.info('Get all devices from %s', cluster_name)
-        try:
-            all_devs = self.dev_cl.get_devices(
-                cluster_name=cluster_name)
-            LOG.debug("Obtained devices details: %s", all_devs)
-            return all_devs
-        except utils.ApiException as err:
-            err_msg = ("Could not get all devices from "
-                       "{0} due to error: {1}".format(
-                           cluster_name, utils.error_msg(err)))
-            LOG.error("%s\n%s", err_msg, err)
-            self.module.fail_json(msg=err_msg)
-
     def get_device(self, dev_name):
         """Get device object by volume name"""
         LOG.info('Get device %s from VPLEX', dev_name)
@@ -587,41 +658,48 @@ class VirtualVolumeModule:  # pylint: disable=R0902
             LOG.error("%s\n%s\n", err_msg, err)
             return str(err_msg)
 
+    def get_name_index(self, collection):
+        """Get the names of the virtual volumes or devices of the other
+        clusters, listed concurrently once per run"""
+        if collection not in self.name_indexes:
+            clusters = self.get_clusters()
+            if isinstance(clusters, str):
+                self.module.fail_json(msg=clusters)
+            clusters = [cluster for cluster in clusters
+                        if cluster != self.cluster_name]
+            try:
+                self.name_indexes[collection] = utils.get_name_index(
+                    self.client, collection, clusters)
+            except utils.ApiException as err:
+                err_msg = ("Could not get all {0} due to error: {1}".format(
+                    collection.replace('_', ' '), utils.error_msg(err)))
+                LOG.error("%s\n%s", err_msg, err)
+                self.module.fail_json(msg=err_msg)
+        return self.name_indexes[collection]
+
     def volume_exists_in_other_clusters(self, vol_name):
         """Verify if same volume name exists in other clusters"""
-        clusters = self.get_clusters()
-        clusters = list(set(clusters).difference([self.cluster_name]))
-        for cluster in clusters:
-            all_vols = self.get_all_volumes(cluster)
-            for vol in all_vols:
-                if vol_name == vol.name:
-                    return True
-        return False
+        return self.get_name_index('virtual_volumes').find(
+            vol_name) is not None
 
     def device_exists_in_other_clusters(self, dev_name):
-        """Verify if same volume name exists in other clusters"""
-        clusters = self.get_clusters()
-        clusters = list(set(clusters).difference([self.cluster_name]))
+        """Verify if a device name containing the given name exists in
+        other clusters"""
         LOG.info(dev_name)
-        for cluster in clusters:
-            all_devs = self.get_all_devices(cluster)
-            for dev in all_devs:
-                if dev_name in dev.name:
-                    return True
-        return False
+        return self.get_name_index('devices').find_containing(
+            dev_name) is not None
 
     def perform_module_operation(self):  # pylint: disable=R0912, R0914, R0915
         """perform module operations"""
         def exit_module(volume, change_flag):
             """module exit function"""
             volume = utils.serialize_content(volume)
-            if vol_type:
-                if vol_type == 'mirrored':
-                    volume['mirrors'] = list(children.values())
-                    volume['additional_devs'] = []
-                elif vol_type == 'expanded':
-                    volume['mirrors'] = []
-                    volume['additional_devs'] = list(children.values())
+            if vol_type == 'mirrored':
+                volume['mirrors'] = list(children.values())
+                volume['additional_devs'] = []
+            elif vol_type == 'expanded':
+                volume['mirrors'] = []
+                volume['additional_devs'] = list(children.values())
             elif volume != {}:
                 volume['mirrors'] = []
                 volume['additional_devs'] = []
@@ -629,8 +707,10 @@ class VirtualVolumeModule:  # pylint: disable=R0902
                 "changed": change_flag,
                 "storage_details": volume
             }
+            if expansion:
+                result['expansion'] = expansion
             LOG.debug("Result %s\n", result)
-            self.module.exit_json(**result)
+            utils.exit_module(self.module, self.client, **result)
 
         def is_device_rebuilding(dev):
             """Verify if device is in rebuilding state"""
@@ -645,9 +725,10 @@ class VirtualVolumeModule:  # pylint: disable=R0902
                 self.module.fail_json(msg=msg)
 
         def dev_checks(device_name, chk_vol=None, chk_top_level=None,
-                       chk_rebuild=None):
+                       chk_rebuild=None, dev=None):
             """Validate device for different tasks"""
-            dev = self.get_device(device_name)
+            if dev is None:
+                dev = self.get_device(device_name)
             if isinstance(dev, str):
                 self.module.fail_json(msg=dev)
             if chk_vol and dev.virtual_volume is not None:
@@ -690,28 +771,6 @@ class VirtualVolumeModule:  # pylint: disable=R0902
                 msg += self.cluster_name
                 exit_fail(msg)
 
-        def get_volume_type(children):
-            """Get volume type, if its mirrored or expanded"""
-            def get_dates():
-                dates = ["2000-01-01", "9999-01-01"]
-                start, end = [datetime.strptime(_, "%Y-%m-%d") for _ in dates]
-                dates = OrderedDict(((start + timedelta(_)).strftime(r"%Y%b"),
-                                     None)
-                                    for _ in range((end - start).days)).keys()
-                return dates
-            # verify if volume is mirrored or expanded
-            dates = get_dates()
-            if len(children) == 0:
-                return None
-            expanded = False
-            for child in list(children.keys()):
-                if child.split(vol_dev_name)[-1][:7] in dates:
-                    children.pop(child)
-                    expanded = True
-            if not expanded:
-                return 'mirrored'
-            return 'expanded'
-
         def rename(new_vol_name):
             payload = [{
                 "op": "replace",
@@ -730,6 +789,7 @@ class VirtualVolumeModule:  # pylint: disable=R0902
 
         changed = False
         vol_type = None
+        expansion = None
 
         if vol_name:
             self.vol_obj, err_msg = self.get_volume_by_name(vol_name)
@@ -873,11 +933,10 @@ class VirtualVolumeModule:  # pylint: disable=R0902
         # we should not allow additional devices to be added to it.
         dev_uri = '/vplex/v2/clusters/{0}/devices/{1}'.format(
             self.cluster_name, vol_dev_name)
-        children = self.get_map(dev_uri).children
-        # create dict of dev_name and uri
-        children = {child.split(
-            '/')[-1]: child for child in children if '/extents/' not in child}
-        vol_type = get_volume_type(children)
+        vol_type, children = utils.get_device_layout(
+            vol_dev_name, self.get_map(dev_uri).children)
+        # create dict of dev_name and uri of the mirrors or added devices
+        children = dict((child.split('/')[-1], child) for child in children)
 
         # expand volume
         if len(additional_devs) > 0:
@@ -909,22 +968,23 @@ class VirtualVolumeModule:  # pylint: disable=R0902
                 else:
                     additional_devs = additional_devs[len(children):]
 
-                # check if devices is used by another volume
-                for dev in additional_devs:
-                    dev_checks(dev, chk_vol=True, chk_top_level=True)
+                # check if devices is used by another volume, with the
+                # devices fetched concurrently
+                results = utils.run_concurrently(
+                    self.get_device, additional_devs,
+                    self.module.params['max_workers'])
+                devs = []
+                for dev, (dev_obj, err) in zip(additional_devs, results):
+                    if err is not None:
+                        raise err
+                    devs.append(dev_checks(dev, chk_vol=True,
+                                           chk_top_level=True, dev=dev_obj))
 
                 capacity = self.vol_obj.capacity
                 LOG.info('Capacity: %s', capacity)
 
-                for dev in additional_devs:
-                    dev_uri = '/vplex/v2/clusters/{0}/devices/{1}'.format(
-                        self.cluster_name, dev)
-                    payload = {
-                        "skip_init": "False",
-                        "spare_storage": dev_uri
-                    }
-                    LOG.debug('Payload: %s', payload)
-                    self.vol_obj = self.expand_volume(payload)
+                steps = self.expand_volume_with_devices(devs)
+                expansion = self.get_expansion(capacity, steps)
                 if capacity < self.vol_obj.capacity:
                     msg = 'Capacity increased from {0} to {1}.'.format(
                         capacity, self.vol_obj.capacity)
@@ -953,6 +1013,7 @@ def get_user_parameters():
         remote_access=dict(type='str', required=False,
                            choices=['enable', 'disable']),
         additional_devices=dict(type='list', required=False, default=[]),
+        max_workers=dict(type='int', required=False, default=4),
     )
 
 
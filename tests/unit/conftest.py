@@ -0,0 +1,11 @@
+"""Makes the VPLEX module utils and modules importable without installing
+them into Ansible"""
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                    'dellemc_ansible')
+
+sys.path.insert(0, os.path.join(ROOT, 'utils'))
+sys.path.insert(0, os.path.join(ROOT, 'vplex', 'library'))
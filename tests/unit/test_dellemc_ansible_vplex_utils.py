@@ -0,0 +1,331 @@
+"""Unit tests of the helpers of the VPLEX module utils which do not need
+a VPLEX or the vplexapi SDK"""
+
+import json
+
+import pytest
+
+import dellemc_ansible_vplex_utils as utils
+
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    """Points the VPLEX runtime files to a temporary directory"""
+    monkeypatch.setattr(utils, 'get_cache_dir', lambda: str(tmpdir))
+    return tmpdir
+
+
+def get_params(password='secret', **params):
+    """Returns the connection parameters of a module"""
+    module_params = {'vplexhost': '10.0.0.1', 'vplexuser': 'service',
+                     'vplexpassword': password}
+    module_params.update(params)
+    return module_params
+
+
+def test_bootstrap_cache_serves_same_password(cache_dir):
+    cache = utils.BootstrapCache(get_params(bootstrap_cache_ttl=60))
+    cache.set('version', '6.2')
+
+    cache = utils.BootstrapCache(get_params(bootstrap_cache_ttl=60))
+    assert cache.get('version') == '6.2'
+    assert cache.calls_saved == 1
+
+
+def test_bootstrap_cache_rejects_other_password(cache_dir):
+    utils.BootstrapCache(get_params(bootstrap_cache_ttl=60)).set(
+        'version', '6.2')
+
+    cache = utils.BootstrapCache(get_params('other', bootstrap_cache_ttl=60))
+    assert cache.get('version') is None
+    assert cache.calls_saved == 0
+
+
+def test_bootstrap_cache_stores_no_plain_digest(cache_dir):
+    cache = utils.BootstrapCache(get_params(bootstrap_cache_ttl=60))
+    cache.set('version', '6.2')
+
+    with open(cache.path) as cache_file:
+        content = json.load(cache_file)
+    assert 'digest' not in content
+    assert content['verifier'] == cache.derive(content['salt'])
+    assert 'secret' not in json.dumps(content)
+
+
+def test_bootstrap_cache_disabled_without_ttl(cache_dir):
+    cache = utils.BootstrapCache(get_params())
+    cache.set('version', '6.2')
+    assert not cache.enabled
+    assert cache.get('version') is None
+
+
+def test_snapshot_cache_not_keyed_by_password(cache_dir):
+    cache = utils.SnapshotCache(get_params(snapshot_cache_ttl=60))
+    other = utils.SnapshotCache(get_params('other', snapshot_cache_ttl=60))
+    assert cache.path == other.path
+    digest = utils.hashlib.sha256(
+        b'10.0.0.1|service|secret').hexdigest()
+    assert digest not in cache.path
+
+
+def test_snapshot_cache_stores_with_current_epoch(cache_dir):
+    cache = utils.SnapshotCache(get_params(snapshot_cache_ttl=60))
+    key = '/vplex/v2/clusters/cluster-1/storage_volumes'
+    cache.store(key, cache.get_epoch(), {'status': 200, 'data': '[]'})
+    assert cache.load(key)['data'] == '[]'
+
+
+def test_snapshot_cache_skips_store_after_invalidation(cache_dir):
+    cache = utils.SnapshotCache(get_params(snapshot_cache_ttl=60))
+    key = '/vplex/v2/clusters/cluster-1/storage_volumes'
+    epoch = cache.get_epoch()
+    cache.invalidate(['/vplex/v2/clusters/cluster-1/'])
+    cache.store(key, epoch, {'status': 200, 'data': '[]'})
+    assert cache.load(key) is None
+
+
+def test_snapshot_cache_invalidates_prefixes(cache_dir):
+    cache = utils.SnapshotCache(get_params(snapshot_cache_ttl=60))
+    local = '/vplex/v2/clusters/cluster-1/extents'
+    other = '/vplex/v2/clusters/cluster-2/extents'
+    for key in (local, other):
+        cache.store(key, cache.get_epoch(), {'status': 200, 'data': '[]'})
+    cache.invalidate(utils.get_invalidation_prefixes(
+        '/vplex/v2/clusters/cluster-1/extents/extent_1'))
+    assert cache.load(local) is None
+    assert cache.load(other) is not None
+
+
+def test_snapshot_cache_expires(cache_dir, monkeypatch):
+    cache = utils.SnapshotCache(get_params(snapshot_cache_ttl=60))
+    key = '/vplex/v2/clusters'
+    cache.store(key, cache.get_epoch(), {'status': 200, 'data': '[]'})
+    now = utils.time.time()
+    monkeypatch.setattr(utils.time, 'time', lambda: now + 61)
+    assert cache.load(key) is None
+
+
+def test_run_concurrently_keeps_input_order():
+    results = utils.run_concurrently(lambda item: item * 2, list(range(20)),
+                                     4)
+    assert results == [(item * 2, None) for item in range(20)]
+
+
+def test_run_concurrently_returns_errors_per_item():
+    def func(item):
+        if item % 3 == 0:
+            raise ValueError(item)
+        return item
+
+    results = utils.run_concurrently(func, list(range(7)), 3)
+    for item, (result, err) in enumerate(results):
+        if item % 3 == 0:
+            assert result is None
+            assert isinstance(err, ValueError)
+            assert err.args == (item,)
+        else:
+            assert (result, err) == (item, None)
+
+
+def test_run_concurrently_inline_with_one_worker():
+    calls = []
+    results = utils.run_concurrently(calls.append, ['a', 'b'], 1)
+    assert calls == ['a', 'b']
+    assert results == [(None, None), (None, None)]
+
+
+def test_run_concurrently_without_items():
+    assert utils.run_concurrently(lambda item: item, [], 4) == []
+
+
+def build_graph():
+    """Returns the graph of a storage volume exported by a storage view
+    through its extent, device and virtual volume"""
+    base = '/vplex/v2/clusters/cluster-1/'
+    graph = utils.StorageGraph()
+    graph.add_objects('storage_volumes', [{'name': 'sv_1'}, {'name': 'sv_2'}],
+                      'cluster-1')
+    graph.add_objects('extents', [
+        {'name': 'extent_sv_1_1', 'storage_volume': base + 'storage_volumes/'
+         'sv_1', 'used_by': [base + 'devices/device_1']}], 'cluster-1')
+    graph.add_objects('devices', [
+        {'name': 'device_1', 'virtual_volume': 'device_1_vol'}], 'cluster-1')
+    graph.add_objects('virtual_volumes', [
+        {'name': 'device_1_vol', 'supporting_device': base +
+         'devices/device_1'}], 'cluster-1')
+    graph.add_objects('storage_views', [
+        {'name': 'view_1', 'virtual_volumes': [
+            {'uri': base + 'virtual_volumes/device_1_vol'}]}], 'cluster-1')
+    return graph
+
+
+def test_storage_graph_links_collections():
+    base = '/vplex/v2/clusters/cluster-1/'
+    graph = build_graph()
+    extent = base + 'extents/extent_sv_1_1'
+    assert graph.uses[extent] == set([base + 'storage_volumes/sv_1'])
+    assert graph.used_by[extent] == set([base + 'devices/device_1'])
+    # Names are resolved to URIs in the cluster of the object
+    assert graph.used_by[base + 'devices/device_1'] == set(
+        [base + 'virtual_volumes/device_1_vol'])
+
+
+def test_storage_graph_finds_exporting_views():
+    base = '/vplex/v2/clusters/cluster-1/'
+    topology = build_graph().to_dict()
+    assert topology[base + 'storage_volumes/sv_1']['storage_views'] == [
+        base + 'exports/storage_views/view_1']
+    assert topology[base + 'storage_volumes/sv_2']['storage_views'] == []
+    assert topology[base + 'exports/storage_views/view_1']['uses'] == [
+        base + 'virtual_volumes/device_1_vol']
+
+
+def build_nested_graph(monkeypatch):
+    """Builds the graph of a storage volume under a RAID-1 device and of
+    one under a distributed device, both exported by a storage view, with
+    the maps of the devices answered by a stubbed MapsApi"""
+    base = '/vplex/v2/clusters/cluster-1/'
+    dist = '/vplex/v2/distributed_storage/distributed_devices/'
+    collections = {
+        'get_storage_volumes': [{'name': 'sv_1'}, {'name': 'sv_2'}],
+        'get_extents': [
+            {'name': 'extent_sv_1_1', 'storage_volume': 'sv_1',
+             'used_by': [base + 'devices/leg_1']},
+            {'name': 'extent_sv_2_1', 'storage_volume': 'sv_2',
+             'used_by': [base + 'devices/leg_2']}],
+        'get_devices': [
+            {'name': 'leg_1'}, {'name': 'leg_2'},
+            {'name': 'device_1', 'virtual_volume': 'device_1_vol'}],
+        'get_virtual_volumes': [
+            {'name': 'device_1_vol', 'supporting_device': 'device_1'},
+            {'name': 'dd_1_vol', 'supporting_device': dist + 'dd_1'}],
+        'get_storage_views': [{'name': 'view_1', 'virtual_volumes': [
+            base + 'virtual_volumes/device_1_vol',
+            base + 'virtual_volumes/dd_1_vol']}],
+        'get_distributed_devices': [{'name': 'dd_1'}],
+    }
+    maps = {base + 'devices/device_1': [base + 'devices/leg_1'],
+            dist + 'dd_1': [base + 'devices/leg_2']}
+    requested = []
+
+    class Api(object):
+        """Stubbed API of the SDK listing the collections above"""
+
+        def __init__(self, api_client=None):
+            self.api_client = api_client
+
+        def __getattr__(self, method):
+            return lambda *args: collections.get(method, [])
+
+        @staticmethod
+        def get_map(uri):
+            """Returns the map of a device"""
+            requested.append(uri)
+            return type('Map', (object,), {'children': maps[uri]})
+
+    for _, _, api, _, _ in utils.TOPOLOGY_COLLECTIONS:
+        monkeypatch.setattr(utils.VplexapiModules, api, Api, raising=False)
+    monkeypatch.setattr(utils.VplexapiModules, 'MapsApi', Api, raising=False)
+    monkeypatch.setattr(utils, 'serialize_content', lambda data: data)
+    return utils.build_storage_graph(None, ['cluster-1'], 2), requested
+
+
+def test_storage_graph_links_device_legs(monkeypatch):
+    base = '/vplex/v2/clusters/cluster-1/'
+    graph, requested = build_nested_graph(monkeypatch)
+    # Only the devices not used by an extent have their maps fetched
+    assert sorted(requested) == [
+        base + 'devices/device_1',
+        '/vplex/v2/distributed_storage/distributed_devices/dd_1']
+    assert graph.used_by[base + 'devices/leg_1'] == set(
+        [base + 'devices/device_1'])
+    assert graph.used_by[base + 'devices/leg_2'] == set(
+        ['/vplex/v2/distributed_storage/distributed_devices/dd_1'])
+
+
+def test_storage_graph_finds_views_through_legs(monkeypatch):
+    base = '/vplex/v2/clusters/cluster-1/'
+    topology = build_nested_graph(monkeypatch)[0].to_dict()
+    for name in ('sv_1', 'sv_2'):
+        assert topology[base + 'storage_volumes/' + name][
+            'storage_views'] == [base + 'exports/storage_views/view_1']
+
+
+def test_pending_operations_drop_applied_members():
+    base = '/vplex/v2/clusters/cluster-1/virtual_volumes/'
+    details = {'name': 'view_1', 'virtual_volumes': [
+        {'uri': base + 'vol_1'}, base + 'vol_3']}
+    operations = [
+        {'op': 'add', 'path': '/virtual_volumes', 'value': base + 'vol_1'},
+        {'op': 'add', 'path': '/virtual_volumes', 'value': base + 'vol_2'},
+        {'op': 'remove', 'path': '/virtual_volumes', 'value': base + 'vol_3'},
+        {'op': 'remove', 'path': '/virtual_volumes', 'value': base + 'vol_4'},
+    ]
+    assert utils.get_pending_operations(details, operations) == [
+        operations[1], operations[2]]
+
+
+def test_pending_operations_rename():
+    rename = [{'op': 'replace', 'path': '/name', 'value': 'view_2'}]
+    assert utils.get_pending_operations({'name': 'view_1'}, rename) == rename
+    assert utils.get_pending_operations({'name': 'view_2'}, rename) == []
+
+
+def test_pending_operations_without_members():
+    operations = [{'op': 'add', 'path': '/initiators', 'value': 'init_1'}]
+    assert utils.get_pending_operations(
+        {'name': 'view_1', 'initiators': None}, operations) == operations
+
+
+def test_device_layout_simple():
+    children = ['/vplex/v2/clusters/cluster-1/extents/extent_sv_1_1']
+    assert utils.get_device_layout('device_1', children) == ('simple', [])
+
+
+def test_device_layout_mirrored():
+    base = '/vplex/v2/clusters/cluster-1/devices/'
+    children = [base + 'device_1_mirror_1', base + 'device_1_mirror_2']
+    assert utils.get_device_layout('device_1', children) == (
+        'mirrored', children)
+
+
+def test_device_layout_expanded():
+    base = '/vplex/v2/clusters/cluster-1/devices/'
+    children = [base + 'device_12020Mar10_101010', base + 'device_2',
+                base + 'device_3']
+    assert utils.get_device_layout('device_1', children) == (
+        'expanded', [base + 'device_2', base + 'device_3'])
+
+
+def test_device_layout_ignores_names_like_dates():
+    # A digit run not followed by a month is not an expansion suffix
+    base = '/vplex/v2/clusters/cluster-1/devices/'
+    children = [base + 'device_12020', base + 'device_1_2']
+    assert utils.get_device_layout('device_1', children)[0] == 'mirrored'
+
+
+def test_name_index_finds_cluster():
+    index = utils.NameIndex()
+    index.add('cluster-1', ['vol_1', 'vol_2'])
+    index.add('cluster-2', ['vol_2', 'vol_3'])
+    assert index.find('vol_1') == 'cluster-1'
+    assert index.find('vol_3') == 'cluster-2'
+    assert index.find('vol_4') is None
+
+
+def test_name_index_excludes_cluster():
+    index = utils.NameIndex()
+    index.add('cluster-1', ['vol_1', 'vol_2'])
+    index.add('cluster-2', ['vol_2'])
+    assert index.find('vol_1', exclude='cluster-1') is None
+    assert index.find('vol_2', exclude='cluster-1') == 'cluster-2'
+
+
+def test_name_index_finds_names_containing_part():
+    index = utils.NameIndex()
+    index.add('cluster-1', ['device_1'])
+    index.add('cluster-2', ['device_10'])
+    assert index.find_containing('device_1') == 'cluster-1'
+    assert index.find_containing('device_1', exclude='cluster-1') == \
+        'cluster-2'
+    assert index.find_containing('device_2') is None
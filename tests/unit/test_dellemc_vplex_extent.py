@@ -0,0 +1,198 @@
+"""Unit tests of the bulk creation of the extent module and of its lookups
+of storage volumes, with a stubbed vplexapi SDK"""
+
+import pytest
+
+from vplex_stubs import FakeModule, Model, ModuleExited, ModuleFailed, \
+    api_error, import_vplex_module, serialize
+
+extent = import_vplex_module('dellemc_vplex_extent')
+
+BASE = '/vplex/v2/clusters/cluster-1/'
+
+
+class ExtentApi(object):
+    """ExtentApi holding the extents given, failing the renames to the
+    names in fail_renames"""
+
+    def __init__(self, extents, fail_renames=()):
+        self.extents = dict((ext.name, ext) for ext in extents)
+        self.fail_renames = fail_renames
+        self.calls = []
+
+    def get_extent(self, cluster_name, name):
+        """Returns an extent"""
+        self.calls.append(('get', name))
+        if name not in self.extents:
+            raise api_error(extent.utils, 404, 'Resource not found')
+        return self.extents[name]
+
+    def get_extents(self, cluster_name):
+        """Returns the extents"""
+        self.calls.append(('list', None))
+        return list(self.extents.values())
+
+    def create_extent(self, cluster_name, payload):
+        """Creates the extent of a storage volume"""
+        stor_vol = payload['storage_volume'].split('/')[-1]
+        self.calls.append(('create', stor_vol))
+        ext = Model(name='extent_{0}_1'.format(stor_vol), use='claimed')
+        self.extents[ext.name] = ext
+        return ext
+
+    def patch_extent(self, cluster_name, name, payload):
+        """Renames an extent"""
+        new_name = payload[0]['value']
+        if new_name in self.fail_renames:
+            raise api_error(extent.utils, 400, 'Invalid name')
+        ext = self.extents.pop(name)
+        ext.name = new_name
+        self.extents[new_name] = ext
+        return ext
+
+
+class StorageVolumeApi(object):
+    """StorageVolumeApi which must not be called once the storage volumes
+    are indexed"""
+
+    @staticmethod
+    def get_storage_volume(cluster_name, name):
+        """Fails the test"""
+        raise AssertionError('get_storage_volume called')
+
+
+def new_volume(name, use='claimed', array='array_1'):
+    """Returns a storage volume, used by its extent when use is used"""
+    used_by = [BASE + 'extents/extent_{0}_1'.format(name)] \
+        if use == 'used' else []
+    return Model(name=name, use=use, system_id='id_' + name,
+                 storage_array_name=array, used_by=used_by)
+
+
+@pytest.fixture
+def extent_module(monkeypatch):
+    """Returns an extent module of the given parameters over the given
+    storage volumes and extents"""
+    monkeypatch.setattr(extent.utils, 'serialize_content', serialize)
+
+    def get_module(volumes, extents=(), fail_renames=(), **params):
+        listings = []
+
+        def get_index(client, cluster_name):
+            listings.append(cluster_name)
+            return extent.utils.StorageVolumeIndex(volumes)
+        monkeypatch.setattr(extent.utils, 'get_storage_volume_index',
+                            get_index)
+        obj = extent.VplexExtent.__new__(extent.VplexExtent)
+        module_params = {'state': 'present', 'storage_volumes': None,
+                         'storage_array_name': None, 'max_workers': 2,
+                         'extent_name': None, 'storage_volume_name': None,
+                         'storage_volume_id': None, 'new_extent_name': None}
+        module_params.update(params)
+        obj.module = FakeModule(**module_params)
+        obj.client = None
+        obj.cl_name = 'cluster-1'
+        obj.resource_fail_msg = 'Failed to collect resources'
+        obj.fail_msg = 'Could not collect resources in {0}'
+        obj.state = module_params['state']
+        obj.extent = ExtentApi(extents, fail_renames)
+        obj.stor_obj = StorageVolumeApi()
+        obj.storvol_index = None
+        obj.listings = listings
+        obj.result = {'changed': False, 'extent_details': {}}
+        return obj
+    return get_module
+
+
+def run(obj, outcome=ModuleExited):
+    """Runs the module operation and returns its result"""
+    with pytest.raises(outcome) as result:
+        obj.perform_module_operation()
+    return result.value.args[0]
+
+
+def test_bulk_creates_and_names_extents(extent_module):
+    obj = extent_module(
+        [new_volume('sv_1'), new_volume('sv_2'), new_volume('sv_3', 'used')],
+        [Model(name='extent_sv_3_1', use='used')],
+        storage_volumes=['sv_1',
+                         {'storage_volume_id': 'id_sv_2',
+                          'extent_name': 'ext_2'},
+                         'sv_3'])
+    result = run(obj)
+    assert result['changed'] is True
+    assert [(ext['storage_volume'], ext['extent_name'], ext['changed'])
+            for ext in result['extents_details']] == [
+                ('sv_1', 'extent_sv_1_1', True),
+                ('id_sv_2', 'ext_2', True),
+                ('sv_3', 'extent_sv_3_1', False)]
+    assert obj.listings == ['cluster-1']
+
+
+def test_bulk_reports_each_failure(extent_module):
+    obj = extent_module(
+        [new_volume('sv_1'), new_volume('sv_2', 'unclaimed'),
+         new_volume('sv_3'), new_volume('sv_4')],
+        [Model(name='ext_taken', use='used')], fail_renames=['ext_4'],
+        storage_volumes=['sv_1', 'sv_2',
+                         {'storage_volume_name': 'sv_3',
+                          'extent_name': 'ext_taken'},
+                         {'storage_volume_name': 'sv_4',
+                          'extent_name': 'ext_4'}])
+    result = run(obj, ModuleFailed)
+    assert result['msg'] == \
+        'Could not create or name 3 of 4 extents in cluster-1'
+    details = result['extents_details']
+    assert [ext['failed'] for ext in details] == [False, True, True, True]
+    assert 'unclaimed' in details[1]['msg']
+    assert 'already exists' in details[2]['msg']
+    # The extent created under the name given by VPLEX is reported
+    assert details[3]['changed'] is True
+    assert details[3]['extent_name'] == 'extent_sv_4_1'
+    assert ('create', 'sv_3') not in obj.extent.calls
+
+
+def test_bulk_selects_claimed_volumes_of_array(extent_module):
+    obj = extent_module(
+        [new_volume('sv_1'), new_volume('sv_2', 'unclaimed'),
+         new_volume('sv_3', array='array_2'), new_volume('sv_4', 'used')],
+        storage_array_name='array_1')
+    result = run(obj)
+    assert [ext['storage_volume'] for ext in result['extents_details']] == [
+        'sv_1']
+
+
+def test_bulk_requires_state_present(extent_module):
+    obj = extent_module([new_volume('sv_1')], storage_volumes=['sv_1'],
+                        state='absent')
+    result = run(obj, ModuleFailed)
+    assert 'state present' in result['msg']
+
+
+def test_storage_volume_id_resolved_from_index(extent_module):
+    obj = extent_module(
+        [new_volume('sv_1'), new_volume('sv_2', 'used')],
+        [Model(name='extent_sv_2_1', use='claimed')],
+        storage_volume_id='id_sv_2', extent_name='extent_sv_2_1')
+    result = run(obj)
+    assert result['changed'] is False
+    assert result['extent_details']['name'] == 'extent_sv_2_1'
+    assert obj.listings == ['cluster-1']
+    # The extent found on the storage volume is fetched once
+    assert obj.extent.calls == [('get', 'extent_sv_2_1')]
+
+
+def test_storage_volume_id_creates_extent(extent_module):
+    obj = extent_module([new_volume('sv_1')],
+                        storage_volume_id='id_sv_1', extent_name='ext_1')
+    result = run(obj)
+    assert result['changed'] is True
+    assert result['extent_details']['name'] == 'ext_1'
+
+
+def test_unknown_storage_volume_id(extent_module):
+    obj = extent_module([new_volume('sv_1')], storage_volume_id='id_sv_9',
+                        extent_name='ext_1')
+    result = run(obj, ModuleFailed)
+    assert result['msg'] == \
+        'Could not get storage volume name from ID id_sv_9 in cluster-1'
@@ -0,0 +1,191 @@
+"""Unit tests of the filters, paging and deltas of the gather facts module,
+with a stubbed vplexapi SDK"""
+
+import json
+
+import pytest
+
+from vplex_stubs import FakeModule, ModuleFailed, api_error, \
+    import_vplex_module, serialize
+
+gatherfacts = import_vplex_module('dellemc_vplex_gatherfacts')
+
+
+class StorageVolumeApi(object):
+    """StorageVolumeApi listing the storage volumes given, one page at a
+    time when limit and offset are given"""
+
+    volumes = []
+    calls = []
+
+    def __init__(self, api_client=None):
+        self.api_client = api_client
+
+    def get_storage_volumes(self, cluster_name, **kwargs):
+        """Returns the storage volumes of a cluster
+
+        :param async_req bool
+        :param str cluster_name: The name of the cluster (required)
+        :param int limit: Maximum number of objects
+        :param int offset: Index of the first object
+        :param str name: Filter on the name
+        :return: list[StorageVolume]
+        """
+        self.calls.append((cluster_name, kwargs))
+        volumes = self.volumes
+        if 'name' in kwargs:
+            volumes = [vol for vol in volumes if vol['name'] == kwargs['name']]
+        if 'offset' in kwargs:
+            return volumes[kwargs['offset']:kwargs['offset'] +
+                           kwargs['limit']]
+        return volumes
+
+
+class UnpagedStorageVolumeApi(StorageVolumeApi):
+    """StorageVolumeApi of an SDK taking neither filters nor paging"""
+
+    def get_storage_volumes(self, cluster_name):
+        """Returns the storage volumes of a cluster
+
+        :param str cluster_name: The name of the cluster (required)
+        :return: list[StorageVolume]
+        """
+        self.calls.append((cluster_name, {}))
+        return self.volumes
+
+
+class Modules(object):
+    """VplexapiModules of the stubbed SDK"""
+    StorageVolumeApi = StorageVolumeApi
+
+
+def volume(name, use='claimed', capacity=100):
+    """Returns a serialized storage volume"""
+    return {'name': name, 'use': use, 'capacity': capacity}
+
+
+@pytest.fixture
+def facts(monkeypatch):
+    """Returns a gather facts module of the given parameters"""
+    monkeypatch.setattr(gatherfacts.utils, 'serialize_content', serialize)
+    monkeypatch.setattr(StorageVolumeApi, 'calls', [])
+    monkeypatch.setattr(StorageVolumeApi, 'volumes', [
+        volume('sv_1'), volume('sv_2', use='unclaimed'),
+        volume('sv_3', capacity=300)])
+
+    def get_facts(filters=None, **params):
+        obj = gatherfacts.VplexGatherFacts.__new__(
+            gatherfacts.VplexGatherFacts)
+        module_params = {'fields': None, 'since_snapshot': None,
+                         'filters': filters, 'max_workers': 1}
+        module_params.update(params)
+        obj.module = FakeModule(**module_params)
+        obj.client = None
+        obj.api_obj = Modules()
+        obj.query_params, obj.matches = gatherfacts.compile_filters(filters)
+        obj.page_offset = None
+        obj.page_full = False
+        obj.clusters = ['cluster-1']
+        return obj
+    return get_facts
+
+
+def test_filters_sent_only_when_accepted(facts):
+    obj = facts([{'field': 'name', 'value': 'sv_1'},
+                 {'field': 'use', 'value': 'claimed'}])
+    assert obj.get_storage_volume_list('cluster-1') == ['sv_1']
+    # use is not a parameter of the listing, so it is evaluated locally
+    assert StorageVolumeApi.calls == [('cluster-1', {'name': 'sv_1'})]
+
+
+def test_filters_evaluated_locally(facts, monkeypatch):
+    monkeypatch.setattr(Modules, 'StorageVolumeApi', UnpagedStorageVolumeApi)
+    obj = facts([{'field': 'name', 'value': 'sv_1'}])
+    assert obj.get_storage_volume_list('cluster-1') == ['sv_1']
+    assert StorageVolumeApi.calls == [('cluster-1', {})]
+
+
+def test_filters_compare_sizes(facts):
+    obj = facts([{'field': 'capacity', 'operator': 'ge', 'value': '200B'}])
+    assert obj.get_storage_volume_list('cluster-1') == ['sv_3']
+
+
+def test_unexpected_error_fails_module(facts):
+    obj = facts()
+    calls = [('stor_vol', 'get_storage_volume_list', 'cluster-1')]
+    with pytest.raises(ModuleFailed) as failure:
+        obj.collect_results(calls, [(None, TypeError('unexpected'))])
+    assert 'unexpected' in failure.value.args[0]['msg']
+
+
+def read_output(path):
+    """Returns the objects written to an output file"""
+    with open(path) as output:
+        return [json.loads(line)['data'] for line in output]
+
+
+def test_paged_subset_written_once(facts, monkeypatch, tmpdir):
+    monkeypatch.setattr(gatherfacts, 'PAGE_SIZE', 2)
+    monkeypatch.setattr(gatherfacts, 'PAGE_OVERLAP', 1)
+    path = str(tmpdir.join('facts.jsonl'))
+    calls = [('stor_vol', 'get_storage_volume_list', 'cluster-1')]
+    counts = facts().write_subsets(calls, path)
+    assert counts == {'stor_vol': 3}
+    assert read_output(path) == ['sv_1', 'sv_2', 'sv_3']
+    assert [kwargs['offset'] for _, kwargs in StorageVolumeApi.calls] == [
+        0, 1, 2]
+
+
+def test_paged_subset_survives_deletion(facts, monkeypatch, tmpdir):
+    monkeypatch.setattr(gatherfacts, 'PAGE_SIZE', 2)
+    monkeypatch.setattr(gatherfacts, 'PAGE_OVERLAP', 1)
+    obj = facts()
+    get_list = obj.get_storage_volume_list
+
+    def delete_after_first_page(cluster_name):
+        details = get_list(cluster_name)
+        if obj.page_offset == 0:
+            StorageVolumeApi.volumes.pop(0)
+        return details
+    obj.get_storage_volume_list = delete_after_first_page
+    path = str(tmpdir.join('facts.jsonl'))
+    obj.write_subsets([('stor_vol', 'get_storage_volume_list', 'cluster-1')],
+                      path)
+    assert read_output(path) == ['sv_1', 'sv_2', 'sv_3']
+
+
+def test_unpaged_subset_listed_at_once(facts, monkeypatch, tmpdir):
+    monkeypatch.setattr(gatherfacts, 'PAGE_SIZE', 2)
+    monkeypatch.setattr(Modules, 'StorageVolumeApi', UnpagedStorageVolumeApi)
+    path = str(tmpdir.join('facts.jsonl'))
+    facts().write_subsets(
+        [('stor_vol', 'get_storage_volume_list', 'cluster-1')], path)
+    assert read_output(path) == ['sv_1', 'sv_2', 'sv_3']
+    assert len(StorageVolumeApi.calls) == 1
+
+
+def test_deltas_since_snapshot(facts, tmpdir):
+    path = str(tmpdir.join('snapshot.json'))
+    obj = facts(since_snapshot=path)
+    calls = [('stor_vol', 'get_storage_volume_list', 'cluster-1')]
+
+    def get_delta():
+        results = [(obj.get_storage_volume_list('cluster-1'), None)]
+        return obj.get_deltas(calls, results, path)[0][0]
+
+    assert get_delta() == {'added': ['sv_1', 'sv_2', 'sv_3'], 'changed': [],
+                           'removed': []}
+    StorageVolumeApi.volumes[0]['use'] = 'used'
+    del StorageVolumeApi.volumes[1]
+    assert get_delta() == {'added': [], 'changed': ['sv_1'],
+                           'removed': ['sv_2']}
+    assert get_delta() == {'added': [], 'changed': [], 'removed': []}
+
+
+def test_deltas_keep_snapshot_on_error(facts, tmpdir):
+    path = str(tmpdir.join('snapshot.json'))
+    obj = facts(since_snapshot=path)
+    calls = [('stor_vol', 'get_storage_volume_list', 'cluster-1')]
+    err = api_error(gatherfacts.utils, 500)
+    assert obj.get_deltas(calls, [(None, err)], path) == [(None, err)]
+    assert not tmpdir.join('snapshot.json').exists()
@@ -0,0 +1,219 @@
+"""Unit tests of the chunked updates, exact membership and balancing of the
+storage view module, with a stubbed vplexapi SDK"""
+
+import pytest
+
+from vplex_stubs import FakeModule, Model, ModuleExited, ModuleFailed, \
+    api_error, import_vplex_module, serialize
+
+storage_view = import_vplex_module('dellemc_vplex_storage_view')
+
+BASE = '/vplex/v2/clusters/cluster-1/'
+
+
+class ExportsApi(object):
+    """ExportsApi holding the storage views given, failing the updates
+    adding the virtual volumes in fail_on"""
+
+    def __init__(self, views, fail_on=(), busy=0):
+        self.views = views
+        self.fail_on = fail_on
+        self.busy = busy
+        self.patches = []
+
+    def get_storage_views(self, cluster_name):
+        """Returns the storage views"""
+        return [dict(view) for view in self.views.values()]
+
+    def get_storage_view(self, cluster_name, name):
+        """Returns a storage view"""
+        return dict(self.views[name])
+
+    def patch_storage_view(self, cluster_name, name, operations):
+        """Applies the operations to a storage view, failing with 503
+        after applying them while busy"""
+        self.patches.append((name, operations))
+        view = self.views[name]
+        for operation in operations:
+            if operation['value'] in self.fail_on:
+                raise api_error(storage_view.utils, 400, 'Invalid')
+            if operation['path'] == '/name':
+                view['name'] = operation['value']
+                self.views[operation['value']] = self.views.pop(name)
+                continue
+            key = operation['path'].strip('/')
+            if operation['op'] == 'add':
+                view[key] = view[key] + [operation['value']]
+            else:
+                view[key] = [uri for uri in view[key]
+                             if uri != operation['value']]
+        if self.busy:
+            self.busy -= 1
+            raise api_error(storage_view.utils, 503, 'Busy')
+        return dict(view)
+
+
+class MapsApi(object):
+    """MapsApi of virtual volumes exported by no storage view"""
+
+    @staticmethod
+    def get_map(uri):
+        """Returns the map of a virtual volume"""
+        return Model(parents=[])
+
+
+class ClustersApi(object):
+    """ClustersApi of a single cluster"""
+
+    @staticmethod
+    def get_clusters():
+        """Returns the clusters"""
+        return [Model(name='cluster-1')]
+
+
+class VirtualVolumeApi(object):
+    """VirtualVolumeApi of the virtual volumes of the given capacities"""
+
+    def __init__(self, capacities):
+        self.capacities = capacities
+
+    def get_virtual_volumes(self, cluster_name):
+        """Returns the virtual volumes of a cluster"""
+        return [Model(name=name, capacity=capacity, visibility='local')
+                for name, capacity in sorted(self.capacities.items())]
+
+
+def new_view(name, virtual_volumes=(), ports=(), initiators=()):
+    """Returns a serialized storage view"""
+    return {'name': name, 'virtual_volumes': list(virtual_volumes),
+            'ports': list(ports), 'initiators': list(initiators)}
+
+
+def volume_uri(name):
+    """Returns the URI of a virtual volume of cluster-1"""
+    return BASE + 'virtual_volumes/' + name
+
+
+def add(name):
+    """Returns the operation adding a virtual volume"""
+    return {'op': 'add', 'path': '/virtual_volumes',
+            'value': volume_uri(name)}
+
+
+@pytest.fixture
+def view_module(monkeypatch):
+    """Returns a storage view module of the given parameters over the
+    given storage views"""
+    monkeypatch.setattr(storage_view.utils, 'serialize_content', serialize)
+    monkeypatch.setattr(storage_view.time, 'sleep', lambda seconds: None)
+
+    def get_module(views, exports=None, **params):
+        obj = storage_view.VplexStorageview.__new__(
+            storage_view.VplexStorageview)
+        module_params = {'state': 'present', 'batch_size': 50,
+                         'max_workers': 2, 'storage_views': None,
+                         'balance': 'round-robin'}
+        module_params.update(params)
+        obj.module = FakeModule(**module_params)
+        obj.client = None
+        obj.cl_name = 'cluster-1'
+        obj.storageview = exports or ExportsApi(
+            dict((view['name'], view) for view in views))
+        obj.maps = MapsApi()
+        obj.cls = ClustersApi()
+        obj.virtualvolume = VirtualVolumeApi({})
+        obj.st_name = params.get('storage_view_name')
+        obj.new_st_name = None
+        obj.ports = params.get('ports')
+        obj.initiators = params.get('initiators')
+        obj.virvols = params.get('virtual_volumes')
+        obj.virvol_state = None
+        obj.membership = params.get('membership')
+        obj.vir_vol = {}
+        obj.vv_index = {}
+        obj.distvv_index = {}
+        obj.result = {'changed': False, 'storageview_details': None}
+        return obj
+    return get_module
+
+
+def test_update_sent_in_chunks_renaming_last(view_module):
+    obj = view_module([new_view('view_1')], batch_size=2)
+    rename = {'op': 'replace', 'path': '/name', 'value': 'view_2'}
+    details = obj.patch_storage_view(
+        'view_1', [rename] + [add('vol_{0}'.format(i)) for i in range(5)])
+    assert [len(ops) for _, ops in obj.storageview.patches] == [2, 2, 1, 1]
+    assert obj.storageview.patches[-1] == ('view_1', [rename])
+    assert details['name'] == 'view_2'
+    assert len(details['virtual_volumes']) == 5
+
+
+def test_busy_chunk_not_resent_once_applied(view_module):
+    views = {'view_1': new_view('view_1')}
+    obj = view_module(None, exports=ExportsApi(views, busy=1))
+    details = obj.patch_storage_view('view_1', [add('vol_1'), add('vol_2')])
+    # The view read back reflects the chunk, so it is not sent again
+    assert len(obj.storageview.patches) == 1
+    assert details['virtual_volumes'] == [volume_uri('vol_1'),
+                                          volume_uri('vol_2')]
+
+
+def test_failed_chunk_reports_partial_update(view_module):
+    views = {'view_1': new_view('view_1')}
+    obj = view_module(None, exports=ExportsApi(
+        views, fail_on=[volume_uri('vol_3')]), batch_size=2)
+    operations = [add('vol_{0}'.format(i)) for i in range(1, 6)]
+    with pytest.raises(ModuleFailed) as failure:
+        obj.apply_patches([('view_1', operations)])
+    result = failure.value.args[0]
+    assert result['changed'] is True
+    assert result['pending_operations'] == {'view_1': operations[2:]}
+    assert result['storageview_details']['virtual_volumes'] == [
+        volume_uri('vol_1'), volume_uri('vol_2')]
+
+
+def test_exact_membership_removes_other_members(view_module):
+    port = BASE + 'exports/ports/'
+    view = new_view('view_1', [volume_uri('vol_1'), volume_uri('vol_2')],
+                    ports=[port + 'P1', port + 'P2'])
+    obj = view_module([view], storage_view_name='view_1', ports=['P1'],
+                      virtual_volumes=['vol_1'], membership='exact')
+    removals = obj.get_exact_removals(view, [volume_uri('vol_1')])
+    assert removals == [
+        {'op': 'remove', 'path': '/ports', 'value': port + 'P2'},
+        {'op': 'remove', 'path': '/virtual_volumes',
+         'value': volume_uri('vol_2')}]
+
+
+def assign(obj):
+    """Runs the assignment of the virtual volumes and returns the result"""
+    with pytest.raises(ModuleExited) as result:
+        obj.assign_virtual_volumes()
+    return result.value.args[0]
+
+
+def test_assignment_round_robin(view_module):
+    views = [new_view('view_1'), new_view('view_2', [volume_uri('vol_0')])]
+    obj = view_module(views, storage_views=['view_1', 'view_2'],
+                      virtual_volumes=['vol_0', 'vol_1', 'vol_2', 'vol_3'])
+    obj.virtualvolume = VirtualVolumeApi(
+        dict(('vol_{0}'.format(i), 100) for i in range(4)))
+    result = assign(obj)
+    # vol_0 is already exported by view_2
+    assert result['assignment'] == {'view_1': ['vol_1', 'vol_3'],
+                                    'view_2': ['vol_2']}
+    assert result['changed'] is True
+    assert [len(view['virtual_volumes'])
+            for view in result['storageviews_details']] == [2, 2]
+
+
+def test_assignment_by_capacity(view_module):
+    views = [new_view('view_1'), new_view('view_2')]
+    obj = view_module(views, storage_views=['view_1', 'view_2'],
+                      virtual_volumes=['vol_1', 'vol_2', 'vol_3'],
+                      balance='capacity')
+    obj.virtualvolume = VirtualVolumeApi(
+        {'vol_1': 100, 'vol_2': 300, 'vol_3': 200})
+    result = assign(obj)
+    assert result['assignment'] == {'view_1': ['vol_2'],
+                                    'view_2': ['vol_3', 'vol_1']}
@@ -0,0 +1,151 @@
+"""Unit tests of the batch operations of the storage volume module, with a
+stubbed vplexapi SDK"""
+
+import pytest
+
+from vplex_stubs import FakeModule, Model, ModuleExited, ModuleFailed, \
+    import_vplex_module, serialize
+
+storage_volume = import_vplex_module('dellemc_vplex_storage_volume')
+
+
+class StorageVolumeApi(object):
+    """StorageVolumeApi holding the storage volumes given"""
+
+    def __init__(self, volumes):
+        self.volumes = dict((vol.name, vol) for vol in volumes)
+        self.calls = []
+
+    def claim_storage_volume(self, cluster_name, name, claim_payload):
+        """Claims a storage volume"""
+        self.calls.append(('claim', name))
+        self.volumes[name].use = 'claimed'
+        return self.volumes[name]
+
+    def unclaim_storage_volume(self, cluster_name, name, unclaim_payload):
+        """Unclaims a storage volume"""
+        self.calls.append(('unclaim', name))
+        self.volumes[name].use = 'unclaimed'
+        return self.volumes[name]
+
+    def patch_storage_volume(self, cluster_name, name,
+                             storage_volume_patch_payload):
+        """Updates a storage volume"""
+        self.calls.append(('patch', name))
+        vol = self.volumes.pop(name)
+        for operation in storage_volume_patch_payload:
+            setattr(vol, operation['path'].strip('/'), operation['value'])
+        self.volumes[vol.name] = vol
+        return vol
+
+
+def new_volume(name, use='claimed', system_id=None):
+    """Returns a storage volume"""
+    return Model(name=name, use=use, system_id=system_id or 'id_' + name,
+                 thin_rebuild=False)
+
+
+@pytest.fixture
+def volume_module(monkeypatch):
+    """Returns a storage volume module of the given storage_volumes over
+    the given storage volumes"""
+    monkeypatch.setattr(storage_volume.utils, 'serialize_content', serialize)
+    listings = []
+
+    def get_module(volumes, storage_volumes, **params):
+        api = StorageVolumeApi(volumes)
+
+        def get_index(client, cluster_name):
+            listings.append(cluster_name)
+            return storage_volume.utils.StorageVolumeIndex(
+                list(api.volumes.values()))
+        monkeypatch.setattr(storage_volume.utils, 'get_storage_volume_index',
+                            get_index)
+        obj = storage_volume.StorageVolumeModule.__new__(
+            storage_volume.StorageVolumeModule)
+        module_params = {'state': 'present', 'claimed_state': None,
+                         'thin_rebuild': None, 'rename_template': None,
+                         'max_workers': 2,
+                         'storage_volumes': storage_volumes}
+        module_params.update(params)
+        obj.module = FakeModule(**module_params)
+        obj.client = None
+        obj.cluster_name = 'cluster-1'
+        obj.strg_client = api
+        obj.vol_index = None
+        obj.listings = listings
+        return obj
+    return get_module
+
+
+def run_batch(obj, outcome=ModuleExited):
+    """Runs the batch operation and returns its result"""
+    with pytest.raises(outcome) as result:
+        obj.perform_batch_operation()
+    return result.value.args[0]
+
+
+def test_batch_claims_and_renames(volume_module):
+    obj = volume_module(
+        [new_volume('sv_1', use='unclaimed'), new_volume('sv_2')],
+        [{'storage_volume_name': 'sv_1', 'claimed_state': 'claimed'},
+         {'storage_volume_id': 'id_sv_2',
+          'new_storage_volume_name': 'sv_2_new'}])
+    result = run_batch(obj)
+    assert result['changed'] is True
+    assert [(vol['storage_volume'], vol['changed'], vol['failed'])
+            for vol in result['storage_volumes_details']] == [
+                ('sv_1', True, False), ('id_sv_2', True, False)]
+    assert sorted(obj.strg_client.calls) == [('claim', 'sv_1'),
+                                             ('patch', 'sv_2')]
+    # The storage volumes are listed once for the whole batch
+    assert obj.listings == ['cluster-1']
+
+
+def test_batch_reports_each_failure(volume_module):
+    obj = volume_module(
+        [new_volume('sv_1'), new_volume('sv_2', use='unclaimed')],
+        ['sv_1', 'sv_3',
+         {'storage_volume_name': 'sv_2',
+          'new_storage_volume_name': 'sv_2_new'}],
+        claimed_state='claimed', thin_rebuild=True)
+    result = run_batch(obj, ModuleFailed)
+    assert result['msg'] == \
+        'Could not process 1 of 3 storage volumes in cluster-1'
+    details = result['storage_volumes_details']
+    assert [vol['failed'] for vol in details] == [False, True, False]
+    assert details[0]['storage_details']['thin_rebuild'] is True
+    assert details[2]['storage_details']['name'] == 'sv_2_new'
+    assert result['changed'] is True
+
+
+def test_batch_rejects_clashing_renames(volume_module):
+    obj = volume_module(
+        [new_volume('sv_1'), new_volume('sv_2'), new_volume('sv_3')],
+        [{'storage_volume_name': 'sv_1',
+          'new_storage_volume_name': 'sv_3'},
+         {'storage_volume_name': 'sv_2',
+          'new_storage_volume_name': 'sv_new'},
+         {'storage_volume_name': 'sv_3',
+          'new_storage_volume_name': 'sv_new'}])
+    result = run_batch(obj, ModuleFailed)
+    assert [vol['failed'] for vol in result['storage_volumes_details']] == [
+        True, False, True]
+    assert obj.strg_client.calls == [('patch', 'sv_2')]
+
+
+def test_batch_rename_template(volume_module):
+    obj = volume_module([new_volume('sv_1'), new_volume('sv_2')],
+                        ['sv_2', 'sv_1'],
+                        rename_template='{system_id}_{index}')
+    result = run_batch(obj)
+    assert [vol['storage_details']['name']
+            for vol in result['storage_volumes_details']] == [
+                'id_sv_2_0', 'id_sv_1_1']
+
+
+def test_batch_requires_state_present(volume_module):
+    obj = volume_module([new_volume('sv_1')], ['sv_1'], state='absent')
+    result = run_batch(obj, ModuleFailed)
+    assert 'state present' in result['msg']
+    assert obj.strg_client.calls == []
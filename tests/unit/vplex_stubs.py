@@ -0,0 +1,82 @@
+"""Stubs of the Ansible module and of the vplexapi SDK objects for the unit
+tests of the VPLEX modules"""
+
+import importlib
+import json
+import sys
+import types
+
+import pytest
+
+UTILS = 'ansible.module_utils.storage.dell.dellemc_ansible_vplex_utils'
+
+
+class ModuleFailed(Exception):
+    """Raised by FakeModule.fail_json with the result"""
+
+
+class ModuleExited(Exception):
+    """Raised by FakeModule.exit_json with the result"""
+
+
+class FakeModule(object):
+    """AnsibleModule holding the given parameters, which raises the result
+    it fails or exits with"""
+
+    def __init__(self, **params):
+        self.params = params
+
+    @staticmethod
+    def fail_json(**result):
+        """Raises ModuleFailed with the result"""
+        raise ModuleFailed(result)
+
+    @staticmethod
+    def exit_json(**result):
+        """Raises ModuleExited with the result"""
+        raise ModuleExited(result)
+
+
+class Model(object):
+    """Object of the SDK with the given attributes"""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+    def __repr__(self):
+        return 'Model({0})'.format(self.__dict__)
+
+
+def serialize(data):
+    """Serializes the Model objects like ApiClient does the SDK models"""
+    if isinstance(data, list):
+        return [serialize(item) for item in data]
+    if isinstance(data, Model):
+        return dict((key, serialize(value))
+                    for key, value in data.__dict__.items())
+    return data
+
+
+def api_error(utils, status, message='error'):
+    """Returns an ApiException of VPLEX with the given status"""
+    err = utils.ApiException(status=status, reason=message)
+    err.body = json.dumps({'error_code': status, 'message': message})
+    return err
+
+
+def import_vplex_module(name):
+    """Imports a VPLEX module with the module utils of this tree, skipping
+    the tests when Ansible or the vplexapi SDK is not installed"""
+    pytest.importorskip('ansible.module_utils.basic')
+    pytest.importorskip('vplexapi')
+    utils = importlib.import_module('dellemc_ansible_vplex_utils')
+    parent = 'ansible.module_utils'
+    for package in ['storage', 'dell']:
+        parent += '.' + package
+        try:
+            importlib.import_module(parent)
+        except ImportError:
+            sys.modules[parent] = types.ModuleType(parent)
+    sys.modules[UTILS] = utils
+    setattr(sys.modules[parent], UTILS.split('.')[-1], utils)
+    return importlib.import_module(name)